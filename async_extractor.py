@@ -0,0 +1,212 @@
+import asyncio
+from typing import AsyncIterator, Callable, Dict, List, Optional, Union
+
+import aiohttp
+
+from dataExtractor import (
+    AAVE_LIQUIDATIONCALL_TOPIC, AAVE_V3_POOL, BALANCEMULTI_LIMIT, BASE_URL, COMPOUND_LIQUIDATEBORROW_TOPIC, CTOKENS,
+    ETHERSCAN_API_KEY, ETHERSCAN_RATE_LIMIT, TX_PAGE_SIZE,
+    BlockPager, EtherscanClient, LogPager, RateLimitError, WalletContext, extract_wallet_factors, filter_logs_by_borrower,
+    get_eth_price, get_liquidation_index,
+)
+import metrics
+from balances import BALANCE_TOKENS, prime as prime_balances
+from etherscan_rows import Tx, compact_log, compact_tx, parse_rows_async
+from factors import WalletFactors
+from ratelimit import PRIORITY_INTERACTIVE, RequestScheduler
+
+
+# =========================
+# Async Etherscan client (pooled keep-alive connections)
+# =========================
+class AsyncEtherscanClient:
+    """asyncio counterpart of `EtherscanClient`.
+
+    All requests go through one aiohttp session, so connections are kept alive
+    and reused across calls and across wallets. Use as an async context manager
+    or call `close()` when done.
+    """
+
+    def __init__(self, api_key: Union[str, List[str]], base_url: str = BASE_URL, max_connections: int = 20,
+                 timeout: float = 30, scheduler: Optional[RequestScheduler] = None,
+                 priority: int = PRIORITY_INTERACTIVE):
+        api_keys = [api_key] if isinstance(api_key, str) or api_key is None else list(api_key)
+        self.api_key = api_keys[0]
+        self.base_url = base_url
+        self.scheduler = scheduler or RequestScheduler.shared(api_keys, ETHERSCAN_RATE_LIMIT)
+        self.priority = priority
+        self.max_connections = max_connections
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _ensure_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    def blocking(self) -> EtherscanClient:
+        """A blocking client on the same keys, endpoint and rate budget (for work handed to a thread)."""
+        return EtherscanClient(self.api_key, base_url=self.base_url, scheduler=self.scheduler, priority=self.priority)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _get(self, params: Dict, project: Optional[Callable[[Dict], object]] = None) -> Dict:
+        params = {k: str(v) for k, v in params.items()}
+        for attempt in range(self.scheduler.max_retries + 1):
+            action = params.get("action")
+            with metrics.timer(metrics.RATELIMIT_WAIT_SECONDS):
+                key = await self.scheduler.acquire_async(self.priority)
+            with metrics.timer(metrics.ETHERSCAN_SECONDS, action=action):
+                async with self._ensure_session().get(self.base_url, params={**params, "apikey": str(key)}) as resp:
+                    if resp.status == 429 or resp.status >= 500:
+                        metrics.ETHERSCAN_REQUESTS.inc(action=action, outcome=f"http_{resp.status}")
+                        retry_after = EtherscanClient._retry_after(resp.headers)
+                        self.scheduler.penalize(key, retry_after or self.scheduler.backoff(attempt))
+                        continue
+                    resp.raise_for_status()
+                    if project is None:
+                        data = await resp.json(content_type=None)
+                    else:
+                        data = await parse_rows_async(resp.content, project)
+            if EtherscanClient._is_rate_limited(data):
+                metrics.ETHERSCAN_REQUESTS.inc(action=action, outcome="rate_limited")
+                self.scheduler.penalize(key, self.scheduler.backoff(attempt))
+                continue
+            return EtherscanClient._counted(action, data)
+        raise RateLimitError(f"rate limited after {self.scheduler.max_retries + 1} attempts: {params.get('action')}")
+
+    # --- account/txs ---
+    async def iter_txlist(self, address: str, startblock: int = 0, endblock: int = 99999999,
+                          page_size: int = TX_PAGE_SIZE) -> AsyncIterator[Tx]:
+        params = {"module": "account", "action": "txlist", "address": address}
+        async for row in self._iter_pages(BlockPager(params, startblock, endblock, page_size), compact_tx):
+            yield row
+
+    async def iter_erc20_transfers(self, address: str, contract_address: Optional[str] = None, startblock: int = 0,
+                                   endblock: int = 99999999, page_size: int = TX_PAGE_SIZE) -> AsyncIterator[Dict]:
+        params = {"module": "account", "action": "tokentx", "address": address}
+        if contract_address:
+            params["contractaddress"] = contract_address
+        async for row in self._iter_pages(BlockPager(params, startblock, endblock, page_size)):
+            yield row
+
+    async def _iter_pages(self, pager: BlockPager, project: Optional[Callable[[Dict], object]] = None) -> AsyncIterator:
+        while not pager.done:
+            for row in pager.feed(EtherscanClient._result_list(await self._get(pager.params(), project))):
+                yield row
+
+    async def txlist(self, address: str, startblock: int = 0, endblock: int = 99999999, sort: str = "asc") -> List[Tx]:
+        txs = [t async for t in self.iter_txlist(address, startblock=startblock, endblock=endblock)]
+        return txs if sort == "asc" else txs[::-1]
+
+    async def erc20_transfers(self, address: str, contract_address: Optional[str] = None, sort: str = "asc") -> List[Dict]:
+        transfers = [t async for t in self.iter_erc20_transfers(address, contract_address=contract_address)]
+        return transfers if sort == "asc" else transfers[::-1]
+
+    async def eth_balance(self, address: str) -> float:
+        data = await self._get({"module": "account", "action": "balance", "address": address, "tag": "latest"})
+        return EtherscanClient._result_eth(data)
+
+    async def eth_balances(self, addresses: List[str]) -> Dict[str, float]:
+        chunks = [addresses[i:i + BALANCEMULTI_LIMIT] for i in range(0, len(addresses), BALANCEMULTI_LIMIT)]
+        answers = await asyncio.gather(*(
+            self._get({"module": "account", "action": "balancemulti", "address": ",".join(c), "tag": "latest"})
+            for c in chunks
+        ))
+        out: Dict[str, float] = {}
+        for data in answers:
+            out.update(EtherscanClient._result_balances(data))
+        return out
+
+    async def token_balance(self, token: str, address: str) -> int:
+        data = await self._get({
+            "module": "account", "action": "tokenbalance", "contractaddress": token, "address": address, "tag": "latest"
+        })
+        return EtherscanClient._result_int(data)
+
+    # --- logs ---
+    async def logs(self, address: str, topic0: Optional[str] = None, from_block: int = 0, to_block: str = "latest") -> List[Dict]:
+        params = {"module": "logs", "action": "getLogs", "address": address}
+        if topic0:
+            params["topic0"] = topic0
+        return [l async for l in self._iter_pages(LogPager(params, from_block, to_block), compact_log)]
+
+    async def borrower_logs(self, address: str, topic0: str, borrower: str, from_block: int = 0,
+                            to_block: str = "latest") -> List[Dict]:
+        logs = await self.logs(address, topic0=topic0, from_block=from_block, to_block=to_block)
+        return filter_logs_by_borrower(logs, borrower)
+
+    # --- chain head ---
+    async def block_number(self) -> int:
+        data = await self._get({"module": "proxy", "action": "eth_blockNumber"})
+        return int(data["result"], 16)
+
+
+# =========================
+# Wallet-level factor extraction (concurrent fan-out)
+# =========================
+async def prefetch_wallet(address: str, api: AsyncEtherscanClient, index=None,
+                          balances: Optional[Dict] = None) -> WalletContext:
+    """Issue every call `extract_wallet_factors` needs concurrently and return a primed context.
+
+    Liquidations are read from `index` (default: the shared
+    liquidation_index.LiquidationIndex), which a lookup first extends in a
+    thread when it is stale; getLogs is queried directly only when the shared
+    index is disabled. `balances` (from balances.fetch_balances_async for the
+    whole batch) replaces the per-wallet balance calls it has answers for.
+    """
+    balances = balances or {}
+    index = index if index is not None else get_liquidation_index()
+    calls = {("txlist", address, 0, 99999999, "asc"): api.txlist(address)}
+    if WalletContext.key("balance", address) not in balances:
+        calls[("balance", address)] = api.eth_balance(address)
+    for token in BALANCE_TOKENS:
+        if WalletContext.key("tokenbalance", token, address) not in balances:
+            calls[("tokenbalance", token, address)] = api.token_balance(token, address)
+    liq_sources = [(AAVE_V3_POOL, AAVE_LIQUIDATIONCALL_TOPIC)]
+    liq_sources += [(ctoken, COMPOUND_LIQUIDATEBORROW_TOPIC) for ctoken in CTOKENS.values()]
+    for contract, topic0 in liq_sources:
+        if index is not None:
+            lookup = asyncio.to_thread(index.borrower_logs, contract, topic0, address, api.blocking())
+        else:
+            lookup = api.borrower_logs(contract, topic0, address)
+        calls[("borrowerLogs", contract, topic0, address, 0, "latest")] = lookup
+
+    results = await asyncio.gather(*calls.values())
+    # no sync client behind it: every call extract_wallet_factors makes must be primed here
+    ctx = prime_balances(WalletContext(None, index=index), address, balances)
+    for parts, value in zip(calls.keys(), results):
+        ctx.prime(value, *parts)
+    return ctx
+
+
+async def extract_wallet_factors_async(address: str, api: Optional[AsyncEtherscanClient] = None,
+                                       eth_usd: Optional[float] = None, index=None,
+                                       balances: Optional[Dict] = None) -> WalletFactors:
+    """Async counterpart of `dataExtractor.extract_wallet_factors`.
+
+    Latency is that of the slowest single request rather than the sum of all of them.
+    """
+    if api is None:
+        async with AsyncEtherscanClient(ETHERSCAN_API_KEY) as own_api:
+            return await extract_wallet_factors_async(address, own_api, eth_usd=eth_usd, index=index,
+                                                      balances=balances)
+    if eth_usd is None:
+        # usually a cache hit; when it is not, keep the upstream request off the event loop
+        eth_usd = await asyncio.to_thread(get_eth_price)
+    ctx = await prefetch_wallet(address, api, index=index, balances=balances)
+    return extract_wallet_factors(address, ctx, eth_usd=eth_usd)
+
+
+if __name__ == "__main__":
+    print(asyncio.run(extract_wallet_factors_async("0xf7b10d603907658f690da534e9b7dbc4dab3e2d6")))
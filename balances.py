@@ -0,0 +1,174 @@
+import asyncio
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+import requests
+
+import metrics
+from dataExtractor import DAI, RETH, STETH, USDC, USDT, EtherscanClient, WalletContext
+
+# Every ERC-20 balance extract_wallet_factors reads
+BALANCE_TOKENS = (STETH, RETH, USDT, USDC, DAI)
+
+BALANCE_OF = "0x70a08231"  # balanceOf(address)
+RPC_BATCH_LIMIT = 100  # calls per JSON-RPC batch request; most providers cap batches at 100-1000
+# an Ethereum mainnet node for reads; RPC_URL is the chain attestations go to, which may be a testnet
+NODE_RPC_URL = os.getenv("NODE_RPC_URL")
+
+# WalletContext key parts -> value, for any number of wallets (see `prime`)
+Balances = Dict[Tuple, object]
+
+
+class RpcError(Exception):
+    """The JSON-RPC endpoint failed a batch (transport error or an error body for the whole batch)."""
+
+
+# =========================
+# JSON-RPC batch eth_call
+# =========================
+def balance_of_call(token: str, owner: str, call_id: int) -> Dict:
+    data = BALANCE_OF + "0" * 24 + owner.lower().removeprefix("0x")
+    return {"jsonrpc": "2.0", "id": call_id, "method": "eth_call",
+            "params": [{"to": token, "data": data}, "latest"]}
+
+
+def _pairs(addresses: Iterable[str], tokens: Iterable[str]) -> List[Tuple[str, str]]:
+    return [(token.lower(), addr.lower()) for addr in addresses for token in tokens]
+
+
+def _batches(pairs: List[Tuple[str, str]]) -> List[List[Dict]]:
+    calls = [balance_of_call(token, owner, i) for i, (token, owner) in enumerate(pairs)]
+    return [calls[i:i + RPC_BATCH_LIMIT] for i in range(0, len(calls), RPC_BATCH_LIMIT)]
+
+
+def _decode(pairs: List[Tuple[str, str]], answers: List) -> Dict[Tuple[str, str], int]:
+    """Batch answers (any order, matched by id) -> {(token, owner): raw units}; failed calls are left out."""
+    if not isinstance(answers, list):
+        raise RpcError(f"batch answer is not a list: {str(answers)[:200]}")
+    out = {}
+    for ans in answers:
+        result = ans.get("result") if isinstance(ans, dict) else None
+        if result is None:
+            continue
+        # "0x" is what a call to an address without code returns
+        out[pairs[ans["id"]]] = int(result, 16) if result != "0x" else 0
+    return out
+
+
+class RpcBalanceClient:
+    """JSON-RPC client; ERC-20 balances of many wallets go out as batches of RPC_BATCH_LIMIT calls per request."""
+
+    def __init__(self, url: str, timeout: float = 30):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def batch(self, batch: List[Dict]) -> List:
+        """POST one JSON-RPC batch; answers may come back in any order (match them by id)."""
+        with metrics.timer(metrics.RPC_SECONDS):
+            try:
+                resp = self.session.post(self.url, json=batch, timeout=self.timeout)
+                resp.raise_for_status()
+                return resp.json()
+            except (requests.RequestException, ValueError) as e:
+                raise RpcError(f"{type(e).__name__}: {e}") from e
+
+    def call(self, method: str, params: List):
+        ans = self.batch([{"jsonrpc": "2.0", "id": 0, "method": method, "params": params}])
+        ans = ans[0] if isinstance(ans, list) and ans else ans
+        if not isinstance(ans, dict) or "error" in ans or "result" not in ans:
+            err = ans.get("error") if isinstance(ans, dict) else ans
+            raise RpcError(f"{method}: {err.get('message') if isinstance(err, dict) else err}")
+        return ans["result"]
+
+    def token_balances(self, addresses: List[str], tokens: Iterable[str] = BALANCE_TOKENS) -> Dict[Tuple[str, str], int]:
+        pairs = _pairs(addresses, tokens)
+        out: Dict[Tuple[str, str], int] = {}
+        for batch in _batches(pairs):
+            out.update(_decode(pairs, self.batch(batch)))
+        return out
+
+
+class AsyncRpcBalanceClient:
+    """asyncio counterpart of `RpcBalanceClient`; batches are sent concurrently over one session."""
+
+    def __init__(self, url: str, timeout: float = 30):
+        self.url = url
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def batch(self, batch: List[Dict]) -> List:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=self.timeout)
+        with metrics.timer(metrics.RPC_SECONDS):
+            try:
+                async with self._session.post(self.url, json=batch) as resp:
+                    resp.raise_for_status()
+                    return await resp.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                raise RpcError(f"{type(e).__name__}: {e}") from e
+
+    async def token_balances(self, addresses: List[str],
+                             tokens: Iterable[str] = BALANCE_TOKENS) -> Dict[Tuple[str, str], int]:
+        pairs = _pairs(addresses, tokens)
+        answers = await asyncio.gather(*(self.batch(batch) for batch in _batches(pairs)))
+        out: Dict[Tuple[str, str], int] = {}
+        for ans in answers:
+            out.update(_decode(pairs, ans))
+        return out
+
+
+# =========================
+# Batch prefetch
+# =========================
+def _as_balances(eth: Dict[str, float], tokens: Dict[Tuple[str, str], int]) -> Balances:
+    out: Balances = {WalletContext.key("balance", addr): value for addr, value in eth.items()}
+    for (token, owner), value in tokens.items():
+        out[WalletContext.key("tokenbalance", token, owner)] = value
+    return out
+
+
+def fetch_balances(addresses: List[str], api: EtherscanClient, rpc: Optional[RpcBalanceClient] = None) -> Balances:
+    """Every balance extract_wallet_factors reads, for a whole batch of wallets.
+
+    ETH comes from balancemulti (one call per BALANCEMULTI_LIMIT wallets), the
+    ERC-20 balances from JSON-RPC batches when an `rpc` client is given.
+    Without one, or for calls the node failed, token balances are left out
+    and the WalletContext falls back to per-wallet tokenbalance calls.
+    """
+    return _as_balances(api.eth_balances(addresses), rpc.token_balances(addresses) if rpc else {})
+
+
+async def fetch_balances_async(addresses: List[str], api, rpc: Optional[AsyncRpcBalanceClient] = None) -> Balances:
+    """`fetch_balances` for an AsyncEtherscanClient; both sources are queried concurrently."""
+    if rpc is None:
+        return _as_balances(await api.eth_balances(addresses), {})
+    eth, tokens = await asyncio.gather(api.eth_balances(addresses), rpc.token_balances(addresses))
+    return _as_balances(eth, tokens)
+
+
+def balance_keys(address: str) -> List[Tuple]:
+    """WalletContext keys of the balances one wallet's extraction reads."""
+    keys = [WalletContext.key("balance", address)]
+    keys += [WalletContext.key("tokenbalance", token, address) for token in BALANCE_TOKENS]
+    return keys
+
+
+def prime(ctx: WalletContext, address: str, balances: Balances) -> WalletContext:
+    """Seed `ctx` with the prefetched balances of `address` (the ones present)."""
+    for key in balance_keys(address):
+        if key in balances:
+            ctx.prime(balances[key], *key)
+    return ctx
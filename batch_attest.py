@@ -0,0 +1,99 @@
+import json
+import time
+from typing import Dict, Iterable, List, Optional
+
+from eth_utils import to_canonical_address
+
+from attestation import ATTESTER_PK, sign_batch
+from merkle import MerkleTree, keccak
+
+
+def score_leaf(wallet: str, score: int, factors_root: str, valid_until: int) -> bytes:
+    """keccak256(abi.encodePacked(address wallet, uint256 score, bytes32 factorsRoot, uint256 validUntil))."""
+    return keccak(
+        to_canonical_address(wallet)
+        + int(score).to_bytes(32, "big")
+        + bytes.fromhex(factors_root.removeprefix("0x"))
+        + int(valid_until).to_bytes(32, "big")
+    )
+
+
+# =========================
+# Batch attestation
+# =========================
+class BatchAttestation:
+    """One signed Merkle root over many wallet scores, with an inclusion proof per wallet.
+
+    Leaves share the batch `valid_until`; the tree uses merkle.py's keccak
+    and pairing, so a verifier checks a wallet with `merkle.verify_proof` against
+    the signed root.
+    """
+
+    def __init__(self, records: Iterable[Dict], valid_until: int, nonce: int, signature: Optional[str] = None):
+        # records: {"wallet", "score", "factors_root"} as written by batch_score
+        self.entries: List[Dict] = [
+            {"wallet": r["wallet"], "score": int(r["score"]), "factorsRoot": r.get("factorsRoot", r.get("factors_root"))}
+            for r in records
+        ]
+        self.valid_until = valid_until
+        self.nonce = nonce
+        self.signature = signature
+        self._index = {e["wallet"].lower(): i for i, e in enumerate(self.entries)}
+        self.tree = MerkleTree([
+            score_leaf(e["wallet"], e["score"], e["factorsRoot"], valid_until) for e in self.entries
+        ])
+
+    @classmethod
+    def build(cls, records: Iterable[Dict], ttl: int = 86400, attester_pk: str = ATTESTER_PK) -> "BatchAttestation":
+        batch = cls(records, valid_until=int(time.time()) + ttl, nonce=int(time.time()))
+        batch.sign(attester_pk)
+        return batch
+
+    @property
+    def root(self) -> bytes:
+        return self.tree.root
+
+    @property
+    def root_hex(self) -> str:
+        return "0x" + self.root.hex()
+
+    def sign(self, attester_pk: str = ATTESTER_PK) -> str:
+        self.signature = sign_batch(self.root_hex, len(self.entries), self.valid_until, self.nonce, attester_pk)
+        return self.signature
+
+    def proof(self, wallet: str) -> Optional[Dict]:
+        i = self._index.get(wallet.lower())
+        if i is None:
+            return None
+        e = self.entries[i]
+        return {
+            **e, "validUntil": self.valid_until, "index": i, "root": self.root_hex,
+            "proof": ["0x" + p.hex() for p in self.tree.proof(i)],
+            "batchNonce": self.nonce, "batchSignature": self.signature,
+        }
+
+    @staticmethod
+    def verify(p: Dict) -> bool:
+        """Check a `proof()` result against the root it names."""
+        leaf = score_leaf(p["wallet"], p["score"], p["factorsRoot"], p["validUntil"])
+        return MerkleTree.verify(leaf, [bytes.fromhex(h.removeprefix("0x")) for h in p["proof"]], p["index"],
+                            bytes.fromhex(p["root"].removeprefix("0x")))
+
+    def attestation(self) -> Dict:
+        """Fields for the on-chain submitBatch call (see submitter)."""
+        return {"root": self.root_hex, "count": len(self.entries), "validUntil": self.valid_until,
+                "nonce": self.nonce, "signature": self.signature}
+
+    # --- persistence ---
+    def save(self, path: str):
+        with open(path, "w") as f:
+            json.dump({**self.attestation(), "entries": self.entries}, f)
+
+    @classmethod
+    def load(cls, path: str) -> "BatchAttestation":
+        with open(path) as f:
+            raw = json.load(f)
+        batch = cls(raw["entries"], raw["validUntil"], raw["nonce"], raw.get("signature"))
+        if batch.root_hex != raw["root"]:
+            raise ValueError(f"{path}: entries do not hash to the stored root")
+        return batch
@@ -0,0 +1,214 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterator, Optional, Set, TextIO
+
+import aiohttp
+
+from async_extractor import AsyncEtherscanClient, extract_wallet_factors_async
+from balances import NODE_RPC_URL, AsyncRpcBalanceClient, RpcError, fetch_balances_async
+from dataExtractor import (
+    BASE_URL, ETHERSCAN_API_KEYS, EtherscanClient, EtherscanError, get_eth_price, get_liquidation_index,
+)
+from factors import WalletFactors
+from ratelimit import PRIORITY_BATCH
+from scoring import credit_score
+
+
+# =========================
+# Input / checkpoint
+# =========================
+def read_addresses(src: TextIO) -> Iterator[str]:
+    """One address per line; blank lines and '#' comments are skipped."""
+    for line in src:
+        addr = line.split("#", 1)[0].strip()
+        if addr:
+            yield addr
+
+
+def completed_wallets(path: str) -> Set[str]:
+    """Wallets already scored successfully in an existing output file (the checkpoint)."""
+    done = set()
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue  # torn last line from an interrupted run
+                if "error" not in rec:
+                    done.add(rec["wallet"].lower())
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def successful_records(path: str) -> Iterator[Dict]:
+    """Successfully scored records from an output file, last one per wallet."""
+    latest: Dict[str, Dict] = {}
+    with open(path) as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if "error" not in rec:
+                latest[rec["wallet"].lower()] = rec
+    return iter(latest.values())
+
+
+# =========================
+# Scoring
+# =========================
+def score_record(wallet: str, factors: WalletFactors, sign: bool = False, nonce: Optional[int] = None,
+                 ttl: int = 3600) -> Dict:
+    score = credit_score(factors)
+    root_hex = "0x" + factors.merkle_root().hex()
+    rec = {"wallet": wallet, "score": score, "factors_root": root_hex, "factors": factors.to_dict()}
+    if sign:
+        from attestation import sign_score
+        valid_until = int(time.time()) + ttl
+        nonce = nonce if nonce is not None else int(time.time())
+        rec.update({
+            "valid_until": valid_until, "nonce": nonce,
+            "signature": sign_score(wallet, score, root_hex, valid_until, nonce),
+        })
+    return rec
+
+
+async def score_wallets(addresses: Iterator[str], out: TextIO, concurrency: int = 8, sign: bool = False,
+                        skip: Optional[Set[str]] = None, eth_usd: Optional[float] = None,
+                        base_url: str = BASE_URL, rpc_url: Optional[str] = NODE_RPC_URL,
+                        balance_batch: int = 100, index=None) -> Dict:
+    """Score `addresses` with at most `concurrency` wallets in flight, one JSONL line per wallet.
+
+    Lines are flushed as each wallet finishes, so the output doubles as the
+    checkpoint for a resumed run (see `completed_wallets`). Balances are
+    fetched for `balance_batch` wallets at a time (balancemulti, plus JSON-RPC
+    batches for ERC-20s when `rpc_url` is set) instead of six calls per wallet.
+    Liquidations are read from `index` (default: the shared one); syncing it
+    before the run keeps the lookups local.
+    """
+    skip = skip or set()
+    stats = {"scored": 0, "failed": 0, "skipped": 0}
+    nonce_base = int(time.time()) * 1000
+    seq = 0
+    # the producer runs at most one balance batch ahead of the workers
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(balance_batch, concurrency))
+
+    async with AsyncEtherscanClient(ETHERSCAN_API_KEYS, base_url=base_url, max_connections=concurrency * 2,
+                                    priority=PRIORITY_BATCH) as api, \
+            AsyncRpcBalanceClient(rpc_url) if rpc_url else contextlib.nullcontext() as rpc:
+        async def flush(chunk):
+            try:
+                balances = await fetch_balances_async(chunk, api, rpc)
+            except (EtherscanError, RpcError, aiohttp.ClientError, asyncio.TimeoutError):
+                balances = {}  # every wallet of the chunk fetches its own
+            for wallet in chunk:
+                await queue.put((wallet, balances))
+
+        async def producer():
+            chunk = []
+            for wallet in addresses:
+                if wallet.lower() in skip:
+                    stats["skipped"] += 1
+                    continue
+                chunk.append(wallet)
+                if len(chunk) == balance_batch:
+                    await flush(chunk)
+                    chunk = []
+            if chunk:
+                await flush(chunk)
+            for _ in range(concurrency):
+                await queue.put(None)
+
+        async def worker():
+            nonlocal seq
+            while (item := await queue.get()) is not None:
+                wallet, balances = item
+                seq += 1
+                nonce = nonce_base + seq
+                try:
+                    factors = await extract_wallet_factors_async(wallet, api, eth_usd=eth_usd, index=index,
+                                                                 balances=balances)
+                    rec = score_record(wallet, factors, sign=sign, nonce=nonce)
+                    stats["scored"] += 1
+                except Exception as e:
+                    rec = {"wallet": wallet, "error": f"{type(e).__name__}: {e}"}
+                    stats["failed"] += 1
+                out.write(json.dumps(rec) + "\n")
+                out.flush()
+
+        await asyncio.gather(producer(), *(worker() for _ in range(concurrency)))
+    return stats
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Score many wallets and stream results to JSONL.")
+    ap.add_argument("addresses", help="file with one address per line, or '-' for stdin")
+    ap.add_argument("-o", "--output", required=True, help="JSONL output; existing successful lines are skipped")
+    ap.add_argument("-c", "--concurrency", type=int, default=8, help="wallets scored at once")
+    ap.add_argument("--sign", action="store_true", help="attach an EIP-712 Score signature to every record")
+    ap.add_argument("--base-url", default=BASE_URL, help="Etherscan-compatible API endpoint")
+    ap.add_argument("--rpc-url", default=NODE_RPC_URL,
+                    help="JSON-RPC endpoint for batched ERC-20 balances (default: $NODE_RPC_URL; without one, "
+                         "token balances are read per wallet from Etherscan)")
+    ap.add_argument("--balance-batch", type=int, default=100, help="wallets per batched balance lookup")
+    ap.add_argument("--no-resume", action="store_true", help="ignore the existing output and start over")
+    ap.add_argument("--batch-attest", metavar="PATH",
+                    help="after scoring, sign one Merkle root over every scored wallet and write it with proofs to PATH")
+    ap.add_argument("--submit", action="store_true",
+                    help="with --batch-attest, send the root on-chain (RPC_URL, SCORE_ORACLE_ADDR, RELAY_PK)")
+    ap.add_argument("--submit-timeout", type=float, default=1800,
+                    help="seconds to wait for the root to be mined before giving up on it")
+    args = ap.parse_args(argv)
+    if args.submit:
+        if not args.batch_attest:
+            ap.error("--submit requires --batch-attest")
+        missing = [name for name in ("RPC_URL", "SCORE_ORACLE_ADDR", "RELAY_PK") if not os.getenv(name)]
+        if missing:
+            ap.error("--submit requires " + ", ".join(missing))
+
+    skip = set() if args.no_resume else completed_wallets(args.output)
+    src = sys.stdin if args.addresses == "-" else open(args.addresses)
+    # one price for the whole run instead of one lookup per wallet
+    eth_usd = get_eth_price()
+    t0 = time.time()
+    # extend the liquidation index once; every wallet of the run is then looked up locally
+    index = get_liquidation_index()
+    if index is not None:
+        index.sync_sources(EtherscanClient(ETHERSCAN_API_KEYS, base_url=args.base_url))
+    with open(args.output, "w" if args.no_resume else "a") as out:
+        stats = asyncio.run(score_wallets(read_addresses(src), out, concurrency=args.concurrency,
+                                          sign=args.sign, skip=skip, eth_usd=eth_usd, base_url=args.base_url,
+                                          rpc_url=args.rpc_url, balance_batch=args.balance_batch, index=index))
+    if src is not sys.stdin:
+        src.close()
+    elapsed = time.time() - t0
+    print(f"scored={stats['scored']} failed={stats['failed']} skipped={stats['skipped']} "
+          f"in {elapsed:.1f}s", file=sys.stderr)
+
+    if args.batch_attest:
+        from batch_attest import BatchAttestation
+        batch = BatchAttestation.build(successful_records(args.output))
+        batch.save(args.batch_attest)
+        print(f"batch root={batch.root_hex} wallets={len(batch.entries)} -> {args.batch_attest}", file=sys.stderr)
+        if args.submit:
+            from web3 import Web3
+            from submitter import SubmissionQueue
+            w3 = Web3(Web3.HTTPProvider(os.getenv("RPC_URL")))
+            submitter = SubmissionQueue(w3, os.getenv("SCORE_ORACLE_ADDR"), os.getenv("RELAY_PK")).start()
+            sub = submitter.submit(batch.attestation())
+            if not sub.done.wait(args.submit_timeout):
+                print(f"submitBatch not mined after {args.submit_timeout:.0f}s", file=sys.stderr)
+            submitter.stop()
+            print(f"submitBatch {sub.status} tx={sub.tx_hash}" + (f" ({sub.error})" if sub.error else ""),
+                  file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+import price_oracle
+from dataExtractor import EtherscanClient, extract_wallet_factors, set_liquidation_index
+from etherscan_stub import Fixtures, StubServer, generate_fixtures
+from liquidation_index import LiquidationIndex
+from ratelimit import RequestScheduler
+
+BENCH_KEY = "bench"
+
+
+# =========================
+# Measurement
+# =========================
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    return s[min(len(s) - 1, int(round(p / 100 * (len(s) - 1))))]
+
+
+def measure(name: str, wallets: List[str], fn: Callable[[str], object], stub: StubServer,
+            concurrency: int = 1, trace_memory: bool = True) -> Dict:
+    """Run `fn` once per wallet and report throughput, calls per wallet, latency and peak memory."""
+    latencies: List[float] = []
+    errors = 0
+
+    def one(wallet: str):
+        nonlocal errors
+        t0 = time.perf_counter()
+        try:
+            fn(wallet)
+        except Exception as e:
+            errors += 1
+            print(f"{name} {wallet}: {type(e).__name__}: {e}", file=sys.stderr)
+        latencies.append(time.perf_counter() - t0)
+
+    stub.reset_calls()
+    if trace_memory:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(one, wallets))
+    else:
+        for w in wallets:
+            one(w)
+    elapsed = time.perf_counter() - t0
+    peak = 0
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    calls = stub.reset_calls()
+    n = len(wallets)
+    return {
+        "name": name, "wallets": n, "errors": errors, "seconds": elapsed,
+        "wallets_per_sec": n / elapsed if elapsed else 0.0,
+        "calls_per_wallet": sum(calls.values()) / n if n else 0.0,
+        "calls": dict(calls),
+        "p50_ms": percentile(latencies, 50) * 1e3, "p99_ms": percentile(latencies, 99) * 1e3,
+        "mean_ms": statistics.fmean(latencies) * 1e3 if latencies else 0.0,
+        "peak_mem_mb": peak / 2**20,
+    }
+
+
+# =========================
+# Targets
+# =========================
+def client_for(stub: StubServer, rate: float) -> EtherscanClient:
+    # a private scheduler so the stub's rate limit, not the shared production budget, is what we hit
+    return EtherscanClient(BENCH_KEY, base_url=stub.url, scheduler=RequestScheduler([BENCH_KEY], rate_per_key=rate))
+
+
+def bench_extract(wallets: List[str], stub: StubServer, rate: float, concurrency: int, trace_memory: bool) -> Dict:
+    api = client_for(stub, rate)
+    return measure("extract_wallet_factors", wallets, lambda w: extract_wallet_factors(w, api=api), stub,
+                   concurrency, trace_memory)
+
+
+def bench_server(wallets: List[str], stub: StubServer, rate: float, concurrency: int,
+                 trace_memory: bool) -> List[Dict]:
+    """/score/<address> through the Flask test client: cold (computed), then warm (cached)."""
+    import pythonServer
+
+    pythonServer.api = client_for(stub, rate)
+    app = pythonServer.create_app(warm=False).test_client()
+
+    def get(w: str):
+        resp = app.get(f"/score/{w}")
+        if resp.status_code != 200:
+            raise RuntimeError(f"HTTP {resp.status_code}")
+
+    cold = measure("/score cold", wallets, get, stub, concurrency, trace_memory)
+    warm = measure("/score warm", wallets, get, stub, concurrency, trace_memory)
+    return [cold, warm]
+
+
+def report(results: List[Dict], out=sys.stdout):
+    cols = ["name", "wallets", "errors", "wallets_per_sec", "calls_per_wallet", "p50_ms", "p99_ms", "peak_mem_mb"]
+    print("  ".join(f"{c:>22}" if i == 0 else f"{c:>16}" for i, c in enumerate(cols)), file=out)
+    for r in results:
+        print("  ".join(f"{r[c]:>22}" if i == 0 else
+                        (f"{r[c]:>16.2f}" if isinstance(r[c], float) else f"{r[c]:>16}")
+                        for i, c in enumerate(cols)), file=out)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark extraction and /score against the local Etherscan stand-in.")
+    ap.add_argument("--fixtures", help="fixture JSON (recorded or generated); default: generate --wallets synthetic")
+    ap.add_argument("--wallets", type=int, default=30, help="synthetic wallets to generate")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--latency", type=float, default=0.05, help="stub seconds per answer")
+    ap.add_argument("--jitter", type=float, default=0.0)
+    ap.add_argument("--rate", type=float, default=50, help="calls/second allowed by the stub (and the client)")
+    ap.add_argument("-c", "--concurrency", type=int, default=1, help="wallets in flight at once")
+    ap.add_argument("--target", choices=["extract", "server", "all"], default="all")
+    ap.add_argument("--no-memory", action="store_true",
+                    help="skip tracemalloc (it slows Python code down; use for latency-only runs)")
+    ap.add_argument("--json", metavar="PATH", help="also write results as JSON (for comparing runs)")
+    args = ap.parse_args(argv)
+
+    if args.fixtures:
+        fx = Fixtures.load(args.fixtures)
+        wallets = sorted(fx.balance) or sorted(fx.txlist)
+    else:
+        fx, profiles = generate_fixtures(args.wallets, seed=args.seed)
+        wallets = list(profiles)
+
+    # no live price lookups, no on-chain submission
+    price_oracle.set_provider(price_oracle.StaticPriceProvider(3000.0))
+    os.environ.pop("RPC_URL", None)
+    # liquidations go through the index, as in production, but one that holds only the fixtures
+    set_liquidation_index(LiquidationIndex(":memory:"))
+
+    stub = StubServer(fx, latency=args.latency, jitter=args.jitter, rate=args.rate).start()
+    results: List[Dict] = []
+    try:
+        if args.target in ("extract", "all"):
+            results.append(bench_extract(wallets, stub, args.rate, args.concurrency, not args.no_memory))
+        if args.target in ("server", "all"):
+            results.extend(bench_server(wallets, stub, args.rate, args.concurrency, not args.no_memory))
+    finally:
+        stub.stop()
+
+    report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
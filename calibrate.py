@@ -0,0 +1,248 @@
+import argparse
+import os
+import sys
+import time
+from multiprocessing import Pool
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from scoring import CONFIG_PATH, FACTOR_COLUMNS, ScoringConfig, factor_terms, weight_vector
+
+# Column names of the older labelled exports (synthetic_credit_scores.csv)
+LEGACY_COLUMNS = {
+    "Defaults": "default_count",
+    "On-time Repayment Rate": "on_time_repayment_rate",
+    "Avg Tx Frequency": "avg_tx_frequency",
+    "Balance (USD)": "avg_balance_usd",
+    "Stablecoin Ratio": "stablecoin_ratio",
+    "Debt Utilization": "debt_utilization",
+    "Staking ETH": "staking_amount_eth",
+    "Assigned Score": "credit_score",
+}
+
+# Tunable bounds: name -> (lo, hi, log scale). Candidates are drawn in the unit cube and mapped.
+SEARCH_BOUNDS = {
+    "repayment_rate_lo": (0.0, 0.95, False),  # BOUNDS["repayment_rate"][0]
+    "tx_frequency_hi": (0.5, 20.0, True),     # BOUNDS["tx_frequency"][1]
+    "balance_usd_cap": (100.0, 1e6, True),
+    "staking_eth_cap": (1.0, 1000.0, True),
+}
+
+# score matrix elements (rows x weight candidates) evaluated at once; ~16 MB of float32
+BLOCK_ELEMENTS = 4_000_000
+
+# rows the search rounds score candidates on; the chosen config is re-scored on every row
+SEARCH_ROWS = 50_000
+
+
+# =========================
+# Data
+# =========================
+def load_labelled(path: str) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """Factor columns and `credit_score` labels from a labelled CSV (either column naming)."""
+    df = pd.read_csv(path).rename(columns=LEGACY_COLUMNS)
+    missing = [c for c in FACTOR_COLUMNS + ["credit_score"] if c not in df.columns]
+    if missing:
+        raise ValueError(f"{path}: missing columns {missing}")
+    df = df.dropna(subset=FACTOR_COLUMNS + ["credit_score"])
+    columns = {c: df[c].to_numpy(dtype=float) for c in FACTOR_COLUMNS}
+    return columns, df["credit_score"].to_numpy(dtype=float)
+
+
+# =========================
+# Candidate generation
+# =========================
+def _to_unit(bounds: Dict) -> np.ndarray:
+    values = [bounds["repayment_rate"][0], bounds["tx_frequency"][1], bounds["balance_usd_cap"], bounds["staking_eth_cap"]]
+    out = []
+    for v, (lo, hi, log) in zip(values, SEARCH_BOUNDS.values()):
+        v = min(max(v, lo), hi)
+        out.append((np.log(v / lo) / np.log(hi / lo)) if log else (v - lo) / (hi - lo))
+    return np.array(out)
+
+
+def _from_unit(u: np.ndarray, base: Dict) -> Dict:
+    v = []
+    for x, (lo, hi, log) in zip(u, SEARCH_BOUNDS.values()):
+        v.append(float(lo * (hi / lo) ** x if log else lo + x * (hi - lo)))
+    bounds = dict(base)
+    bounds["repayment_rate"] = [v[0], base["repayment_rate"][1]]
+    bounds["tx_frequency"] = [base["tx_frequency"][0], v[1]]
+    bounds["balance_usd_cap"] = v[2]
+    bounds["staking_eth_cap"] = v[3]
+    return bounds
+
+
+def sample_bounds(rng: np.random.Generator, n: int, best: Dict, spread: Optional[float]) -> List[Dict]:
+    """`best` plus n-1 candidates: uniform over the search box, or Gaussian around `best` when `spread` is set."""
+    u0 = _to_unit(best)
+    if spread is None:
+        u = rng.random((n - 1, len(u0)))
+    else:
+        u = np.clip(u0 + rng.normal(0, spread, (n - 1, len(u0))), 0, 1)
+    return [best] + [_from_unit(x, best) for x in u]
+
+
+def sample_weights(rng: np.random.Generator, n: int, best: np.ndarray, total: float,
+                   concentration: Optional[float]) -> np.ndarray:
+    """(n, factors) weight candidates summing to `total`, row 0 being `best`.
+
+    Uniform over the simplex first; Dirichlet around `best` (sharper with a
+    higher concentration) when refining.
+    """
+    k = len(best)
+    if concentration is None:
+        alpha = np.ones(k)
+    else:
+        alpha = np.maximum(best / total, 1e-3) * concentration
+    w = rng.dirichlet(alpha, n - 1) * total
+    return np.vstack([best, w])
+
+
+# =========================
+# Evaluation
+# =========================
+_columns: Optional[Dict[str, np.ndarray]] = None
+_labels: Optional[np.ndarray] = None
+
+
+def _init_worker(columns: Dict[str, np.ndarray], labels: np.ndarray):
+    global _columns, _labels
+    _columns, _labels = columns, labels
+
+
+def batch_errors(terms: np.ndarray, labels: np.ndarray, weights: np.ndarray, metric: str = "mae") -> np.ndarray:
+    """Error of every weight candidate at once: `weights` is (k, factors), the result (k,).
+
+    Scores are clipped to the served 0-100 range; rows are taken in blocks so
+    the (rows, k) score matrix stays bounded.
+    """
+    n, k = len(labels), len(weights)
+    step = max(1, BLOCK_ELEMENTS // max(k, 1))
+    total = np.zeros(k)
+    wt = weights.T
+    for i in range(0, n, step):
+        s = terms[i:i + step] @ wt
+        np.clip(s, 0, 100, out=s)
+        s -= labels[i:i + step, None]
+        if metric == "mae":
+            np.abs(s, out=s)
+        else:
+            np.square(s, out=s)
+        total += s.sum(axis=0)
+    return total / max(n, 1)
+
+
+def _evaluate(job: Tuple[List[Dict], np.ndarray, str]) -> List[Tuple[float, int]]:
+    """(best error, weight index) for each bounds candidate of the job.
+
+    Search scores are float32: half the memory traffic of float64, and far
+    more precision than telling candidates apart needs.
+    """
+    bounds_list, weights, metric = job
+    labels, weights = _labels.astype(np.float32), weights.astype(np.float32)
+    out = []
+    for bounds in bounds_list:
+        errors = batch_errors(factor_terms(_columns, bounds).astype(np.float32), labels, weights, metric)
+        j = int(np.argmin(errors))
+        out.append((float(errors[j]), j))
+    return out
+
+
+def calibrate(columns: Dict[str, np.ndarray], labels: np.ndarray, base: Optional[ScoringConfig] = None,
+              metric: str = "mae", rounds: int = 5, n_bounds: int = 32, n_weights: int = 1024,
+              processes: Optional[int] = None, seed: int = 0, tune_bounds: bool = True,
+              search_rows: Optional[int] = SEARCH_ROWS, log=None) -> Tuple[ScoringConfig, float]:
+    """Random search with refinement over weights (and bounds); returns the best config and its error.
+
+    Every round evaluates n_bounds x n_weights candidates: each bounds
+    candidate gives one terms matrix, scored against all weight candidates
+    in one matrix product. Bounds candidates are spread over a process
+    pool. On datasets larger than `search_rows` the rounds score a random
+    sample of that many rows. The incumbent is always a candidate, so the
+    result is never worse than `base` on the rows searched.
+    """
+    base = base or ScoringConfig()
+    rng = np.random.default_rng(seed)
+    if search_rows and len(labels) > search_rows:
+        rows = np.sort(rng.choice(len(labels), search_rows, replace=False))
+        columns, labels = {k: v[rows] for k, v in columns.items()}, labels[rows]
+    best_bounds, best_w = dict(base.bounds), weight_vector(base.weights)
+    total = float(best_w.sum()) or 100.0
+    best_err = float(batch_errors(factor_terms(columns, best_bounds), labels, best_w[None, :], metric)[0])
+    processes = processes or os.cpu_count() or 1
+    pool = Pool(processes, _init_worker, (columns, labels)) if processes > 1 else None
+    if pool is None:
+        _init_worker(columns, labels)
+    try:
+        for r in range(rounds):
+            first = r == 0
+            bounds_list = (sample_bounds(rng, n_bounds, best_bounds, None if first else 0.25 / 2 ** r)
+                           if tune_bounds else [best_bounds])
+            weights = sample_weights(rng, n_weights, best_w, total, None if first else 20.0 * 4 ** r)
+            chunks = [bounds_list[i::processes] for i in range(min(processes, len(bounds_list)))]
+            jobs = [(chunk, weights, metric) for chunk in chunks]
+            results = pool.map(_evaluate, jobs) if pool else [_evaluate(job) for job in jobs]
+            for chunk, res in zip(chunks, results):
+                for bounds, (err, j) in zip(chunk, res):
+                    if err < best_err:
+                        best_err, best_bounds, best_w = err, bounds, weights[j]
+            if log:
+                print(f"round {r + 1}/{rounds}: {len(bounds_list) * len(weights)} candidates, "
+                      f"best {metric} {best_err:.4f}", file=log)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    weights = {k: round(float(v), 6) for k, v in zip(FACTOR_COLUMNS, best_w)}
+    return ScoringConfig(weights=weights, bounds=best_bounds), best_err
+
+
+def config_error(columns: Dict[str, np.ndarray], labels: np.ndarray, config: ScoringConfig, metric: str) -> float:
+    return float(batch_errors(factor_terms(columns, config.bounds), labels, weight_vector(config.weights)[None, :],
+                              metric)[0])
+
+
+# =========================
+# CLI
+# =========================
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Calibrate scoring weights and bounds against a labelled CSV.")
+    ap.add_argument("dataset", help="CSV with the factor columns and credit_score (or the legacy column names)")
+    ap.add_argument("-o", "--output", default=CONFIG_PATH, help="config file the scorer loads (default: %(default)s)")
+    ap.add_argument("--metric", choices=["mae", "mse"], default="mae")
+    ap.add_argument("--rounds", type=int, default=5)
+    ap.add_argument("--bounds", type=int, default=32, help="bounds candidates per round")
+    ap.add_argument("--weights", type=int, default=1024, help="weight candidates per round")
+    ap.add_argument("--weights-only", action="store_true", help="keep the current bounds")
+    ap.add_argument("--search-rows", type=int, default=SEARCH_ROWS,
+                    help="rows sampled for the search rounds, 0 for all (default: %(default)s)")
+    ap.add_argument("-j", "--processes", type=int, default=None, help="worker processes (default: all cores)")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    columns, labels = load_labelled(args.dataset)
+    base = ScoringConfig.load(args.output) if os.path.exists(args.output) else ScoringConfig()
+    before = config_error(columns, labels, base, args.metric)
+    print(f"{len(labels)} rows, current {args.metric} {before:.4f}", file=sys.stderr)
+
+    t0 = time.perf_counter()
+    config, _ = calibrate(columns, labels, base, args.metric, args.rounds, args.bounds, args.weights,
+                          args.processes, args.seed, not args.weights_only, args.search_rows, log=sys.stderr)
+    elapsed = time.perf_counter() - t0
+    # error of the config exactly as saved (weights are rounded)
+    after = config_error(columns, labels, config, args.metric)
+    if after >= before:
+        print(f"no improvement over {args.output}; not written", file=sys.stderr)
+        return
+    config.save(args.output, calibration={
+        "dataset": os.path.basename(args.dataset), "rows": len(labels), "metric": args.metric,
+        "error": after, "previous_error": before, "seconds": round(elapsed, 2),
+    })
+    print(f"{args.metric} {before:.4f} -> {after:.4f} in {elapsed:.1f}s; wrote {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,38 @@
 
+import threading
 import time
 import requests
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Protocol, Tuple, Union
 import os
 from dotenv import load_dotenv
 from datetime import datetime
-import time
-import requests
+
+import metrics
+from etherscan_rows import Tx, address_bytes, compact_log, compact_tx, parse_rows
+from factors import WalletFactors
+import price_oracle
+from ratelimit import PRIORITY_INTERACTIVE, RequestScheduler
 
 def get_eth_price():
-    url = "https://api.coingecko.com/api/v3/simple/price?ids=ethereum&vs_currencies=usd"
-    resp = requests.get(url)
-    return resp.json()["ethereum"]["usd"]
+    # cached, single-flight ETH/USD from the process-wide provider (see price_oracle)
+    return price_oracle.get_provider().eth_usd()
 
 load_dotenv()
 # =========================
 # Config (mainnet addresses)
 # =========================
 ETHERSCAN_API_KEY = os.getenv("ETHERSCAN_API_KEY")  # get from https://etherscan.io/myapikey
+# optional comma-separated pool of keys; requests are spread across them
+ETHERSCAN_API_KEYS = [k for k in os.getenv("ETHERSCAN_API_KEYS", "").split(",") if k] or [ETHERSCAN_API_KEY]
+ETHERSCAN_RATE_LIMIT = float(os.getenv("ETHERSCAN_RATE_LIMIT", "5"))  # requests/sec per key (free tier: 5)
 BASE_URL = "https://api.etherscan.io/api"
+TX_PAGE_SIZE = 10000  # provider cap on rows per account listing (page * offset <= 10000)
+BALANCEMULTI_LIMIT = 20  # provider cap on addresses per balancemulti call
+LOGS_PAGE_CAP = 1000  # provider cap on rows per getLogs call
+# blocks behind the head that incremental readers stop at: shallow reorgs and a lagging indexer stay out of reach
+CONFIRMATIONS = 3
+# SQLite liquidation index used for borrower lookups by default; empty to query getLogs directly
+LIQUIDATION_INDEX_PATH = os.getenv("LIQUIDATION_INDEX", "liquidations.db")
 
 # Aave v3 Pool (Ethereum mainnet)
 AAVE_V3_POOL = "0x87870Bca3F3fD6335C3F4ce8392D69350B4fA4E2"  # ref: Aave docs/Etherscan
@@ -49,50 +63,149 @@ USDC = "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48"
 DAI  = "0x6B175474E89094C44Da98b954EedeAC495271d0F"
 STABLES = {"USDT": USDT, "USDC": USDC, "DAI": DAI}
 
+# Repay calls counted from the tx history: contract -> (protocol, function-name needles).
+# A tx to the contract counts once per needle its lowercased function name contains.
+REPAY_CALLS: Dict[bytes, Tuple[str, Tuple[str, ...]]] = {
+    address_bytes(AAVE_V3_POOL.lower()): ("aave", ("repay(",)),
+    **{address_bytes(c.lower()): ("compound", ("repayborrow", "repayborrowbehalf")) for c in CTOKENS.values()},
+}
+
+
+class EtherscanError(Exception):
+    """Etherscan answered with an error body (bad key, query timeout, ...)."""
+
+
+class RateLimitError(EtherscanError):
+    """Still rate-limited after the scheduler's retries were exhausted."""
+
+
+# =========================
+# Data source interface
+# =========================
+class DataSource(Protocol):
+    """The chain reads the extractors make. `EtherscanClient` is the default
+    implementation; `rpc_source.JsonRpcDataSource` serves the same calls from a
+    JSON-RPC node, and `WalletContext` memoizes any of them.
+    """
+
+    def iter_txlist(self, address: str, startblock: int = 0, endblock: int = 99999999) -> Iterator[Tx]: ...
+
+    def txlist(self, address: str, startblock: int = 0, endblock: int = 99999999, sort: str = "asc") -> List[Tx]: ...
+
+    def internal_txs(self, address: str, startblock: int = 0, endblock: int = 99999999) -> List[Tx]: ...
+
+    def erc20_transfers(self, address: str, contract_address: Optional[str] = None, sort: str = "asc") -> List[Dict]: ...
+
+    def eth_balance(self, address: str) -> float: ...
+
+    def eth_balances(self, addresses: List[str]) -> Dict[str, float]: ...
+
+    def token_balance(self, token: str, address: str) -> int: ...
+
+    def logs(self, address: str, topic0: Optional[str] = None, from_block: int = 0,
+             to_block: str = "latest") -> List[Dict]: ...
+
+    def borrower_logs(self, address: str, topic0: str, borrower: str, from_block: int = 0,
+                      to_block: str = "latest") -> List[Dict]: ...
+
+    def block_number(self) -> int: ...
+
+    def block_timestamp(self, block: int) -> int: ...
+
 
 # =========================
 # Etherscan client (with tiny convenience layer)
 # =========================
 class EtherscanClient:
-    def __init__(self, api_key: str, base_url: str = BASE_URL):
-        self.api_key = api_key
+    def __init__(self, api_key: Union[str, List[str]], base_url: str = BASE_URL,
+                 scheduler: Optional[RequestScheduler] = None, priority: int = PRIORITY_INTERACTIVE):
+        api_keys = [api_key] if isinstance(api_key, str) or api_key is None else list(api_key)
+        self.api_key = api_keys[0]
         self.base_url = base_url
+        # clients built with the same keys share one scheduler, and therefore one rate budget
+        self.scheduler = scheduler or RequestScheduler.shared(api_keys, ETHERSCAN_RATE_LIMIT)
+        self.priority = priority
+
+    def _get(self, params: Dict, project: Optional[Callable[[Dict], object]] = None) -> Dict:
+        """One API call. With `project`, a list answer is streamed and only `project(row)` is kept per row."""
+        for attempt in range(self.scheduler.max_retries + 1):
+            action = params.get("action")
+            with metrics.timer(metrics.RATELIMIT_WAIT_SECONDS):
+                key = self.scheduler.acquire(self.priority)
+            with metrics.timer(metrics.ETHERSCAN_SECONDS, action=action):
+                resp = requests.get(self.base_url, params={**params, "apikey": key}, timeout=30,
+                                    stream=project is not None)
+                with resp:
+                    if resp.status_code == 429 or resp.status_code >= 500:
+                        metrics.ETHERSCAN_REQUESTS.inc(action=action, outcome=f"http_{resp.status_code}")
+                        self.scheduler.penalize(key, self._retry_after(resp.headers) or self.scheduler.backoff(attempt))
+                        continue
+                    resp.raise_for_status()
+                    if project is None:
+                        data = resp.json()
+                    else:
+                        resp.raw.decode_content = True  # gunzip while streaming
+                        data = parse_rows(resp.raw, project)
+            if self._is_rate_limited(data):
+                metrics.ETHERSCAN_REQUESTS.inc(action=action, outcome="rate_limited")
+                self.scheduler.penalize(key, self.scheduler.backoff(attempt))
+                continue
+            return self._counted(action, data)
+        raise RateLimitError(f"rate limited after {self.scheduler.max_retries + 1} attempts: {params.get('action')}")
+
+    # --- response shapes (shared with async_extractor.AsyncEtherscanClient) ---
+    @staticmethod
+    def _retry_after(headers) -> Optional[float]:
+        try:
+            return float(headers.get("Retry-After"))
+        except (TypeError, ValueError):
+            return None
 
-    def _get(self, params: Dict) -> Dict:
-        params = {**params, "apikey": self.api_key}
-        resp = requests.get(self.base_url, params=params, timeout=30)
-        resp.raise_for_status()
-        data = resp.json()
+    @staticmethod
+    def _is_rate_limited(data) -> bool:
+        # e.g. {"status": "0", "message": "NOTOK", "result": "Max rate limit reached"}
+        return isinstance(data, dict) and isinstance(data.get("result"), str) and "rate limit" in data["result"].lower()
+
+    @staticmethod
+    def _counted(action: Optional[str], data) -> Dict:
+        """`_normalize`, counting the answered attempt as ok or error."""
+        try:
+            data = EtherscanClient._normalize(data)
+        except EtherscanError:
+            metrics.ETHERSCAN_REQUESTS.inc(action=action, outcome="error")
+            raise
+        metrics.ETHERSCAN_REQUESTS.inc(action=action, outcome="ok")
+        return data
+
+    @staticmethod
+    def _normalize(data) -> Dict:
+        # an error body must not be mistaken for an empty result set
+        if isinstance(data, dict) and str(data.get("message", "")).startswith("NOTOK"):
+            raise EtherscanError(str(data.get("result")))
         # Etherscan returns status "1" for success, "0" for no results; always return a normalized shape
         if isinstance(data, dict) and "result" in data:
             return data
         return {"status": "0", "result": []}
 
-    # --- account/txs ---
-    def txlist(self, address: str, startblock: int = 0, endblock: int = 99999999, sort: str = "asc") -> List[Dict]:
-        data = self._get({
-            "module": "account", "action": "txlist",
-            "address": address, "startblock": startblock, "endblock": endblock, "sort": sort
-        })
-        return data.get("result", []) if data.get("status") in ("0", "1") else []
-
-    def erc20_transfers(self, address: str, contract_address: Optional[str] = None, sort: str = "asc") -> List[Dict]:
-        params = {"module": "account", "action": "tokentx", "address": address, "sort": sort}
-        if contract_address:
-            params["contractaddress"] = contract_address
-        data = self._get(params)
+    @staticmethod
+    def _result_list(data: Dict) -> List[Dict]:
         return data.get("result", []) if data.get("status") in ("0", "1") else []
 
-    def eth_balance(self, address: str) -> float:
-        data = self._get({"module": "account", "action": "balance", "address": address, "tag": "latest"})
+    @staticmethod
+    def _result_eth(data: Dict) -> float:
         if data.get("status") == "1":
             return int(data["result"]) / 1e18
         return 0.0
 
-    def token_balance(self, token: str, address: str) -> int:
-        data = self._get({
-            "module": "account", "action": "tokenbalance", "contractaddress": token, "address": address, "tag": "latest"
-        })
+    @staticmethod
+    def _result_balances(data: Dict) -> Dict[str, float]:
+        """balancemulti answer -> {address (lowercase): ETH}."""
+        if data.get("status") != "1":
+            return {}
+        return {row["account"].lower(): int(row["balance"]) / 1e18 for row in data["result"]}
+
+    @staticmethod
+    def _result_int(data: Dict) -> int:
         if data.get("status") in ("0", "1"):
             # When there are no tokens held, Etherscan returns status "0" with result "0"
             try:
@@ -101,23 +214,257 @@ class EtherscanClient:
                 return 0
         return 0
 
+    # --- account/txs ---
+    def iter_txlist(self, address: str, startblock: int = 0, endblock: int = 99999999,
+                    page_size: int = TX_PAGE_SIZE) -> Iterator[Tx]:
+        """Yield the wallet's normal transactions (compact `Tx` rows) in ascending order, one block-range page at a time."""
+        params = {"module": "account", "action": "txlist", "address": address}
+        yield from self._iter_pages(BlockPager(params, startblock, endblock, page_size), compact_tx)
+
+    def iter_internal_txs(self, address: str, startblock: int = 0, endblock: int = 99999999,
+                          page_size: int = TX_PAGE_SIZE) -> Iterator[Tx]:
+        """ETH moved to or from the wallet by contract calls (`txlistinternal`), as compact `Tx` rows."""
+        params = {"module": "account", "action": "txlistinternal", "address": address}
+        yield from self._iter_pages(BlockPager(params, startblock, endblock, page_size), compact_tx)
+
+    def iter_erc20_transfers(self, address: str, contract_address: Optional[str] = None, startblock: int = 0,
+                             endblock: int = 99999999, page_size: int = TX_PAGE_SIZE) -> Iterator[Dict]:
+        params = {"module": "account", "action": "tokentx", "address": address}
+        if contract_address:
+            params["contractaddress"] = contract_address
+        yield from self._iter_pages(BlockPager(params, startblock, endblock, page_size))
+
+    def _iter_pages(self, pager: "BlockPager", project: Optional[Callable[[Dict], object]] = None) -> Iterator:
+        while not pager.done:
+            yield from pager.feed(self._result_list(self._get(pager.params(), project)))
+
+    def txlist(self, address: str, startblock: int = 0, endblock: int = 99999999, sort: str = "asc") -> List[Tx]:
+        txs = list(self.iter_txlist(address, startblock=startblock, endblock=endblock))
+        return txs if sort == "asc" else txs[::-1]
+
+    def internal_txs(self, address: str, startblock: int = 0, endblock: int = 99999999) -> List[Tx]:
+        return list(self.iter_internal_txs(address, startblock=startblock, endblock=endblock))
+
+    def erc20_transfers(self, address: str, contract_address: Optional[str] = None, sort: str = "asc") -> List[Dict]:
+        transfers = list(self.iter_erc20_transfers(address, contract_address=contract_address))
+        return transfers if sort == "asc" else transfers[::-1]
+
+    def eth_balance(self, address: str) -> float:
+        data = self._get({"module": "account", "action": "balance", "address": address, "tag": "latest"})
+        return self._result_eth(data)
+
+    def eth_balances(self, addresses: List[str]) -> Dict[str, float]:
+        """ETH balance of many addresses, BALANCEMULTI_LIMIT per call; keys are lowercase."""
+        out: Dict[str, float] = {}
+        for i in range(0, len(addresses), BALANCEMULTI_LIMIT):
+            chunk = addresses[i:i + BALANCEMULTI_LIMIT]
+            data = self._get({"module": "account", "action": "balancemulti", "address": ",".join(chunk), "tag": "latest"})
+            out.update(self._result_balances(data))
+        return out
+
+    def token_balance(self, token: str, address: str) -> int:
+        data = self._get({
+            "module": "account", "action": "tokenbalance", "contractaddress": token, "address": address, "tag": "latest"
+        })
+        return self._result_int(data)
+
     # --- logs ---
-    def logs(self, address: str, topic0: Optional[str] = None, from_block: int = 0, to_block: str = "latest") -> List[Dict]:
-        params = {
-            "module": "logs", "action": "getLogs",
-            "fromBlock": from_block, "toBlock": to_block, "address": address,
-        }
+    def iter_logs(self, address: str, topic0: Optional[str] = None, from_block: int = 0,
+                  to_block: Union[int, str] = "latest", page_size: int = LOGS_PAGE_CAP) -> Iterator[Dict]:
+        """Yield the contract's event logs in ascending order, one block-range page at a time."""
+        params = {"module": "logs", "action": "getLogs", "address": address}
         if topic0:
             params["topic0"] = topic0
-        data = self._get(params)
-        return data.get("result", []) if data.get("status") in ("0", "1") else []
+        yield from self._iter_pages(LogPager(params, from_block, to_block, page_size), compact_log)
+
+    def logs(self, address: str, topic0: Optional[str] = None, from_block: int = 0, to_block: str = "latest") -> List[Dict]:
+        return list(self.iter_logs(address, topic0=topic0, from_block=from_block, to_block=to_block))
+
+    def borrower_logs(self, address: str, topic0: str, borrower: str, from_block: int = 0,
+                      to_block: str = "latest") -> List[Dict]:
+        logs = self.logs(address, topic0=topic0, from_block=from_block, to_block=to_block)
+        return filter_logs_by_borrower(logs, borrower)
+
+    # --- chain head ---
+    def block_number(self) -> int:
+        data = self._get({"module": "proxy", "action": "eth_blockNumber"})
+        return int(data["result"], 16)
+
+    def block_timestamp(self, block: int) -> int:
+        """Unix time of a mined block (getblockreward carries it)."""
+        data = self._get({"module": "block", "action": "getblockreward", "blockno": block})
+        if data.get("status") != "1" or not isinstance(data.get("result"), dict):
+            raise EtherscanError(f"getblockreward {block}: {data.get('result')}")
+        return int(data["result"]["timeStamp"])
+
+
+class BlockPager:
+    """Walks an ascending Etherscan account listing by block range.
+
+    The provider caps one listing at TX_PAGE_SIZE rows. When a page comes back
+    full, the next request starts at the last block seen; rows of that block
+    that were already yielded are dropped, so nothing is truncated or repeated.
+    """
+
+    def __init__(self, params: Dict, startblock: int, endblock: int, page_size: int = TX_PAGE_SIZE):
+        self.base = params
+        self.cursor = startblock
+        self.endblock = endblock
+        self.page_size = page_size
+        self.done = startblock > endblock
+        self._boundary: set = set()  # ids of rows already yielded from block `cursor`
+
+    def params(self) -> Dict:
+        return {**self.base, "startblock": self.cursor, "endblock": self.endblock,
+                "page": 1, "offset": self.page_size, "sort": "asc"}
+
+    def feed(self, rows: List[Dict]) -> List[Dict]:
+        """Take one page; returns the rows not seen before and advances the cursor."""
+        fresh = [r for r in rows if not (self._block(r) == self.cursor and self._row_id(r) in self._boundary)]
+        if len(rows) < self.page_size:
+            self.done = True
+            return fresh
+        last_block = self._block(rows[-1])
+        if last_block == self.cursor:
+            # a single block holds more rows than one page; skip past it rather than loop forever
+            self.cursor, self._boundary = last_block + 1, set()
+        else:
+            self.cursor = last_block
+            self._boundary = {self._row_id(r) for r in rows if self._block(r) == last_block}
+        self.done = self.cursor > self.endblock
+        return fresh
+
+    @staticmethod
+    def _block(row) -> int:
+        # account listings give decimal block numbers, getLogs hex ones
+        return row.block if isinstance(row, Tx) else int(row["blockNumber"], 0)
+
+    @staticmethod
+    def _row_id(row) -> tuple:
+        if isinstance(row, Tx):
+            # internal txs share their parent's hash; the trace (and, without one, the transfer) tells them apart
+            return row.hash, row.trace, row.sender, row.to, row.value
+        return row.get("hash") or row.get("transactionHash"), row.get("logIndex")
+
+
+class LogPager(BlockPager):
+    """BlockPager for getLogs, whose range is fromBlock/toBlock and whose pages hold LOGS_PAGE_CAP rows."""
+
+    def __init__(self, params: Dict, from_block: int, to_block: Union[int, str] = "latest",
+                 page_size: int = LOGS_PAGE_CAP):
+        super().__init__(params, int(from_block), 99999999 if to_block == "latest" else int(to_block), page_size)
+
+    def params(self) -> Dict:
+        return {**self.base, "fromBlock": self.cursor, "toBlock": self.endblock, "page": 1, "offset": self.page_size}
+
+
+# =========================
+# Shared liquidation index
+# =========================
+_liquidation_index = None
+_liquidation_index_lock = threading.Lock()
+
 
+def get_liquidation_index():
+    """Process-wide LiquidationIndex at LIQUIDATION_INDEX_PATH, opened on first use; None if that is empty."""
+    global _liquidation_index
+    with _liquidation_index_lock:
+        if _liquidation_index is None and LIQUIDATION_INDEX_PATH:
+            from liquidation_index import LiquidationIndex  # it imports this module
+            _liquidation_index = LiquidationIndex(LIQUIDATION_INDEX_PATH)
+        return _liquidation_index
 
 
-def compute_debt_utilization(address: str, api: EtherscanClient) -> float:
-    # protocol data
-    aave = Extractors.aave_v3(address, api)
-    comp = Extractors.compound_v2(address, api)
+def set_liquidation_index(index):
+    """Replace the shared index (e.g. an in-memory one for benchmarks); None reopens the default on next use."""
+    global _liquidation_index
+    with _liquidation_index_lock:
+        _liquidation_index = index
+
+
+# =========================
+# Per-wallet fetch context
+# =========================
+class WalletContext:
+    """Memoizing view over a DataSource for scoring a single wallet.
+
+    Exposes the same read methods as the client, but each distinct call is sent
+    at most once; every extractor that receives the context shares the results.
+    """
+
+    def __init__(self, api: DataSource, index=None):
+        self.api = api
+        # liquidation_index.LiquidationIndex answering borrower_logs locally; None uses the shared one
+        self.index = index
+        self._cache: Dict[tuple, object] = {}
+
+    @staticmethod
+    def key(*parts) -> tuple:
+        """Cache key for one call: method name plus its arguments, addresses lowercased."""
+        return tuple(p.lower() if isinstance(p, str) else p for p in parts)
+
+    def prime(self, value, *parts):
+        """Store an already-fetched result (e.g. from an async fan-out) under `key(*parts)`."""
+        self._cache[self.key(*parts)] = value
+
+    def _memo(self, key: tuple, fetch):
+        if key not in self._cache:
+            self._cache[key] = fetch()
+        return self._cache[key]
+
+    def iter_txlist(self, address: str, startblock: int = 0, endblock: int = 99999999) -> Iterator[Tx]:
+        """The memoized (or primed) list if there is one, else a stream that is not kept."""
+        key = self.key("txlist", address, startblock, endblock, "asc")
+        if key in self._cache:
+            return iter(self._cache[key])
+        return self.api.iter_txlist(address, startblock=startblock, endblock=endblock)
+
+    def txlist(self, address: str, startblock: int = 0, endblock: int = 99999999, sort: str = "asc") -> List[Dict]:
+        key = self.key("txlist", address, startblock, endblock, sort)
+        return self._memo(key, lambda: self.api.txlist(address, startblock=startblock, endblock=endblock, sort=sort))
+
+    def internal_txs(self, address: str, startblock: int = 0, endblock: int = 99999999) -> List[Tx]:
+        key = self.key("txlistinternal", address, startblock, endblock)
+        return self._memo(key, lambda: self.api.internal_txs(address, startblock=startblock, endblock=endblock))
+
+    def erc20_transfers(self, address: str, contract_address: Optional[str] = None, sort: str = "asc") -> List[Dict]:
+        key = self.key("tokentx", address, contract_address or "", sort)
+        return self._memo(key, lambda: self.api.erc20_transfers(address, contract_address=contract_address, sort=sort))
+
+    def eth_balance(self, address: str) -> float:
+        key = self.key("balance", address)
+        return self._memo(key, lambda: self.api.eth_balance(address))
+
+    def token_balance(self, token: str, address: str) -> int:
+        key = self.key("tokenbalance", token, address)
+        return self._memo(key, lambda: self.api.token_balance(token, address))
+
+    def logs(self, address: str, topic0: Optional[str] = None, from_block: int = 0, to_block: str = "latest") -> List[Dict]:
+        key = self.key("getLogs", address, topic0 or "", from_block, to_block)
+        return self._memo(key, lambda: self.api.logs(address, topic0=topic0, from_block=from_block, to_block=to_block))
+
+    def borrower_logs(self, address: str, topic0: str, borrower: str, from_block: int = 0,
+                      to_block: str = "latest") -> List[Dict]:
+        key = self.key("borrowerLogs", address, topic0, borrower, from_block, to_block)
+        if key in self._cache:
+            return self._cache[key]  # primed: no index to open
+        index = self.index if self.index is not None else get_liquidation_index()
+        if index is not None:
+            return self._memo(key, lambda: index.borrower_logs(address, topic0, borrower, self.api,
+                                                               from_block=from_block, to_block=to_block))
+        return self._memo(key, lambda: self.api.borrower_logs(address, topic0, borrower,
+                                                              from_block=from_block, to_block=to_block))
+
+    def block_timestamp(self, block: int) -> int:
+        return self._memo(("blockTime", block), lambda: self.api.block_timestamp(block))
+
+
+def compute_debt_utilization(address: str, api: DataSource,
+                             aave: Optional[Dict] = None, comp: Optional[Dict] = None,
+                             stake: Optional[Dict] = None, eth_usd: Optional[float] = None) -> float:
+    # protocol data (callers that already ran the extractors can pass their results in)
+    aave = aave if aave is not None else Extractors.aave_v3(address, api)
+    comp = comp if comp is not None else Extractors.compound_v2(address, api)
     total_liqs = aave["liquidations"] + comp["liquidations"]
     total_repays = aave["repays"] + comp["repays"]
 
@@ -126,14 +473,13 @@ def compute_debt_utilization(address: str, api: EtherscanClient) -> float:
 
     # portfolio value in USD
     eth_balance = api.eth_balance(address)
-    stake = Extractors.staking_balances(address, api)
+    stake = stake if stake is not None else Extractors.staking_balances(address, api)
     staked_eth = stake["steth"] + stake["reth"]
     usdt = api.token_balance(USDT, address) / 1e6
     usdc = api.token_balance(USDC, address) / 1e6
     dai  = api.token_balance(DAI, address)  / 1e18
     stable_usd = usdt + usdc + dai
-    eth_usd = get_eth_price()
-    print(eth_usd)
+    eth_usd = eth_usd if eth_usd is not None else get_eth_price()
     collateral_usd = (eth_balance + staked_eth) * eth_usd + stable_usd
 
     if (total_borrows + collateral_usd) == 0:
@@ -152,27 +498,107 @@ def pad_topic_address(addr: str) -> str:
     return "0x" + ("0" * 24) + a
 
 
-def count_tx_calls_to(txs: List[Dict], target: str, name_contains: str) -> int:
-    target_low = target.lower()
-    needle = name_contains.lower()
-    c = 0
-    for t in txs:
-        to_addr = (t.get("to") or "").lower()
-        fn = (t.get("functionName") or "").lower()
-        if to_addr == target_low and needle in fn:
-            c += 1
-    return c
+def tx_activity(txs: Iterable[Tx], address: str) -> Dict:
+    """Every tx-derived aggregate the factors need, in one pass over ascending txs.
+
+    `txs` may be a list or a stream (`iter_txlist`). Repay calls are found
+    with a dict lookup on `to` (REPAY_CALLS); the needle match runs once per
+    distinct (contract, function name), not once per tx. Mergeable, see
+    merge_tx_activity.
+    """
+    me = address_bytes(address.lower())
+    repay_calls = REPAY_CALLS
+    hits: Dict[Tuple[bytes, str], int] = {}
+    by_contract: Dict[bytes, int] = {}
+    tx_count = 0
+    first_ts = last_ts = last_block = last_inbound = last_outbound = None
+    for tx in txs:
+        tx_count += 1
+        ts = tx.ts
+        if first_ts is None:
+            first_ts = ts
+        last_ts, last_block = ts, tx.block
+        to = tx.to
+        if to == me:
+            last_inbound = ts
+        elif tx.sender == me:
+            last_outbound = ts
+        spec = repay_calls.get(to)
+        if spec is not None:
+            n = hits.get((to, tx.fn))
+            if n is None:
+                n = hits[(to, tx.fn)] = sum(needle in tx.fn for needle in spec[1])
+            if n:
+                by_contract[to] = by_contract.get(to, 0) + n
+    repays = {"aave": 0, "compound": 0}
+    for contract, n in by_contract.items():
+        repays[repay_calls[contract][0]] += n
+    return {
+        "tx_count": tx_count,
+        "first_ts": first_ts,
+        "last_ts": last_ts,
+        "last_block": last_block,
+        "last_inbound": last_inbound,
+        "last_outbound": last_outbound,
+        "aave_repays": repays["aave"],
+        "compound_repays": repays["compound"],
+        "repays_by_contract": {"0x" + c.hex(): n for c, n in by_contract.items()},
+    }
+
+
+def merge_tx_activity(old: Dict, new: Dict) -> Dict:
+    """Combine the activity of an earlier block range (`old`) with a later one (`new`)."""
+    later = lambda k: new[k] if new[k] is not None else old[k]
+    return {
+        "tx_count": old["tx_count"] + new["tx_count"],
+        "first_ts": old["first_ts"] if old["first_ts"] is not None else new["first_ts"],
+        "last_ts": later("last_ts"),
+        "last_block": later("last_block"),
+        "last_inbound": later("last_inbound"),
+        "last_outbound": later("last_outbound"),
+        "aave_repays": old["aave_repays"] + new["aave_repays"],
+        "compound_repays": old["compound_repays"] + new["compound_repays"],
+        # not persisted by factor_cache, so an `old` read back from it has none
+        "repays_by_contract": {
+            c: old.get("repays_by_contract", {}).get(c, 0) + new.get("repays_by_contract", {}).get(c, 0)
+            for c in {**old.get("repays_by_contract", {}), **new.get("repays_by_contract", {})}
+        },
+    }
+
+
+def tenure_days(last_inbound: Optional[int], last_outbound: Optional[int]) -> int:
+    if not last_inbound:
+        return 0  # never staked
+
+    # If last outbound is after last inbound, user is not staked now
+    if last_outbound and last_outbound > last_inbound:
+        return 0
+
+    # Otherwise, staking is still active since last inbound
+    start_date = datetime.utcfromtimestamp(last_inbound)
+    return (datetime.utcnow() - start_date).days
+
+
+@metrics.timed(metrics.FILTER_LOGS_SECONDS)
+def borrower_words(log: Dict) -> List[str]:
+    """Topic-encoded words of a liquidation log that may name the borrower.
+
+    Every topic after the signature, plus data word 1 of Compound's
+    LiquidateBorrow(liquidator, borrower, ...), which indexes nothing.
+    """
+    topics = [t.lower() for t in log.get("topics", []) if t]
+    words = topics[1:]
+    if topics and topics[0] == COMPOUND_LIQUIDATEBORROW_TOPIC.lower():
+        data = (log.get("data") or "0x")[2:].lower()
+        if len(data) >= 128:
+            words.append("0x" + data[64:128])
+    return words
 
 
 def filter_logs_by_borrower(logs: List[Dict], borrower: str) -> List[Dict]:
-    """Keep logs where ANY topic equals the borrower (topic-encoded)."""
+    """Keep logs naming the borrower (topic-encoded) in any of their `borrower_words`."""
     borrower_topic = pad_topic_address(borrower)
-    kept = []
-    for l in logs:
-        topics = [t.lower() for t in l.get("topics", [])]
-        if borrower_topic in topics:
-            kept.append(l)
-    return kept
+    return [l for l in logs if borrower_topic in borrower_words(l)]
 
 
 # =========================
@@ -180,96 +606,83 @@ def filter_logs_by_borrower(logs: List[Dict], borrower: str) -> List[Dict]:
 # =========================
 class Extractors:
     @staticmethod
-    def aave_v3(address: str, api: EtherscanClient) -> Dict:
+    @metrics.timed(metrics.EXTRACTOR_SECONDS, extractor="aave_v3")
+    def aave_v3(address: str, api: DataSource, activity: Optional[Dict] = None) -> Dict:
         # Count user-initiated repayments via txlist to the Pool contract
-        user_txs = api.txlist(address)
-        repay_count = count_tx_calls_to(user_txs, AAVE_V3_POOL, "repay(")
+        activity = activity if activity is not None else tx_activity(api.iter_txlist(address), address)
+        repay_count = activity["aave_repays"]
 
         # Count liquidations where the user was the borrower via logs
-        liq_logs = api.logs(AAVE_V3_POOL, topic0=AAVE_LIQUIDATIONCALL_TOPIC)
-        liq_logs = filter_logs_by_borrower(liq_logs, address)
+        liq_logs = api.borrower_logs(AAVE_V3_POOL, AAVE_LIQUIDATIONCALL_TOPIC, address)
         return {"repays": repay_count, "liquidations": len(liq_logs)}
 
     @staticmethod
-    def compound_v2(address: str, api: EtherscanClient) -> Dict:
-        user_txs = api.txlist(address)
-        repay_count = 0
-        for symbol, ctoken in CTOKENS.items():
-            repay_count += count_tx_calls_to(user_txs, ctoken, "repayborrow")
-            repay_count += count_tx_calls_to(user_txs, ctoken, "repayborrowbehalf")
+    @metrics.timed(metrics.EXTRACTOR_SECONDS, extractor="compound_v2")
+    def compound_v2(address: str, api: DataSource, activity: Optional[Dict] = None) -> Dict:
+        activity = activity if activity is not None else tx_activity(api.iter_txlist(address), address)
+        repay_count = activity["compound_repays"]
 
         # Liquidations: emitted from cToken contracts targeting the borrower
         liqs = 0
         for symbol, ctoken in CTOKENS.items():
-            logs = api.logs(ctoken, topic0=COMPOUND_LIQUIDATEBORROW_TOPIC)
-            logs = filter_logs_by_borrower(logs, address)
+            logs = api.borrower_logs(ctoken, COMPOUND_LIQUIDATEBORROW_TOPIC, address)
             liqs += len(logs)
         return {"repays": repay_count, "liquidations": liqs}
 
     @staticmethod
-    def staking_balances(address: str, api: EtherscanClient) -> Dict:
+    @metrics.timed(metrics.EXTRACTOR_SECONDS, extractor="staking_balances")
+    def staking_balances(address: str, api: DataSource) -> Dict:
         steth_wei = api.token_balance(STETH, address)
         reth_wei = api.token_balance(RETH, address)
         return {"steth": steth_wei / 1e18, "reth": reth_wei / 1e18}
     
     @staticmethod
-    def staking_tenure_days(address: str, api: EtherscanClient) -> int:
-        txs = api.txlist(address, sort="asc")
-        if not txs:
-            return 0  
-
-        address = address.lower()
+    @metrics.timed(metrics.EXTRACTOR_SECONDS, extractor="staking_tenure_days")
+    def staking_tenure_days(address: str, api: DataSource, activity: Optional[Dict] = None) -> int:
+        activity = activity if activity is not None else tx_activity(api.iter_txlist(address), address)
+        return tenure_days(activity["last_inbound"], activity["last_outbound"])
 
-        last_inbound = None
-        last_outbound = None
 
-        # track last inbound and outbound timestamps
-        for tx in txs:
-            ts = int(tx["timeStamp"])
-            if tx["to"].lower() == address:
-                last_inbound = ts
-            elif tx["from"].lower() == address:
-                last_outbound = ts
+# =========================
+# Wallet-level factor extraction
+# =========================
+def extract_wallet_factors(address: str, api: Optional[DataSource] = None, eth_usd: Optional[float] = None,
+                           index=None) -> WalletFactors:
+    api = api or EtherscanClient(ETHERSCAN_API_KEY)
+    # every extractor below shares one context, so each endpoint is hit once per wallet
+    if not isinstance(api, WalletContext):
+        api = WalletContext(api, index=index)
 
-        if not last_inbound:
-            return 0  # never staked
+    # --- activity: one pass over the history, streamed unless a list was primed
+    activity = tx_activity(api.iter_txlist(address), address)
 
-        # If last outbound is after last inbound, user is not staked now
-        if last_outbound and last_outbound > last_inbound:
-            return 0
+    # --- protocol interactions
+    aave = Extractors.aave_v3(address, api, activity)
+    comp = Extractors.compound_v2(address, api, activity)
 
-        # Otherwise, staking is still active since last inbound
-        start_date = datetime.utcfromtimestamp(last_inbound)
-        days = (datetime.utcnow() - start_date).days
-        return days
+    return wallet_factors(address, api, activity, aave, comp, eth_usd=eth_usd)
 
 
-# =========================
-# Wallet-level factor extraction
-# =========================
-def extract_wallet_factors(address: str, api: Optional[EtherscanClient] = None, eth_usd: Optional[float] = None) -> Dict:
-    api = api or EtherscanClient(ETHERSCAN_API_KEY)
+def wallet_factors(address: str, api: DataSource, activity: Dict, aave: Dict, comp: Dict,
+                   eth_usd: Optional[float] = None) -> WalletFactors:
+    """Factors from tx aggregates and protocol counts; balances are read from `api`.
 
+    Shared by extract_wallet_factors and factor_cache, which keeps the
+    aggregates between runs instead of re-reading the whole history.
+    """
     # --- balances & activity
     eth_balance = api.eth_balance(address)
-    txs = api.txlist(address)
-    tx_count = len(txs)
+    tx_count = activity["tx_count"]
     if tx_count:
-        first_ts = int(txs[0]["timeStamp"])  # asc order
-        last_ts = int(txs[-1]["timeStamp"])
-        days = max(1, (last_ts - first_ts) / (60 * 60 * 24))
+        days = max(1, (activity["last_ts"] - activity["first_ts"]) / (60 * 60 * 24))
         avg_tx_per_day = tx_count / days
     else:
         avg_tx_per_day = 0.0
 
-    # --- protocol interactions
-    aave = Extractors.aave_v3(address, api)
-    comp = Extractors.compound_v2(address, api)
-
     # --- staking
     stake = Extractors.staking_balances(address, api)
     staking_amount_eth = stake["steth"] + stake["reth"]
-    staking_tenure = Extractors.staking_tenure_days(address, api)
+    staking_tenure = tenure_days(activity["last_inbound"], activity["last_outbound"])
 
     # --- stablecoin ratio (by balance weight in USD)
     usdt = api.token_balance(USDT, address) / 1e6  # 6 decimals
@@ -278,8 +691,8 @@ def extract_wallet_factors(address: str, api: Optional[EtherscanClient] = None,
     stable_usd = usdt + usdc + dai  # assume $1 pegs
 
     if eth_usd is None:
-        # fallback so tests can inject a stable value; avoids hitting an extra endpoint
-        eth_usd = 3000.0
+        # one price for every factor of this wallet; tests inject one via price_oracle.set_provider
+        eth_usd = get_eth_price()
     portfolio_usd = eth_balance * eth_usd + staking_amount_eth * eth_usd + stable_usd
     stablecoin_ratio = (stable_usd / portfolio_usd) if portfolio_usd > 0 else 0.0
 
@@ -289,19 +702,18 @@ def extract_wallet_factors(address: str, api: Optional[EtherscanClient] = None,
     on_time_repayment_rate = total_repays / max(1, (total_repays + total_liqs))
 
     # debt utilization would need credit line data (per-protocol); placeholder for now
-    debt_utilization = compute_debt_utilization(address, api)
-    return {
-        "on_time_repayment_rate": on_time_repayment_rate,
-        "default_count": total_liqs,
-        "avg_tx_frequency": avg_tx_per_day,
-        "avg_balance_usd": eth_balance * eth_usd,  
-        "stablecoin_ratio": stablecoin_ratio,
-        "debt_utilization": debt_utilization,
-        "staking_amount_eth": staking_amount_eth,
-        "staking_tenure_days": staking_tenure,  
-        "detail": {"aave": aave, "compound": comp, "staking": stake, "stable_usd": stable_usd},
-    }
-
+    debt_utilization = compute_debt_utilization(address, api, aave=aave, comp=comp, stake=stake, eth_usd=eth_usd)
+    return WalletFactors(
+        on_time_repayment_rate=on_time_repayment_rate,
+        default_count=total_liqs,
+        avg_tx_frequency=avg_tx_per_day,
+        avg_balance_usd=eth_balance * eth_usd,
+        stablecoin_ratio=stablecoin_ratio,
+        debt_utilization=debt_utilization,
+        staking_amount_eth=staking_amount_eth,
+        staking_tenure_days=staking_tenure,
+        detail={"aave": aave, "compound": comp, "staking": stake, "stable_usd": stable_usd},
+    )
 
 
 
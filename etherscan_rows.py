@@ -0,0 +1,132 @@
+import json
+import sys
+from typing import Callable, Dict, List, Optional
+
+try:
+    import ijson  # streaming parser; the C (yajl2_c) backend is picked automatically when built
+except ImportError:
+    ijson = None
+
+# an answer without rows (error, rate limit, "No transactions found") is always small
+HEAD_LIMIT = 64 * 1024
+
+
+# =========================
+# Compact rows
+# =========================
+class Tx:
+    """The fields of an Etherscan `txlist` row the factors use, in compact form.
+
+    Addresses and the hash are raw bytes (lowercase by construction),
+    block and timestamp are ints, and the function name is lowercased and
+    interned (a wallet calls the same few functions over and over). `value`
+    (0 for a failed tx) and `fee` are wei, for the balance history. `trace`
+    is the traceId of an internal tx ("" for a normal one): the internal
+    txs of one transaction share its hash.
+    """
+
+    __slots__ = ("block", "ts", "sender", "to", "fn", "hash", "value", "fee", "trace")
+
+    def __init__(self, block: int, ts: int, sender: bytes, to: bytes, fn: str, hash: bytes,
+                 value: int = 0, fee: int = 0, trace: str = ""):
+        self.block = block
+        self.ts = ts
+        self.sender = sender
+        self.to = to
+        self.fn = fn
+        self.hash = hash
+        self.value = value
+        self.fee = fee
+        self.trace = trace
+
+    def __repr__(self) -> str:
+        return f"Tx(block={self.block}, ts={self.ts}, sender=0x{self.sender.hex()}, to=0x{self.to.hex()}, fn={self.fn!r})"
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Tx) and self.hash == other.hash and self.trace == other.trace
+
+    def __hash__(self) -> int:
+        return hash((self.hash, self.trace))
+
+
+def address_bytes(addr: Optional[str]) -> bytes:
+    """20-byte form of a hex address ("" / None -> b"", e.g. the `to` of a contract creation)."""
+    return bytes.fromhex(addr[2:]) if addr else b""
+
+
+def compact_tx(row: Dict) -> Tx:
+    """`txlist` and `txlistinternal` rows alike (internal rows have no function name and no fee of their own)."""
+    failed = row.get("isError") == "1"
+    return Tx(
+        int(row["blockNumber"]), int(row["timeStamp"]),
+        address_bytes(row.get("from")), address_bytes(row.get("to")),
+        sys.intern((row.get("functionName") or "").lower()), bytes.fromhex(row["hash"][2:]),
+        0 if failed else int(row.get("value") or 0), int(row.get("gasUsed") or 0) * int(row.get("gasPrice") or 0),
+        sys.intern(row.get("traceId") or ""),
+    )
+
+
+LOG_FIELDS = ("address", "topics", "data", "blockNumber", "timeStamp", "logIndex", "transactionHash")
+
+
+def compact_log(row: Dict) -> Dict:
+    """Log rows keep their dict shape (the liquidation index stores them) minus gas and index fields."""
+    return {k: row[k] for k in LOG_FIELDS if k in row}
+
+
+# =========================
+# Streaming parse
+# =========================
+class _HeadTap:
+    """File wrapper that keeps the first HEAD_LIMIT bytes it hands out."""
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.head = bytearray()
+
+    def _keep(self, chunk: bytes) -> bytes:
+        if len(self.head) < HEAD_LIMIT:
+            self.head += chunk[:HEAD_LIMIT - len(self.head)]
+        return chunk
+
+    def read(self, n: int = -1) -> bytes:
+        return self._keep(self.fp.read(n))
+
+
+class _AsyncHeadTap(_HeadTap):
+    async def read(self, n: int = -1) -> bytes:
+        return self._keep(await self.fp.read(n))
+
+
+def _answer(rows: List, tap: _HeadTap) -> Dict:
+    if rows:
+        return {"status": "1", "message": "OK", "result": rows}
+    # no rows: the whole (small) body is in the head; hand it to the usual status handling
+    return json.loads(bytes(tap.head))
+
+
+def parse_rows(fp, project: Callable[[Dict], object]) -> Dict:
+    """Parse an Etherscan list answer from a binary stream, keeping only `project(row)` per row.
+
+    Rows are built one at a time from the stream, so the full body and the
+    full-width dicts never exist at once. Without ijson the body is parsed
+    whole and projected afterwards.
+    """
+    if ijson is None:
+        data = json.load(fp)
+        if isinstance(data, dict) and isinstance(data.get("result"), list):
+            data["result"] = [project(r) for r in data["result"]]
+        return data
+    tap = _HeadTap(fp)
+    return _answer([project(r) for r in ijson.items(tap, "result.item")], tap)
+
+
+async def parse_rows_async(stream, project: Callable[[Dict], object]) -> Dict:
+    """`parse_rows` for an aiohttp response body (`resp.content`)."""
+    if ijson is None:
+        data = json.loads(await stream.read())
+        if isinstance(data, dict) and isinstance(data.get("result"), list):
+            data["result"] = [project(r) for r in data["result"]]
+        return data
+    tap = _AsyncHeadTap(stream)
+    return _answer([project(r) async for r in ijson.items(tap, "result.item")], tap)
@@ -0,0 +1,510 @@
+# Local Etherscan stand-in for benchmarks and offline runs: answers txlist, txlistinternal, tokentx, balance,
+# balancemulti, tokenbalance, getLogs and eth_blockNumber from a fixture file (recorded through
+# --record or generated with generate_fixtures), with configurable latency and a per-key rate
+# limit. POSTs to /rpc are answered as a JSON-RPC node (balanceOf eth_calls, eth_getBalance,
+# eth_getLogs with topic filters, eth_blockNumber, eth_getBlockByNumber; single or batched) from
+# the same fixtures. `Fixtures.mine` and `Fixtures.reorg` make it a small dev chain for the follower.
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlparse
+
+import requests
+
+from balances import BALANCE_OF
+from dataExtractor import (
+    AAVE_LIQUIDATIONCALL_TOPIC, AAVE_V3_POOL, COMPOUND_LIQUIDATEBORROW_TOPIC, CTOKENS, DAI, RETH, STETH, USDC,
+    LOGS_PAGE_CAP, USDT, TX_PAGE_SIZE, pad_topic_address,
+)
+from ratelimit import TokenBucket
+
+RATE_LIMITED = {"status": "0", "message": "NOTOK", "result": "Max rate limit reached"}
+NO_RECORDS = {"status": "0", "message": "No transactions found", "result": []}
+RPC_LOGS_LIMIT = 10_000  # eth_getLogs results per query, as common providers enforce
+
+
+def _etherscan_hex(n: int) -> str:
+    # getLogs quantities as Etherscan writes them: zero is a bare "0x"
+    return hex(n) if n else "0x"
+
+
+def _hex_value(s: str) -> int:
+    return int(s, 16) if s not in ("", "0x") else 0
+
+
+# =========================
+# Fixture store
+# =========================
+class Fixtures:
+    """Rows per (action, address[, contract]) plus scalar balances; answers queries the way Etherscan does."""
+
+    def __init__(self, head: int = 20_000_000):
+        self.head = head
+        self.txlist: Dict[str, List[Dict]] = defaultdict(list)
+        self.txlistinternal: Dict[str, List[Dict]] = defaultdict(list)
+        self.tokentx: Dict[str, List[Dict]] = defaultdict(list)
+        self.balance: Dict[str, str] = {}
+        self.tokenbalance: Dict[str, str] = {}  # "token:address"
+        self.logs: Dict[str, List[Dict]] = defaultdict(list)  # "contract:topic0"
+        self.block_txs: Dict[int, List[Dict]] = {}  # mined blocks only
+        self.forks: List[int] = []  # first block number of every reorg; changes the hashes from there on
+        self._lock = threading.Lock()
+
+    # --- persistence ---
+    def to_json(self) -> Dict:
+        return {"head": self.head, "txlist": self.txlist, "txlistinternal": self.txlistinternal,
+                "tokentx": self.tokentx, "balance": self.balance,
+                "tokenbalance": self.tokenbalance, "logs": self.logs}
+
+    def save(self, path: str):
+        with self._lock, open(path, "w") as f:
+            json.dump(self.to_json(), f)
+
+    @classmethod
+    def load(cls, path: str) -> "Fixtures":
+        with open(path) as f:
+            raw = json.load(f)
+        fx = cls(raw["head"])
+        for name in ("txlist", "txlistinternal", "tokentx", "logs"):
+            getattr(fx, name).update(raw.get(name, {}))
+        fx.balance.update(raw.get("balance", {}))
+        fx.tokenbalance.update(raw.get("tokenbalance", {}))
+        return fx
+
+    # --- queries ---
+    @staticmethod
+    def _block_page(rows: List[Dict], q: Dict, block_key: str = "blockNumber") -> List[Dict]:
+        lo, hi = int(q.get("startblock", 0)), int(q.get("endblock", 99999999))
+        sel = [r for r in rows if lo <= int(r[block_key]) <= hi]
+        if q.get("sort") == "desc":
+            sel.reverse()
+        offset = int(q.get("offset", TX_PAGE_SIZE))
+        page = int(q.get("page", 1))
+        return sel[(page - 1) * offset: page * offset]
+
+    def answer(self, q: Dict) -> Dict:
+        action = q.get("action")
+        addr = q.get("address", "").lower()
+        if action in ("txlist", "txlistinternal"):
+            rows = self._block_page(getattr(self, action).get(addr, []), q)
+        elif action == "tokentx":
+            rows = self.tokentx.get(addr, [])
+            if q.get("contractaddress"):
+                rows = [r for r in rows if r["contractAddress"].lower() == q["contractaddress"].lower()]
+            rows = self._block_page(rows, q)
+        elif action == "balance":
+            return {"status": "1", "message": "OK", "result": self.balance.get(addr, "0")}
+        elif action == "balancemulti":
+            result = [{"account": a, "balance": self.balance.get(a.lower(), "0")} for a in q.get("address", "").split(",")]
+            return {"status": "1", "message": "OK", "result": result}
+        elif action == "tokenbalance":
+            key = f"{q.get('contractaddress', '').lower()}:{addr}"
+            return {"status": "1", "message": "OK", "result": self.tokenbalance.get(key, "0")}
+        elif action == "getLogs":
+            rows = self._logs(addr, q)
+        elif action == "eth_blockNumber":
+            return {"jsonrpc": "2.0", "id": 83, "result": hex(self.head)}
+        elif action == "getblockreward":
+            block = self.block(int(q.get("blockno", -1)))
+            if block is None:
+                return {"status": "0", "message": "NOTOK", "result": "Error! Block number too large or invalid"}
+            return {"status": "1", "message": "OK",
+                    "result": {"blockNumber": str(int(block["number"], 16)), "timeStamp": str(int(block["timestamp"], 16))}}
+        else:
+            return {"status": "0", "message": "NOTOK", "result": f"Error! Unsupported action {action}"}
+        if not rows:
+            return NO_RECORDS
+        return {"status": "1", "message": "OK", "result": rows}
+
+    def rpc(self, req: Dict) -> Dict:
+        """Answer one JSON-RPC request object."""
+        method, params = req.get("method"), req.get("params") or []
+        out = {"jsonrpc": "2.0", "id": req.get("id")}
+        if method == "eth_call" and params and str(params[0].get("data", "")).startswith(BALANCE_OF):
+            owner = "0x" + params[0]["data"][-40:].lower()
+            value = int(self.tokenbalance.get(f"{params[0]['to'].lower()}:{owner}", "0"))
+            out["result"] = "0x" + value.to_bytes(32, "big").hex()
+        elif method == "eth_getBalance" and params:
+            out["result"] = hex(int(self.balance.get(params[0].lower(), "0")))
+        elif method == "eth_getLogs" and params:
+            rows = self._rpc_logs(params[0])
+            if len(rows) > RPC_LOGS_LIMIT:
+                out["error"] = {"code": -32005, "message": f"query returned more than {RPC_LOGS_LIMIT} results"}
+            else:
+                out["result"] = rows
+        elif method == "eth_blockNumber":
+            out["result"] = hex(self.head)
+        elif method == "eth_getBlockByNumber" and params:
+            n = self.head if params[0] == "latest" else int(params[0], 16)
+            out["result"] = self.block(n, full=len(params) > 1 and bool(params[1]))
+        else:
+            out["error"] = {"code": -32601, "message": f"unsupported: {method}"}
+        return out
+
+    def _rpc_logs(self, flt: Dict) -> List[Dict]:
+        """eth_getLogs filter: address (one or a list), block range or blockHash, topics with null wildcards / OR-lists."""
+        addrs = flt.get("address") or []
+        addrs = {a.lower() for a in ([addrs] if isinstance(addrs, str) else addrs)}
+        block = lambda b, default: default if b in (None, "latest") else int(b, 16)
+        lo, hi = block(flt.get("fromBlock"), 0), block(flt.get("toBlock"), self.head)
+        if flt.get("blockHash"):
+            lo = hi = int(flt["blockHash"][-32:], 16)
+            if self.block_hash(lo) != flt["blockHash"].lower():
+                return []
+        topics = flt.get("topics") or []
+        rows = [l for key, logs in self.logs.items() if not addrs or key.split(":")[0] in addrs for l in logs]
+        rows = [l for l in rows if lo <= int(l["blockNumber"], 16) <= min(hi, self.head)]
+        for i, t in enumerate(topics):
+            if t:
+                wanted = {x.lower() for x in ([t] if isinstance(t, str) else t)}
+                rows = [l for l in rows if len(l["topics"]) > i and l["topics"][i].lower() in wanted]
+        rows.sort(key=lambda l: (int(l["blockNumber"], 16), _hex_value(l["logIndex"])))
+        # a node writes zero as "0x0"
+        return [{**l, "logIndex": hex(_hex_value(l["logIndex"])), "blockHash": self.block_hash(int(l["blockNumber"], 16))}
+                for l in rows]
+
+    # --- dev chain ---
+    def block_hash(self, n: int) -> str:
+        """Hash of block n on the current fork; "0x%064x" % n until the first reorg, as the fixture rows use."""
+        fork = sum(1 for f in self.forks if f <= n)
+        return "0x%032x%032x" % (fork, n)
+
+    def block(self, n: int, full: bool = False) -> Optional[Dict]:
+        if n < 0 or n > self.head:
+            return None
+        txs = self.block_txs.get(n, [])
+        return {"number": hex(n), "hash": self.block_hash(n), "parentHash": self.block_hash(n - 1),
+                "timestamp": hex(1_600_000_000 + n * 12 // 1000),
+                "transactions": [dict(tx, blockHash=self.block_hash(n)) for tx in txs] if full
+                else [tx["hash"] for tx in txs]}
+
+    def mine(self, txs: List[Dict] = (), logs: List[Dict] = ()) -> int:
+        """Append a block with `txs` ({from, to[, value, functionName]}) and `logs` ({address, topics, data}).
+
+        Transactions also land in both sides' txlist, logs in the getLogs
+        store, so the Etherscan endpoints see the new block too.
+        """
+        with self._lock:
+            n = self.head = self.head + 1
+            ts = str(1_600_000_000 + n * 12 // 1000)
+            mined = []
+            for i, tx in enumerate(txs):
+                tx_hash = "0x%064x" % random.getrandbits(256)
+                mined.append({"hash": tx_hash, "from": tx["from"].lower(), "to": (tx.get("to") or "").lower(),
+                              "value": hex(int(tx.get("value", 0))), "input": "0x", "blockNumber": hex(n),
+                              "transactionIndex": hex(i)})
+                row = {"blockNumber": str(n), "timeStamp": ts, "hash": tx_hash, "from": tx["from"].lower(),
+                       "to": (tx.get("to") or "").lower(), "value": str(int(tx.get("value", 0))), "isError": "0",
+                       "txreceipt_status": "1", "input": "0x", "functionName": tx.get("functionName", "")}
+                for side in {row["from"], row["to"]} - {""}:
+                    self.txlist[side].append(row)
+            self.block_txs[n] = mined
+            for i, log in enumerate(logs):
+                key = f"{log['address'].lower()}:{log['topics'][0].lower()}"
+                self.logs[key].append({**log, "blockNumber": hex(n), "timeStamp": hex(int(ts)), "logIndex": _etherscan_hex(i),
+                                       "transactionHash": "0x%064x" % random.getrandbits(256)})
+            return n
+
+    def reorg(self, depth: int) -> int:
+        """Drop the last `depth` blocks with their txs and logs; blocks mined next get new hashes."""
+        with self._lock:
+            fork = self.head - depth + 1
+            for n in range(fork, self.head + 1):
+                self.block_txs.pop(n, None)
+            for rows in [*self.txlist.values(), *self.txlistinternal.values(), *self.logs.values()]:
+                rows[:] = [r for r in rows if int(str(r["blockNumber"]), 0) < fork]
+            self.forks.append(fork)
+            self.head = fork - 1
+            return self.head
+
+    def _logs(self, addr: str, q: Dict) -> List[Dict]:
+        lo = int(q.get("fromBlock", 0))
+        hi = self.head if q.get("toBlock", "latest") == "latest" else int(q["toBlock"])
+        topic0 = q.get("topic0", "").lower()
+        rows = [l for key, logs in self.logs.items() if key.startswith(addr + ":") and
+                (not topic0 or key == f"{addr}:{topic0}") for l in logs]
+        rows = [l for l in rows if lo <= int(l["blockNumber"], 16) <= hi]
+        for i in (1, 2, 3):
+            t = q.get(f"topic{i}")
+            if t:
+                rows = [l for l in rows if len(l["topics"]) > i and l["topics"][i].lower() == t.lower()]
+        rows.sort(key=lambda l: (int(l["blockNumber"], 16), _hex_value(l["logIndex"])))
+        offset = int(q.get("offset", LOGS_PAGE_CAP))
+        page = int(q.get("page", 1))
+        return rows[(page - 1) * offset: page * offset]
+
+    # --- recording ---
+    def record(self, q: Dict, body: Dict):
+        """Fold an upstream answer into the store (rows are de-duplicated)."""
+        action = q.get("action")
+        addr = q.get("address", "").lower()
+        result = body.get("result")
+        with self._lock:
+            if action in ("txlist", "txlistinternal", "tokentx") and isinstance(result, list):
+                self._merge(getattr(self, action)[addr], result, ("hash", "traceId", "logIndex", "contractAddress"))
+            elif action == "getLogs" and isinstance(result, list):
+                key = f"{addr}:{q.get('topic0', '').lower()}"
+                self._merge(self.logs[key], result, ("transactionHash", "logIndex"))
+            elif action == "balance" and body.get("status") == "1":
+                self.balance[addr] = result
+            elif action == "balancemulti" and body.get("status") == "1":
+                for row in result:
+                    self.balance[row["account"].lower()] = row["balance"]
+            elif action == "tokenbalance" and body.get("status") == "1":
+                self.tokenbalance[f"{q.get('contractaddress', '').lower()}:{addr}"] = result
+            elif action == "eth_blockNumber" and isinstance(result, str):
+                self.head = max(self.head, int(result, 16))
+
+    @staticmethod
+    def _merge(rows: List[Dict], new: List[Dict], id_fields):
+        seen = {tuple(r.get(f) for f in id_fields) for r in rows}
+        rows.extend(r for r in new if tuple(r.get(f) for f in id_fields) not in seen)
+        rows.sort(key=lambda r: int(str(r["blockNumber"]), 0))
+
+
+# =========================
+# Synthetic fixtures
+# =========================
+# wallet profiles: (share of wallets, tx count range, liquidations)
+PROFILES = {
+    "dormant": (0.3, (0, 3), 0),
+    "casual": (0.4, (10, 200), 0),
+    "active": (0.2, (1_000, 5_000), 1),
+    "power": (0.1, (15_000, 30_000), 3),
+}
+
+WETH = "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"
+
+
+def _address(rng: random.Random) -> str:
+    return "0x" + "".join(rng.choice("0123456789abcdef") for _ in range(40))
+
+
+def generate_fixtures(n_wallets: int = 50, seed: int = 0, head: int = 20_000_000,
+                      background_liquidations: int = 20_000) -> Tuple[Fixtures, Dict[str, str]]:
+    """Deterministic wallets from dormant to very active, plus large liquidation log sets.
+
+    Returns the store and {address: profile}. `background_liquidations`
+    LiquidationCall logs for unrelated borrowers make every getLogs scan
+    page through realistic volumes.
+    """
+    rng = random.Random(seed)
+    fx = Fixtures(head)
+    wallets: Dict[str, str] = {}
+    names, shares = zip(*((n, p[0]) for n, p in PROFILES.items()))
+    repay_selectors = {AAVE_V3_POOL: "repay(address asset,uint256 amount,uint256 interestRateMode,address onBehalfOf)"}
+    repay_selectors.update({c: "repayBorrow(uint256 repayAmount)" for c in CTOKENS.values()})
+    counterparties = [_address(rng) for _ in range(200)]
+    log_index = 0
+
+    def liquidation(contract: str, topic0: str, borrower: str, block: int) -> Dict:
+        nonlocal log_index
+        log_index += 1  # every 300th log is logIndex 0
+        if contract == AAVE_V3_POOL:
+            # LiquidationCall(collateralAsset, debtAsset, user indexed)
+            topics = [topic0, pad_topic_address(WETH), pad_topic_address(USDC), pad_topic_address(borrower)]
+            data = "0x" + "00" * 128
+        else:
+            # LiquidateBorrow has no indexed fields; the borrower is in data
+            topics = [topic0]
+            data = "0x" + pad_topic_address(_address(rng))[2:] + pad_topic_address(borrower)[2:] + "00" * 96
+        return {"address": contract, "topics": topics, "data": data, "blockNumber": hex(block),
+                "timeStamp": hex(1_600_000_000 + block * 12 // 1000), "logIndex": _etherscan_hex(log_index % 300),
+                "transactionHash": "0x%064x" % log_index}
+
+    for _ in range(n_wallets):
+        addr = _address(rng)
+        profile = rng.choices(names, weights=shares)[0]
+        wallets[addr] = profile
+        lo, hi = PROFILES[profile][1]
+        n_tx = rng.randint(lo, hi)
+        blocks = sorted(rng.randint(head - 3_000_000, head) for _ in range(n_tx))
+        txs = []
+        for i, b in enumerate(blocks):
+            outbound = rng.random() < 0.5
+            to = rng.choice(list(repay_selectors)) if outbound and rng.random() < 0.05 else rng.choice(counterparties)
+            txs.append({
+                "blockNumber": str(b), "timeStamp": str(1_600_000_000 + b * 12 // 1000),
+                "hash": "0x%064x" % rng.getrandbits(256), "nonce": str(i),
+                "from": addr if outbound else rng.choice(counterparties), "to": to if outbound else addr,
+                "value": str(rng.randint(0, 5 * 10**18)), "gas": "21000", "gasPrice": "20000000000",
+                "isError": "0", "txreceipt_status": "1", "input": "0x",
+                "functionName": repay_selectors.get(to, "") if outbound else "",
+                # the rest of a real txlist row, so parse cost and memory are representative
+                "blockHash": "0x%064x" % b, "transactionIndex": str(i % 200), "methodId": "0x",
+                "contractAddress": "", "cumulativeGasUsed": "12345678", "gasUsed": "21000",
+                "confirmations": str(head - b),
+            })
+        if txs:
+            fx.txlist[addr] = txs
+        fx.balance[addr] = str(rng.randint(0, 50 * 10**18) if profile != "dormant" else 0)
+        for token, scale in ((USDT, 10**6), (USDC, 10**6), (DAI, 10**18), (STETH, 10**18), (RETH, 10**18)):
+            if profile != "dormant" and rng.random() < 0.6:
+                fx.tokenbalance[f"{token.lower()}:{addr}"] = str(rng.randint(0, 20_000) * scale)
+        for _ in range(PROFILES[profile][2]):
+            contract = rng.choice([AAVE_V3_POOL] + list(CTOKENS.values()))
+            topic0 = AAVE_LIQUIDATIONCALL_TOPIC if contract == AAVE_V3_POOL else COMPOUND_LIQUIDATEBORROW_TOPIC
+            fx.logs[f"{contract.lower()}:{topic0.lower()}"].append(
+                liquidation(contract, topic0, addr, rng.randint(head - 3_000_000, head)))
+
+    for _ in range(background_liquidations):
+        contract = AAVE_V3_POOL if rng.random() < 0.7 else rng.choice(list(CTOKENS.values()))
+        topic0 = AAVE_LIQUIDATIONCALL_TOPIC if contract == AAVE_V3_POOL else COMPOUND_LIQUIDATEBORROW_TOPIC
+        fx.logs[f"{contract.lower()}:{topic0.lower()}"].append(
+            liquidation(contract, topic0, _address(rng), rng.randint(head - 3_000_000, head)))
+    for rows in fx.logs.values():
+        rows.sort(key=lambda l: int(l["blockNumber"], 16))
+    return fx, wallets
+
+
+# =========================
+# HTTP server
+# =========================
+class StubServer(ThreadingHTTPServer):
+    """Etherscan-compatible endpoint at http://host:port/api.
+
+    `latency` (+ up to `jitter`) seconds are added to every answer; each API
+    key may make `rate` calls per second before getting the provider's
+    rate-limit body. `record` is an upstream URL to proxy and record from.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, fixtures: Fixtures, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 jitter: float = 0.0, rate: Optional[float] = None, record: Optional[str] = None,
+                 record_key: Optional[str] = None):
+        super().__init__((host, port), _Handler)
+        self.fixtures = fixtures
+        self.latency = latency
+        self.jitter = jitter
+        self.rate = rate
+        self.record = record
+        self.record_key = record_key
+        self.calls: Counter = Counter()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+    @property
+    def rpc_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/rpc"
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="etherscan-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def reset_calls(self) -> Counter:
+        with self._lock:
+            calls, self.calls = self.calls, Counter()
+        return calls
+
+    def _admit(self, key: str) -> bool:
+        if not self.rate:
+            return True
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.rate)
+            now = time.monotonic()
+            if bucket.wait_time(now) > 0:
+                return False
+            bucket.take(now)
+            return True
+
+    def handle_query(self, q: Dict) -> Dict:
+        with self._lock:
+            self.calls[q.get("action", "?")] += 1
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        if not self._admit(q.get("apikey", "")):
+            return RATE_LIMITED
+        if self.record:
+            body = requests.get(self.record, params={**q, "apikey": self.record_key or q.get("apikey", "")},
+                                timeout=30).json()
+            self.fixtures.record(q, body)
+            return body
+        return self.fixtures.answer(q)
+
+    def handle_rpc(self, req):
+        """One JSON-RPC HTTP request (a single object or a batch), counted once as "rpc"."""
+        with self._lock:
+            self.calls["rpc"] += 1
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        if isinstance(req, list):
+            return [self.fixtures.rpc(r) for r in req]
+        return self.fixtures.rpc(req)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        q = dict(parse_qsl(urlparse(self.path).query))
+        self._send(self.server.handle_query(q))
+
+    def do_POST(self):
+        req = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"null")
+        self._send(self.server.handle_rpc(req))
+
+    def _send(self, answer):
+        body = json.dumps(answer).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Serve recorded or generated Etherscan responses locally.")
+    ap.add_argument("--fixtures", help="fixture JSON to replay (or to write when recording / generating)")
+    ap.add_argument("--generate", type=int, metavar="N", help="generate N synthetic wallets into --fixtures")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--record", metavar="URL", help="proxy to this upstream and record answers into --fixtures")
+    ap.add_argument("--port", type=int, default=8545)
+    ap.add_argument("--latency", type=float, default=0.0, help="seconds added to every answer")
+    ap.add_argument("--jitter", type=float, default=0.0, help="up to this many extra random seconds")
+    ap.add_argument("--rate", type=float, default=None, help="calls per second per API key")
+    args = ap.parse_args(argv)
+
+    if args.generate:
+        fx, wallets = generate_fixtures(args.generate, seed=args.seed)
+        fx.save(args.fixtures)
+        print("\n".join(f"{a} # {p}" for a, p in wallets.items()))
+        return
+    fx = Fixtures.load(args.fixtures) if args.fixtures and not args.record else Fixtures()
+    server = StubServer(fx, port=args.port, latency=args.latency, jitter=args.jitter, rate=args.rate,
+                        record=args.record, record_key=os.getenv("ETHERSCAN_API_KEY"))
+    print(f"serving {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.record and args.fixtures:
+            fx.save(args.fixtures)
+
+
+if __name__ == "__main__":
+    main()
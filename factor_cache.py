@@ -0,0 +1,138 @@
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from factors import WalletFactors
+from dataExtractor import (
+    AAVE_LIQUIDATIONCALL_TOPIC, AAVE_V3_POOL, COMPOUND_LIQUIDATEBORROW_TOPIC, CONFIRMATIONS, CTOKENS,
+    ETHERSCAN_API_KEY, DataSource, EtherscanClient, WalletContext, get_liquidation_index, merge_tx_activity,
+    tx_activity, wallet_factors,
+)
+
+# Persisted per-wallet aggregates, in column order
+AGG_FIELDS = [
+    "block", "tx_count", "first_ts", "last_ts", "last_block", "last_inbound", "last_outbound",
+    "aave_repays", "compound_repays", "aave_liquidations", "compound_liquidations",
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS wallet_aggregates (
+    address TEXT PRIMARY KEY,
+    %s,
+    updated_at REAL NOT NULL
+);
+""" % ",\n    ".join(f"{f} INTEGER" for f in AGG_FIELDS)
+
+EMPTY_AGGREGATES = {f: None for f in AGG_FIELDS}
+EMPTY_AGGREGATES.update({
+    "block": -1, "tx_count": 0, "aave_repays": 0, "compound_repays": 0,
+    "aave_liquidations": 0, "compound_liquidations": 0,
+})
+
+
+# =========================
+# Persistent per-wallet factor cache
+# =========================
+class FactorCache:
+    """SQLite store of per-wallet history aggregates, each tagged with the block it covers.
+
+    `refresh` reads only the transactions and liquidations after that block,
+    merges them in, and rebuilds the factors from the aggregates plus current
+    balances. A repeat score therefore costs the balance calls, a head lookup
+    and a few small range queries instead of a full history scan.
+    """
+
+    def __init__(self, path: str = "factors.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def get(self, address: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT %s FROM wallet_aggregates WHERE address = ?" % ", ".join(AGG_FIELDS),
+                (address.lower(),),
+            ).fetchone()
+        return dict(zip(AGG_FIELDS, row)) if row else None
+
+    def put(self, address: str, agg: Dict):
+        cols = ["address"] + AGG_FIELDS + ["updated_at"]
+        values = [address.lower()] + [agg[f] for f in AGG_FIELDS] + [time.time()]
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO wallet_aggregates (%s) VALUES (%s)" % (", ".join(cols), ", ".join("?" * len(cols))),
+                values,
+            )
+            self._db.commit()
+
+    def forget(self, address: str):
+        """Drop a wallet's aggregates, e.g. when a reorg orphaned blocks they cover; the next refresh rebuilds them."""
+        with self._lock:
+            self._db.execute("DELETE FROM wallet_aggregates WHERE address = ?", (address.lower(),))
+            self._db.commit()
+
+    def update(self, address: str, api: DataSource, index=None, endblock: Optional[int] = None) -> Dict:
+        """Bring the stored aggregates up to `endblock` (default: CONFIRMATIONS behind the head) and return them.
+
+        Blocks nearer the head are left for a later update: a shallow reorg
+        may still drop them and the history indexer may not have them yet.
+        A block follower passes its own confirmed block.
+        Liquidations are counted from `index` (default: the shared one), or
+        from getLogs over the new blocks when the index is disabled.
+        """
+        index = index if index is not None else get_liquidation_index()
+        old = self.get(address) or dict(EMPTY_AGGREGATES)
+        head = endblock if endblock is not None else api.block_number() - CONFIRMATIONS
+        if head <= old["block"]:
+            return old
+        start = old["block"] + 1
+
+        new = tx_activity(api.iter_txlist(address, startblock=start, endblock=head), address)
+        agg = {"block": head, **merge_tx_activity(old, new)}
+
+        if index is not None:
+            # the index already holds the full history; its counts up to the same block replace ours
+            agg["aave_liquidations"] = len(index.borrower_logs(
+                AAVE_V3_POOL, AAVE_LIQUIDATIONCALL_TOPIC, address, api, to_block=head))
+            agg["compound_liquidations"] = sum(
+                len(index.borrower_logs(ctoken, COMPOUND_LIQUIDATEBORROW_TOPIC, address, api, to_block=head))
+                for ctoken in CTOKENS.values()
+            )
+        else:
+            agg["aave_liquidations"] = old["aave_liquidations"] + self._new_liquidations(
+                api, AAVE_V3_POOL, AAVE_LIQUIDATIONCALL_TOPIC, address, start, head)
+            agg["compound_liquidations"] = old["compound_liquidations"] + sum(
+                self._new_liquidations(api, ctoken, COMPOUND_LIQUIDATEBORROW_TOPIC, address, start, head)
+                for ctoken in CTOKENS.values()
+            )
+        self.put(address, agg)
+        return agg
+
+    @staticmethod
+    def _new_liquidations(api: DataSource, contract: str, topic0: str, borrower: str,
+                          from_block: int, to_block: int) -> int:
+        return len(api.borrower_logs(contract, topic0, borrower, from_block=from_block, to_block=to_block))
+
+    def refresh(self, address: str, api: Optional[DataSource] = None, eth_usd: Optional[float] = None,
+                index=None, endblock: Optional[int] = None) -> WalletFactors:
+        """Same result as `extract_wallet_factors` over history up to the confirmed block, computed incrementally."""
+        api = api or EtherscanClient(ETHERSCAN_API_KEY)
+        agg = self.update(address, api, index=index, endblock=endblock)
+        aave = {"repays": agg["aave_repays"], "liquidations": agg["aave_liquidations"]}
+        comp = {"repays": agg["compound_repays"], "liquidations": agg["compound_liquidations"]}
+        return wallet_factors(address, WalletContext(api), agg, aave, comp, eth_usd=eth_usd)
+
+
+if __name__ == "__main__":
+    import sys
+
+    cache = FactorCache()
+    for addr in sys.argv[1:]:
+        print(addr, cache.refresh(addr))
@@ -0,0 +1,148 @@
+from array import array
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from merkle import MerkleTree, merkle_roots
+
+# Scalar factors in canonical order, with their types (array typecode for the columnar container)
+FACTOR_FIELDS: List[Tuple[str, type, str]] = [
+    ("on_time_repayment_rate", float, "d"),
+    ("default_count", int, "q"),
+    ("avg_tx_frequency", float, "d"),
+    ("avg_balance_usd", float, "d"),
+    ("stablecoin_ratio", float, "d"),
+    ("debt_utilization", float, "d"),
+    ("staking_amount_eth", float, "d"),
+    ("staking_tenure_days", int, "q"),
+]
+FACTOR_NAMES = [name for name, _, _ in FACTOR_FIELDS]
+
+
+# =========================
+# One wallet
+# =========================
+@dataclass(slots=True)
+class WalletFactors(Mapping):
+    """Typed factor record for one wallet.
+
+    Reads like the old factors dict (`f["default_count"]`, `.items()`), so
+    `credit_score` and `merkle_root` take it as is; the mapping covers the
+    scalar factors only. `detail` (per-protocol counts, balances) is
+    diagnostic: it is kept for JSON output but is not a Merkle leaf (the
+    original `factors.items()` root hashed it too; see README).
+    """
+
+    on_time_repayment_rate: float
+    default_count: int
+    avg_tx_frequency: float
+    avg_balance_usd: float
+    stablecoin_ratio: float
+    debt_utilization: float
+    staking_amount_eth: float
+    staking_tenure_days: int
+    detail: Optional[Dict] = None
+
+    def __post_init__(self):
+        # canonical types: str(value) is the Merkle leaf encoding, so 0 and 0.0 must not both occur
+        for name, typ, _ in FACTOR_FIELDS:
+            setattr(self, name, typ(getattr(self, name)))
+
+    # --- Mapping over the scalar factors ---
+    def __getitem__(self, key: str):
+        if key not in _FACTOR_SET:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(FACTOR_NAMES)
+
+    def __len__(self) -> int:
+        return len(FACTOR_NAMES)
+
+    # --- conversion ---
+    @classmethod
+    def from_dict(cls, d: Mapping) -> "WalletFactors":
+        if isinstance(d, cls):
+            return d
+        return cls(**{name: d[name] for name in FACTOR_NAMES}, detail=d.get("detail"))
+
+    def to_dict(self) -> Dict:
+        """JSON shape served by pythonServer and written by batch_score (scalars plus `detail`)."""
+        out = {name: getattr(self, name) for name in FACTOR_NAMES}
+        out["detail"] = self.detail
+        return out
+
+    def merkle_pairs(self) -> List[Tuple[str, str]]:
+        """Canonical leaves: (name, str(value)) for every scalar factor, sorted by name."""
+        return sorted((name, str(getattr(self, name))) for name in FACTOR_NAMES)
+
+    def merkle_tree(self) -> MerkleTree:
+        return MerkleTree.from_pairs(self.merkle_pairs())
+
+    def merkle_root(self) -> bytes:
+        return self.merkle_tree().root
+
+
+_FACTOR_SET = frozenset(FACTOR_NAMES)
+
+
+# =========================
+# Many wallets, column-wise
+# =========================
+class FactorColumns:
+    """Array-backed factors for many wallets: one `array` per factor plus packed 20-byte addresses.
+
+    About 84 bytes per wallet instead of a few KB for a dict with `detail`.
+    `columns[name]` is that factor for every wallet (NumPy reads it without
+    copying), so `score_batch` / `credit_scores` take the container as is;
+    iterating yields one `WalletFactors` per wallet, so `merkle_roots` does
+    too. `detail` is not kept.
+    """
+
+    __slots__ = ("_addresses", "_cols")
+
+    def __init__(self):
+        self._addresses = bytearray()
+        self._cols: Dict[str, array] = {name: array(code) for name, _, code in FACTOR_FIELDS}
+
+    @classmethod
+    def from_records(cls, records: Iterable[Tuple[str, Mapping]]) -> "FactorColumns":
+        """From (wallet, factors) pairs; factors may be a dict or a WalletFactors."""
+        cols = cls()
+        for wallet, factors in records:
+            cols.append(wallet, factors)
+        return cols
+
+    def append(self, wallet: str, factors: Mapping):
+        raw = bytes.fromhex(wallet.removeprefix("0x"))
+        if len(raw) != 20:
+            raise ValueError(f"not an address: {wallet}")
+        for name, typ, _ in FACTOR_FIELDS:
+            self._cols[name].append(typ(factors[name]))
+        self._addresses += raw
+
+    def __len__(self) -> int:
+        return len(self._addresses) // 20
+
+    def __getitem__(self, name: str) -> array:
+        return self._cols[name]
+
+    def wallet(self, i: int) -> str:
+        return "0x" + self._addresses[20 * i:20 * i + 20].hex()
+
+    def wallets(self) -> List[str]:
+        return [self.wallet(i) for i in range(len(self))]
+
+    def row(self, i: int) -> WalletFactors:
+        return WalletFactors(*(self._cols[name][i] for name in FACTOR_NAMES))
+
+    def __iter__(self) -> Iterator[WalletFactors]:
+        return (self.row(i) for i in range(len(self)))
+
+    def merkle_roots(self) -> List[bytes]:
+        return merkle_roots(self)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._addresses) + sum(c.itemsize * len(c) for c in self._cols.values())
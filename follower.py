@@ -0,0 +1,322 @@
+import argparse
+import json
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, TextIO, Tuple
+
+import requests
+
+import metrics
+from balances import NODE_RPC_URL, RpcBalanceClient, RpcError
+from batch_score import read_addresses, score_record
+from dataExtractor import (
+    AAVE_LIQUIDATIONCALL_TOPIC, AAVE_V3_POOL, BASE_URL, COMPOUND_LIQUIDATEBORROW_TOPIC, CONFIRMATIONS, CTOKENS,
+    ETHERSCAN_API_KEYS, RETH, STABLES, STETH, DataSource, EtherscanClient, EtherscanError, extract_wallet_factors,
+    get_liquidation_index,
+)
+from factor_cache import FactorCache
+from factors import WalletFactors
+from rpc_source import LOG_LIMIT_ERRORS, JsonRpcDataSource
+
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"  # Transfer(address,address,uint256)
+
+# Tokens whose transfers move a balance the factors read
+WATCHED_TOKENS = [t.lower() for t in (*STABLES.values(), STETH, RETH)]
+LIQUIDATION_CONTRACTS = [c.lower() for c in (AAVE_V3_POOL, *CTOKENS.values())]
+WATCHED_TOPICS = [TRANSFER_TOPIC, AAVE_LIQUIDATIONCALL_TOPIC.lower(), COMPOUND_LIQUIDATEBORROW_TOPIC.lower()]
+
+REORG_DEPTH = 64  # recent block hashes kept to find the fork point of a reorg
+MAX_RANGE = 20  # blocks per step (one block batch + one eth_getLogs); halved when the node refuses the logs
+
+
+# =========================
+# Event -> wallet matching
+# =========================
+def _topic_address(word: str) -> str:
+    return "0x" + word[-40:].lower()
+
+
+def log_wallets(log: Dict) -> List[str]:
+    """Wallets a watched log affects: both sides of a token transfer, the borrower of a liquidation."""
+    topics = log.get("topics") or []
+    topic0 = topics[0].lower() if topics else ""
+    if topic0 == TRANSFER_TOPIC and log.get("address", "").lower() in WATCHED_TOKENS and len(topics) >= 3:
+        return [_topic_address(topics[1]), _topic_address(topics[2])]
+    if topic0 == AAVE_LIQUIDATIONCALL_TOPIC.lower() and len(topics) >= 4:
+        return [_topic_address(topics[3])]  # LiquidationCall(collateralAsset, debtAsset, user indexed)
+    if topic0 == COMPOUND_LIQUIDATEBORROW_TOPIC.lower():
+        data = (log.get("data") or "0x")[2:]
+        return [_topic_address(data[64:128])] if len(data) >= 128 else []  # (liquidator, borrower, ...)
+    return []
+
+
+def touched_wallets(block: Dict, logs: List[Dict], watched: Set[str]) -> Set[str]:
+    """Watched wallets that sent or received a transaction of `block` or appear in one of its `logs`."""
+    found = set()
+    for tx in block.get("transactions") or []:
+        for side in (tx.get("from"), tx.get("to")):
+            if side and side.lower() in watched:
+                found.add(side.lower())
+    for log in logs:
+        found.update(w for w in log_wallets(log) if w in watched)
+    return found
+
+
+# =========================
+# Block follower
+# =========================
+class BlockFollower:
+    """Follows the chain through a JSON-RPC node and marks the watched wallets new blocks touch.
+
+    Each step reads a range of blocks with their transactions (one batch) and
+    the watched token transfers and liquidations in it (one eth_getLogs).
+    Only wallets that appear there are marked dirty, so a large, mostly idle
+    watchlist costs two requests per step rather than a re-score per wallet.
+
+    The hashes of the last `reorg_depth` blocks are kept. When a new block
+    does not extend them, the follower walks back to the fork point, marks
+    the wallets the orphaned blocks touched dirty and `reorged`, and rescans
+    from there. Logs are checked against the block hashes of the same step,
+    so a reorg landing between the two reads is retried on the next poll.
+
+    Not seen: ETH moved by internal calls and stETH rebases (no event for the
+    wallet); those show up at the wallet's next touch.
+    """
+
+    def __init__(self, node: RpcBalanceClient, wallets: Iterable[str] = (), confirmations: int = CONFIRMATIONS,
+                 reorg_depth: int = REORG_DEPTH, start_block: Optional[int] = None, max_range: int = MAX_RANGE):
+        self.node = node
+        self.confirmations = confirmations
+        self.reorg_depth = reorg_depth
+        self.max_range = max_range
+        self.next_block = start_block
+        self.watched: Set[str] = {w.lower() for w in wallets}
+        self.dirty: Set[str] = set()
+        self.reorged: Set[str] = set()  # dirty wallets whose cached aggregates may cover orphaned blocks
+        self._recent: "OrderedDict[int, Tuple[str, Set[str]]]" = OrderedDict()  # number -> (hash, touched)
+        self._lock = threading.Lock()
+
+    # --- wallet set ---
+    def watch(self, wallets: Iterable[str]):
+        with self._lock:
+            self.watched.update(w.lower() for w in wallets)
+
+    def unwatch(self, wallets: Iterable[str]):
+        with self._lock:
+            for w in wallets:
+                self.watched.discard(w.lower())
+                self.dirty.discard(w.lower())
+                self.reorged.discard(w.lower())
+
+    def mark(self, wallets: Iterable[str], reorged: bool = False):
+        with self._lock:
+            wallets = {w.lower() for w in wallets} & self.watched
+            self.dirty |= wallets
+            if reorged:
+                self.reorged |= wallets
+
+    def take_dirty(self) -> Tuple[Set[str], Set[str]]:
+        """(dirty, reorged) wallets since the last call; both sets are cleared."""
+        with self._lock:
+            dirty, reorged = self.dirty, self.reorged
+            self.dirty, self.reorged = set(), set()
+        return dirty, reorged
+
+    # --- chain ---
+    @property
+    def confirmed_block(self) -> Optional[int]:
+        """Last block scanned (None before the first poll); wallet state is re-read up to it, not past it."""
+        return self.next_block - 1 if self.next_block is not None else None
+
+    def poll(self) -> int:
+        """Scan every block up to head - confirmations; returns the number of blocks scanned."""
+        head = int(self.node.call("eth_blockNumber", []), 16) - self.confirmations
+        if self.next_block is None:
+            self.next_block = head + 1
+        scanned = 0
+        while self.next_block <= head:
+            lo = self.next_block
+            logs, hi = self._logs(lo, min(head, lo + self.max_range - 1))
+            blocks = self._blocks(lo, hi)
+            parent = self._recent.get(lo - 1)
+            if parent is not None and blocks and blocks[0]["parentHash"] != parent[0]:
+                if not self._rewind():
+                    return scanned  # our top block is still canonical; the node is lagging, retry on the next poll
+                continue
+            hashes = self._linked(blocks)
+            by_block: Dict[int, List[Dict]] = {n: [] for n in hashes}
+            for log in logs:
+                n = int(log["blockNumber"], 16)
+                if log.get("removed") or log.get("blockHash") != hashes.get(n):
+                    return scanned  # the chain moved between the two reads; retry on the next poll
+                by_block[n].append(log)
+            if not hashes or max(hashes) < hi:
+                return scanned  # the node does not serve the whole range consistently yet
+            with self._lock:
+                watched = set(self.watched)
+            for block in blocks:
+                n = int(block["number"], 16)
+                touched = touched_wallets(block, by_block[n], watched)
+                self._recent[n] = (block["hash"], touched)
+                self.mark(touched)
+            while len(self._recent) > self.reorg_depth:
+                self._recent.popitem(last=False)
+            metrics.FOLLOWER_BLOCKS.inc(hi - lo + 1)
+            scanned += hi - lo + 1
+            self.next_block = hi + 1
+        return scanned
+
+    def _logs(self, lo: int, hi: int) -> Tuple[List[Dict], int]:
+        """Watched logs in [lo, hi], shrinking hi while the node refuses the range as too large."""
+        while True:
+            flt = {"address": WATCHED_TOKENS + LIQUIDATION_CONTRACTS, "topics": [WATCHED_TOPICS],
+                   "fromBlock": hex(lo), "toBlock": hex(hi)}
+            try:
+                return self.node.call("eth_getLogs", [flt]), hi
+            except RpcError as e:
+                if hi == lo or not any(m in str(e).lower() for m in LOG_LIMIT_ERRORS):
+                    raise
+                hi = (lo + hi) // 2
+
+    def _blocks(self, lo: int, hi: int) -> List[Dict]:
+        batch = [{"jsonrpc": "2.0", "id": n, "method": "eth_getBlockByNumber", "params": [hex(n), True]}
+                 for n in range(lo, hi + 1)]
+        answers = self.node.batch(batch)
+        if not isinstance(answers, list):
+            raise RpcError(f"batch answer is not a list: {str(answers)[:200]}")
+        found = {a["id"]: a["result"] for a in answers if isinstance(a, dict) and a.get("result")}
+        out = []
+        for n in range(lo, hi + 1):
+            if n not in found:
+                break
+            out.append(found[n])
+        return out
+
+    @staticmethod
+    def _linked(blocks: List[Dict]) -> Dict[int, str]:
+        """number -> hash of the leading blocks that form one chain (a reorg under the batch cuts it)."""
+        hashes: Dict[int, str] = {}
+        prev = None
+        for block in blocks:
+            if prev is not None and block["parentHash"] != prev:
+                break
+            hashes[int(block["number"], 16)] = prev = block["hash"]
+        return hashes
+
+    def _rewind(self) -> bool:
+        """Drop recent blocks the node no longer has, marking the wallets they touched.
+
+        Returns False when nothing was dropped (the block we hold is still the
+        node's), so `poll` does not spin on a node that serves a stale child.
+        """
+        dropped = False
+        while self._recent:
+            n = next(reversed(self._recent))
+            block = self.node.call("eth_getBlockByNumber", [hex(n), False])
+            if block and block["hash"] == self._recent[n][0]:
+                return dropped
+            if not dropped:
+                metrics.FOLLOWER_REORGS.inc()
+                dropped = True
+            _, (_, touched) = self._recent.popitem()
+            self.mark(touched, reorged=True)
+            self.next_block = n
+        # deeper than the hashes we keep: any watched wallet may have changed
+        self.mark(self.watched, reorged=True)
+        return True
+
+
+# =========================
+# Re-scoring
+# =========================
+def rescore(wallet: str, api: DataSource, cache: Optional[FactorCache] = None, reorged: bool = False,
+            eth_usd: Optional[float] = None, index=None, endblock: Optional[int] = None) -> WalletFactors:
+    """Factors of one dirty wallet: incrementally through `cache` when given, else a full extraction.
+
+    `endblock` (the follower's confirmed block) is where the cache cursor
+    stops, so it never covers a block the follower may still see reorged.
+    """
+    if cache is None:
+        return extract_wallet_factors(wallet, api, eth_usd=eth_usd, index=index)
+    if reorged:
+        cache.forget(wallet)  # its aggregates may count transactions of orphaned blocks
+    return cache.refresh(wallet, api, eth_usd=eth_usd, index=index, endblock=endblock)
+
+
+def follow(follower: BlockFollower, api: DataSource, out: TextIO, cache: Optional[FactorCache] = None,
+           interval: float = 12.0, sign: bool = False, eth_usd: Optional[float] = None,
+           stop: Optional[threading.Event] = None, index=None):
+    """Poll, re-score the dirty wallets and append their records to `out` until `stop` is set.
+
+    Wallets that fail stay dirty for the next round. Without a fixed `eth_usd`
+    every re-score reads the (cached) live price. The liquidation `index` is
+    extended before each round, so a liquidation that marked a wallet dirty is
+    in it when the wallet is re-scored.
+    """
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        try:
+            follower.poll()
+        except RpcError as e:
+            print(f"poll failed: {e}", file=sys.stderr)
+        dirty, reorged = follower.take_dirty()
+        endblock = follower.confirmed_block
+        if dirty and index is not None:
+            try:
+                index.sync_sources(api, to_block=endblock)
+            except (EtherscanError, RpcError, requests.RequestException) as e:
+                print(f"liquidation index sync failed: {e}", file=sys.stderr)
+        for wallet in sorted(dirty):
+            try:
+                factors = rescore(wallet, api, cache, wallet in reorged, eth_usd, index=index, endblock=endblock)
+            except (EtherscanError, RpcError, requests.RequestException) as e:
+                metrics.FOLLOWER_RESCORES.inc(outcome="error")
+                print(f"{wallet}: {e}", file=sys.stderr)
+                follower.mark([wallet], reorged=wallet in reorged)
+                continue
+            metrics.FOLLOWER_RESCORES.inc(outcome="ok")
+            out.write(json.dumps(score_record(wallet, factors, sign=sign)) + "\n")
+            out.flush()
+        stop.wait(interval)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Follow new blocks and re-score the watched wallets they touch.")
+    ap.add_argument("addresses", help="file with one address per line, or '-' for stdin")
+    ap.add_argument("-o", "--output", required=True, help="JSONL output, appended to")
+    ap.add_argument("--rpc-url", default=NODE_RPC_URL, help="JSON-RPC node to follow (default: $NODE_RPC_URL)")
+    ap.add_argument("--base-url", default=BASE_URL, help="Etherscan-compatible API endpoint for tx history")
+    ap.add_argument("--cache", metavar="PATH", help="FactorCache database for incremental re-scores")
+    ap.add_argument("--interval", type=float, default=12.0, help="seconds between polls")
+    ap.add_argument("--confirmations", type=int, default=CONFIRMATIONS)
+    ap.add_argument("--start-block", type=int, default=None, help="first block to scan (default: the next one)")
+    ap.add_argument("--score-all", action="store_true", help="score every watched wallet once at startup")
+    ap.add_argument("--sign", action="store_true", help="attach an EIP-712 Score signature to every record")
+    args = ap.parse_args(argv)
+    if not args.rpc_url:
+        ap.error("--rpc-url or NODE_RPC_URL is required")
+
+    src = sys.stdin if args.addresses == "-" else open(args.addresses)
+    wallets = list(read_addresses(src))
+    if src is not sys.stdin:
+        src.close()
+    api = JsonRpcDataSource(args.rpc_url, history=EtherscanClient(ETHERSCAN_API_KEYS, base_url=args.base_url))
+    follower = BlockFollower(api, wallets, confirmations=args.confirmations, start_block=args.start_block)
+    if args.score_all:
+        follower.mark(wallets)
+    cache = FactorCache(args.cache) if args.cache else None
+    print(f"following {args.rpc_url} for {len(follower.watched)} wallets", file=sys.stderr)
+    with open(args.output, "a") as out:
+        try:
+            follow(follower, api, out, cache=cache, interval=args.interval, sign=args.sign,
+                   index=get_liquidation_index())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if cache is not None:
+                cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+import argparse
+import contextlib
+import csv
+import sys
+import time
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from balances import RpcError
+from dataExtractor import (
+    AAVE_LIQUIDATIONCALL_TOPIC, AAVE_V3_POOL, COMPOUND_LIQUIDATEBORROW_TOPIC, CTOKENS, DAI, ETHERSCAN_API_KEY,
+    REPAY_CALLS, RETH, STETH, USDC, USDT, DataSource, EtherscanClient, EtherscanError, WalletContext, get_eth_price,
+)
+from etherscan_rows import address_bytes
+from factors import FACTOR_NAMES
+from scoring import ScoringConfig, credit_scores
+
+DAY = 60 * 60 * 24
+BLOCK_SECONDS = 12  # slot time; places blocks outside the known events on the clock
+MAX_BLOCK_LOOKUPS = 64  # block timestamps read from the data source per by="block" evaluation; others interpolated
+
+# Tokens whose balances the factors read: address -> (kind, decimals).
+# Stable balances are USD ($1 pegs), staking tokens ETH, as in wallet_factors.
+TOKEN_UNITS = {
+    USDT.lower(): ("stable", 6), USDC.lower(): ("stable", 6), DAI.lower(): ("stable", 18),
+    STETH.lower(): ("staked", 18), RETH.lower(): ("staked", 18),
+}
+
+
+# =========================
+# Event arrays
+# =========================
+class Events:
+    """Events of one kind sorted by block, with per-event value columns and their prefix sums."""
+
+    def __init__(self, block: Sequence[int], ts: Sequence[int], **columns: Sequence):
+        order = np.argsort(np.asarray(block, dtype=np.int64), kind="stable")
+        self.block = np.asarray(block, dtype=np.int64)[order]
+        self.ts = np.asarray(ts, dtype=np.int64)[order]
+        self.columns = {k: np.asarray(v)[order] for k, v in columns.items()}
+        self._prefix: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.block)
+
+    def cut(self, points: np.ndarray, by: str) -> np.ndarray:
+        """Number of events at or before each point (`by` "block" or "ts")."""
+        return np.searchsorted(self.block if by == "block" else self.ts, points, side="right")
+
+    def cumulative(self, name: str, cut: np.ndarray) -> np.ndarray:
+        """Sum of column `name` over the first `cut` events, for every cut at once."""
+        prefix = self._prefix.get(name)
+        if prefix is None:
+            prefix = self._prefix[name] = np.concatenate([[0], np.cumsum(self.columns[name])])
+        return prefix[cut]
+
+    def after(self, name: str, cut: np.ndarray) -> np.ndarray:
+        """Sum of column `name` over the events after each cut."""
+        return self.cumulative(name, np.full_like(cut, len(self))) - self.cumulative(name, cut)
+
+    def last(self, values: np.ndarray, cut: np.ndarray, default=0) -> np.ndarray:
+        """`values[cut - 1]`, or `default` where no event is at or before the point."""
+        if not len(self):
+            return np.full(cut.shape, default)
+        return np.where(cut > 0, values[np.maximum(cut - 1, 0)], default)
+
+
+def _int(v) -> int:
+    return int(str(v), 0)
+
+
+# =========================
+# Wallet timeline
+# =========================
+class Timeline:
+    """A wallet's history, fetched once, that factors and scores can be read from at any point.
+
+    Counters (txs, repays, liquidations) are prefix sums over sorted events.
+    Balances are rebuilt backwards from the current ones: the balance at a
+    point is today's minus the net flow of every later event. Flows the
+    account lists do not show (stETH rebases, airdrops without a transfer
+    event) make past balances drift; they are floored at zero.
+    """
+
+    def __init__(self, txs: Events, liquidations: Events, eth_flows: Events, token_flows: Events,
+                 eth_now: float, stable_now: float, staked_now: float, clock: Optional[DataSource] = None):
+        self.txs = txs
+        self.liquidations = liquidations
+        self.eth_flows = eth_flows
+        self.token_flows = token_flows
+        self.eth_now = eth_now
+        self.stable_now = stable_now
+        self.staked_now = staked_now
+        # answers block_timestamp for by="block" points; None places blocks from the events alone
+        self.clock = clock
+
+    @classmethod
+    def fetch(cls, address: str, api: DataSource, index=None) -> "Timeline":
+        """One read of each history list plus the current balances (the same reads one score makes).
+
+        Liquidations come from `index`, by default the shared liquidation
+        index (see WalletContext).
+        """
+        ctx = api if isinstance(api, WalletContext) else WalletContext(api, index=index)
+        me = address_bytes(address.lower())
+        txs = ctx.txlist(address)
+
+        # --- tx counters; repay needles matched once per (contract, function name) like tx_activity
+        hits: Dict[tuple, tuple] = {}
+        aave_repays, compound_repays = [], []
+        for tx in txs:
+            n = hits.get((tx.to, tx.fn))
+            if n is None:
+                spec = REPAY_CALLS.get(tx.to)
+                k = sum(needle in tx.fn for needle in spec[1]) if spec else 0
+                n = hits[(tx.to, tx.fn)] = (k, 0) if spec and spec[0] == "aave" else (0, k)
+            aave_repays.append(n[0])
+            compound_repays.append(n[1])
+        tx_events = Events(
+            [t.block for t in txs], [t.ts for t in txs],
+            inbound=[t.to == me for t in txs], outbound=[t.to != me and t.sender == me for t in txs],
+            aave_repays=aave_repays, compound_repays=compound_repays,
+        )
+
+        # --- liquidations where the wallet was the borrower
+        liqs = list(ctx.borrower_logs(AAVE_V3_POOL, AAVE_LIQUIDATIONCALL_TOPIC, address))
+        for ctoken in CTOKENS.values():
+            liqs += ctx.borrower_logs(ctoken, COMPOUND_LIQUIDATEBORROW_TOPIC, address)
+        liq_blocks = [_int(l["blockNumber"]) for l in liqs]
+        liq_events = Events(liq_blocks, [cls._log_time(l, b, ctx, tx_events) for l, b in zip(liqs, liq_blocks)])
+
+        # --- ETH flows: normal txs (value and fee) and internal transfers
+        flows = [(t.block, t.ts, ((t.value if t.to == me else 0) - (t.value + t.fee if t.sender == me else 0)) / 1e18)
+                 for t in txs]
+        flows += [(t.block, t.ts, ((t.value if t.to == me else 0) - (t.value if t.sender == me else 0)) / 1e18)
+                  for t in ctx.internal_txs(address)]
+        eth_events = Events([f[0] for f in flows], [f[1] for f in flows], delta=[f[2] for f in flows])
+
+        # --- balance-affecting token transfers
+        addr = address.lower()
+        rows = []
+        for r in ctx.erc20_transfers(address):
+            unit = TOKEN_UNITS.get(r.get("contractAddress", "").lower())
+            if unit is None:
+                continue
+            v = int(r["value"]) / 10 ** unit[1]
+            delta = (v if r["to"].lower() == addr else 0) - (v if r["from"].lower() == addr else 0)
+            rows.append((_int(r["blockNumber"]), _int(r["timeStamp"]), delta, unit[0]))
+        token_events = Events(
+            [r[0] for r in rows], [r[1] for r in rows],
+            stable=[r[2] if r[3] == "stable" else 0.0 for r in rows],
+            staked=[r[2] if r[3] == "staked" else 0.0 for r in rows],
+        )
+
+        now = {kind: 0.0 for kind in ("stable", "staked")}
+        for token, (kind, decimals) in TOKEN_UNITS.items():
+            now[kind] += ctx.token_balance(token, address) / 10 ** decimals
+        return cls(tx_events, liq_events, eth_events, token_events,
+                   ctx.eth_balance(address), now["stable"], now["staked"], clock=ctx)
+
+    @staticmethod
+    def _log_time(log: Dict, block: int, ctx: WalletContext, txs: Events) -> int:
+        """A log's timestamp; node logs carry none, so it is read per block (memoized) or placed among the txs."""
+        if log.get("timeStamp") not in (None, "", "0x"):
+            return _int(log["timeStamp"])
+        try:
+            return ctx.block_timestamp(block)
+        except (EtherscanError, RpcError):
+            if not len(txs):
+                raise
+            return int(np.interp(block, txs.block, txs.ts))
+
+    def block_times(self, blocks: np.ndarray) -> np.ndarray:
+        """Timestamps of blocks.
+
+        Up to MAX_BLOCK_LOOKUPS of the requested blocks (spread over the
+        range) are read from `clock`; the rest are interpolated between those
+        and the wallet's events, at BLOCK_SECONDS per block outside them.
+        """
+        known = [(e.block, e.ts) for e in (self.txs, self.liquidations, self.eth_flows, self.token_flows) if len(e)]
+        anchors = self._read_block_times(np.unique(blocks))
+        if anchors:
+            known.insert(0, (np.array([a[0] for a in anchors]), np.array([a[1] for a in anchors])))
+        if not known:
+            return np.zeros(blocks.shape, dtype=np.int64)
+        b = np.concatenate([k[0] for k in known])
+        t = np.concatenate([k[1] for k in known])
+        b, first = np.unique(b, return_index=True)
+        t = t[first]
+        out = np.interp(blocks, b, t)
+        out = np.where(blocks < b[0], t[0] - (b[0] - blocks) * BLOCK_SECONDS, out)
+        out = np.where(blocks > b[-1], t[-1] + (blocks - b[-1]) * BLOCK_SECONDS, out)
+        return out.astype(np.int64)
+
+    def _read_block_times(self, blocks: np.ndarray) -> List[tuple]:
+        if self.clock is None or not len(blocks):
+            return []
+        if len(blocks) > MAX_BLOCK_LOOKUPS:
+            blocks = blocks[np.linspace(0, len(blocks) - 1, MAX_BLOCK_LOOKUPS).round().astype(int)]
+        out = []
+        for n in blocks.tolist():
+            try:
+                out.append((n, self.clock.block_timestamp(n)))
+            except (EtherscanError, RpcError):
+                continue  # e.g. not mined yet; placed from its neighbours instead
+        return out
+
+    def evaluate(self, points: Sequence[int], by: str = "ts", eth_usd: Union[float, Sequence[float], None] = None,
+                 config: Optional[ScoringConfig] = None) -> Dict[str, np.ndarray]:
+        """Factors and scores at every point in one vectorized pass.
+
+        `points` are block numbers (`by="block"`) or unix timestamps
+        (`by="ts"`). `eth_usd` is one price for all points (default: the
+        current one) or a price per point. Returns columns: "ts" (and
+        "block"), every factor, and "score".
+
+        Staking tenure is measured at each point's time; for blocks that is
+        the block's own timestamp (see `block_times`). A live score measures
+        it at the wall clock, so to reproduce one use `by="ts"` with now.
+        """
+        if by not in ("block", "ts"):
+            raise ValueError(f"by must be 'block' or 'ts', not {by!r}")
+        points = np.asarray(points, dtype=np.int64)
+        at = self.block_times(points) if by == "block" else points
+        price = np.broadcast_to(np.asarray(get_eth_price() if eth_usd is None else eth_usd, dtype=float), points.shape)
+        tx, liq = self.txs, self.liquidations
+
+        # --- activity
+        n = tx.cut(points, by)
+        first_ts = tx.ts[0] if len(tx) else 0
+        last_ts = tx.last(tx.ts, n)
+        days = np.maximum(1, (last_ts - first_ts) / DAY)
+        freq = np.where(n > 0, n / days, 0.0)
+
+        # --- repayments vs liquidations
+        repays = tx.cumulative("aave_repays", n) + tx.cumulative("compound_repays", n)
+        liqs = liq.cut(points, by)
+        rate = repays / np.maximum(1, repays + liqs)
+
+        # --- balances at each point
+        eth = np.maximum(0.0, self.eth_now - self.eth_flows.after("delta", self.eth_flows.cut(points, by)))
+        k = self.token_flows.cut(points, by)
+        stable = np.maximum(0.0, self.stable_now - self.token_flows.after("stable", k))
+        staked = np.maximum(0.0, self.staked_now - self.token_flows.after("staked", k))
+        portfolio = (eth + staked) * price + stable
+        ratio = np.divide(stable, portfolio, out=np.zeros_like(portfolio), where=portfolio > 0)
+        borrows = repays + liqs
+        debt = np.divide(borrows, borrows + portfolio, out=np.zeros_like(portfolio), where=borrows + portfolio > 0)
+
+        # --- staking tenure, as tenure_days but measured at the point instead of now
+        last_in = tx.last(np.maximum.accumulate(np.where(tx.columns["inbound"], tx.ts, 0)), n)
+        last_out = tx.last(np.maximum.accumulate(np.where(tx.columns["outbound"], tx.ts, 0)), n)
+        staked_since = (last_in > 0) & ~((last_out > 0) & (last_out > last_in))
+        tenure = np.where(staked_since, np.maximum(0, (at - last_in) // DAY), 0)
+
+        out = {"ts": at}
+        if by == "block":
+            out["block"] = points
+        out.update({
+            "on_time_repayment_rate": rate,
+            "default_count": liqs,
+            "avg_tx_frequency": freq,
+            "avg_balance_usd": eth * price,
+            "stablecoin_ratio": ratio,
+            "debt_utilization": debt,
+            "staking_amount_eth": staked,
+            "staking_tenure_days": tenure,
+        })
+        out["score"] = credit_scores(out, config)
+        return out
+
+
+def daily_points(days: int, end: Optional[int] = None) -> np.ndarray:
+    """`days` timestamps one day apart, ascending, the last one at `end` (default: now)."""
+    end = int(time.time()) if end is None else end
+    return end - DAY * np.arange(days)[::-1]
+
+
+def score_history(address: str, points: Sequence[int], by: str = "ts", api: Optional[DataSource] = None,
+                  eth_usd: Union[float, Sequence[float], None] = None, index=None,
+                  config: Optional[ScoringConfig] = None) -> Dict[str, np.ndarray]:
+    """Factor and score series of one wallet: one history fetch, then `Timeline.evaluate`."""
+    api = api or EtherscanClient(ETHERSCAN_API_KEY)
+    return Timeline.fetch(address, api, index=index).evaluate(points, by=by, eth_usd=eth_usd, config=config)
+
+
+# =========================
+# CLI
+# =========================
+def _ints(text: str) -> List[int]:
+    return [int(x, 0) for x in text.split(",") if x]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Score series of one wallet at many block heights or timestamps.")
+    ap.add_argument("address")
+    points = ap.add_mutually_exclusive_group()
+    points.add_argument("--days", type=int, default=365, help="daily points ending now (default: %(default)s)")
+    points.add_argument("--blocks", type=_ints, help="comma-separated block numbers")
+    points.add_argument("--timestamps", type=_ints, help="comma-separated unix timestamps")
+    ap.add_argument("--eth-usd", type=float, default=None, help="ETH price for every point (default: current)")
+    ap.add_argument("-o", "--output", default="-", help="CSV output (default: stdout)")
+    args = ap.parse_args(argv)
+
+    if args.blocks:
+        series = score_history(args.address, args.blocks, by="block", eth_usd=args.eth_usd)
+    else:
+        series = score_history(args.address, args.timestamps or daily_points(args.days), eth_usd=args.eth_usd)
+    columns = [c for c in ("block", "ts") if c in series] + FACTOR_NAMES + ["score"]
+    with (contextlib.nullcontext(sys.stdout) if args.output == "-" else open(args.output, "w", newline="")) as out:
+        writer = csv.writer(out)
+        writer.writerow(columns)
+        for row in zip(*(series[c] for c in columns)):
+            writer.writerow([v.item() for v in row])
+
+
+if __name__ == "__main__":
+    main()
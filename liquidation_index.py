@@ -0,0 +1,178 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Union
+
+from dataExtractor import COMPOUND_LIQUIDATEBORROW_TOPIC, CONFIRMATIONS, borrower_words, pad_topic_address
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS logs (
+    contract  TEXT NOT NULL,
+    topic0    TEXT NOT NULL,
+    tx_hash   TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    block     INTEGER NOT NULL,
+    raw       TEXT NOT NULL,
+    PRIMARY KEY (contract, tx_hash, log_index)
+);
+CREATE TABLE IF NOT EXISTS log_topics (
+    topic     TEXT NOT NULL,
+    contract  TEXT NOT NULL,
+    tx_hash   TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    PRIMARY KEY (topic, contract, tx_hash, log_index)
+);
+CREATE TABLE IF NOT EXISTS cursors (
+    contract   TEXT NOT NULL,
+    topic0     TEXT NOT NULL,
+    next_block INTEGER NOT NULL,
+    synced_at  REAL NOT NULL,
+    PRIMARY KEY (contract, topic0)
+);
+"""
+
+
+def _hex_int(x) -> int:
+    if isinstance(x, int):
+        return x
+    if str(x) in ("", "0x"):
+        return 0  # Etherscan getLogs writes zero (e.g. the first logIndex of a tx) as a bare "0x"
+    return int(x, 16) if str(x).startswith("0x") else int(x)
+
+
+# =========================
+# Local liquidation event index
+# =========================
+class LiquidationIndex:
+    """SQLite index of liquidation logs, keyed by borrower topic.
+
+    Each (contract, topic0) pair is downloaded once and then extended from a
+    stored block cursor. A borrower lookup is an indexed query over the
+    log's `borrower_words` (every non-signature topic, and LiquidateBorrow's
+    borrower data word), the same matching rule as `filter_logs_by_borrower`.
+    """
+
+    def __init__(self, path: str = "liquidations.db", max_staleness: float = 60.0):
+        self.path = path
+        # how old (seconds) a cursor may be before a lookup triggers a sync
+        self.max_staleness = max_staleness
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        if self._db.execute("PRAGMA user_version").fetchone()[0] < 1:
+            self._index_compound_borrowers()
+            self._db.execute("PRAGMA user_version = 1")
+        self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # --- cursor ---
+    def cursor(self, contract: str, topic0: str) -> Optional[tuple]:
+        row = self._db.execute(
+            "SELECT next_block, synced_at FROM cursors WHERE contract = ? AND topic0 = ?",
+            (contract.lower(), topic0.lower()),
+        ).fetchone()
+        return row
+
+    def _set_cursor(self, contract: str, topic0: str, next_block: int):
+        self._db.execute(
+            "INSERT OR REPLACE INTO cursors (contract, topic0, next_block, synced_at) VALUES (?, ?, ?, ?)",
+            (contract.lower(), topic0.lower(), next_block, time.time()),
+        )
+
+    # --- ingest ---
+    def add_logs(self, contract: str, topic0: str, logs: List[Dict]) -> int:
+        """Insert logs (duplicates are ignored). Returns the number of new rows."""
+        contract, topic0 = contract.lower(), topic0.lower()
+        added = 0
+        for l in logs:
+            tx_hash = l["transactionHash"].lower()
+            log_index = _hex_int(l.get("logIndex", 0))
+            cur = self._db.execute(
+                "INSERT OR IGNORE INTO logs (contract, topic0, tx_hash, log_index, block, raw) VALUES (?, ?, ?, ?, ?, ?)",
+                (contract, topic0, tx_hash, log_index, _hex_int(l["blockNumber"]), json.dumps(l)),
+            )
+            if not cur.rowcount:
+                continue
+            added += 1
+            self._add_words(l, contract, tx_hash, log_index)
+        return added
+
+    def _add_words(self, log: Dict, contract: str, tx_hash: str, log_index: int):
+        for word in borrower_words(log):
+            self._db.execute(
+                "INSERT OR IGNORE INTO log_topics (topic, contract, tx_hash, log_index) VALUES (?, ?, ?, ?)",
+                (word, contract, tx_hash, log_index),
+            )
+
+    def _index_compound_borrowers(self):
+        # indexes written before borrower_words only hold topics; LiquidateBorrow names the borrower in data
+        rows = self._db.execute(
+            "SELECT contract, tx_hash, log_index, raw FROM logs WHERE topic0 = ?",
+            (COMPOUND_LIQUIDATEBORROW_TOPIC.lower(),),
+        ).fetchall()
+        for contract, tx_hash, log_index, raw in rows:
+            self._add_words(json.loads(raw), contract, tx_hash, log_index)
+
+    def sync(self, contract: str, topic0: str, api, to_block: Optional[int] = None) -> int:
+        """Fetch logs from the stored cursor up to `to_block` (default: CONFIRMATIONS behind the head).
+
+        Returns the new log count.
+        """
+        with self._lock:
+            row = self.cursor(contract, topic0)
+            from_block = row[0] if row else 0
+            head = to_block if to_block is not None else api.block_number() - CONFIRMATIONS
+            added = 0
+            if from_block <= head:
+                # the data source pages the range itself (EtherscanClient.iter_logs)
+                added = self.add_logs(contract, topic0, api.logs(contract, topic0=topic0, from_block=from_block,
+                                                                 to_block=head))
+            self._set_cursor(contract, topic0, max(from_block, head + 1))
+            self._db.commit()
+            return added
+
+    def sync_sources(self, api, to_block: Optional[int] = None) -> Dict[str, int]:
+        """Sync every liquidation source the extractors read. Returns new log counts by source."""
+        from dataExtractor import AAVE_LIQUIDATIONCALL_TOPIC, AAVE_V3_POOL, COMPOUND_LIQUIDATEBORROW_TOPIC, CTOKENS
+
+        added = {"aave": self.sync(AAVE_V3_POOL, AAVE_LIQUIDATIONCALL_TOPIC, api, to_block)}
+        for symbol, ctoken in CTOKENS.items():
+            added[symbol] = self.sync(ctoken, COMPOUND_LIQUIDATEBORROW_TOPIC, api, to_block)
+        return added
+
+    # --- lookup ---
+    def borrower_logs(self, contract: str, topic0: str, borrower: str, api=None, from_block: int = 0,
+                      to_block: Union[int, str] = "latest") -> List[Dict]:
+        """Logs of `contract`/`topic0` naming `borrower` in any topic, between the two blocks inclusive.
+
+        When `api` is given and the cursor is missing or older than
+        `max_staleness`, the index is extended first.
+        """
+        if api is not None:
+            with self._lock:
+                row = self.cursor(contract, topic0)
+            if row is None or time.time() - row[1] > self.max_staleness:
+                self.sync(contract, topic0, api)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT l.raw FROM log_topics t JOIN logs l"
+                " ON l.contract = t.contract AND l.tx_hash = t.tx_hash AND l.log_index = t.log_index"
+                " WHERE t.topic = ? AND t.contract = ? AND l.topic0 = ? AND l.block BETWEEN ? AND ?"
+                " ORDER BY l.block, l.log_index",
+                (pad_topic_address(borrower), contract.lower(), topic0.lower(), int(from_block),
+                 2**62 if to_block == "latest" else int(to_block)),
+            ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+
+if __name__ == "__main__":
+    # Build or extend the index for every liquidation source used by the extractors
+    from dataExtractor import ETHERSCAN_API_KEY, LIQUIDATION_INDEX_PATH, EtherscanClient
+
+    idx = LiquidationIndex(LIQUIDATION_INDEX_PATH or "liquidations.db")
+    for source, added in idx.sync_sources(EtherscanClient(ETHERSCAN_API_KEY)).items():
+        print(source + ":", added)
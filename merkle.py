@@ -1,5 +1,8 @@
 import hashlib
-from typing import Iterable, List
+from collections.abc import Mapping as _MappingABC
+
+import metrics
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
 
 # Deterministic order by key; leaf = keccak(key || ":" || value)
 try:
@@ -7,20 +10,157 @@ try:
 except Exception:
     def keccak(x: bytes) -> bytes:
         return hashlib.sha3_256(x).digest()
+
+try:
+    # raw keccak over bytes, without eth_utils' type dispatch; used on the hot path below
+    from eth_hash.auto import keccak as _keccak_bytes
+except Exception:
+    _keccak_bytes = keccak
     
 def leaf(key: str, value: str) -> bytes:
-    return keccak((key + ":" + value).encode())
+    return _keccak_bytes((key + ":" + value).encode())
 
 
+@metrics.timed(metrics.MERKLE_SECONDS)
 def merkle_root(pairs: Iterable[tuple]) -> bytes:
-    nodes: List[bytes] = [leaf(k, str(v)) for k, v in sorted(pairs, key=lambda kv: kv[0])]
-    if not nodes:
-        return b"\x00"* 32
-    while len(nodes) > 1:
-        nxt: List[bytes] = []
-        for i in range(0, len(nodes), 2):
-            a = nodes[i]
-            b = nodes[i+1] if i+1 < len(nodes) else nodes[i]
-            nxt.append(keccak(a + b))
-        nodes = nxt
-    return nodes[0]
\ No newline at end of file
+    return MerkleTree.from_pairs(pairs).root
+
+
+# =========================
+# Tree with cached levels
+# =========================
+class MerkleTree:
+    """Merkle tree that keeps every level, for proofs and O(log n) leaf updates.
+
+    Same pairing as the original `merkle_root`: an odd last node is paired
+    with itself. Each level is one preallocated bytearray of 32-byte nodes,
+    padded to an even count so a parent is the hash of one contiguous
+    64-byte slice of its child level (no per-pair concatenation).
+    """
+
+    __slots__ = ("keys", "_pos", "_levels", "_sizes")
+
+    def __init__(self, leaves: Sequence[bytes], keys: Optional[Sequence[str]] = None):
+        n = len(leaves)
+        self.keys = list(keys) if keys is not None else None
+        self._pos: Dict[str, int] = {k: i for i, k in enumerate(self.keys)} if self.keys else {}
+        self._sizes: List[int] = [n]
+        while self._sizes[-1] > 1:
+            self._sizes.append((self._sizes[-1] + 1) // 2)
+        self._levels: List[bytearray] = [bytearray(32 * (m + (m & 1 and m > 1))) for m in self._sizes]
+        if n == 0:
+            self._levels = [bytearray(32)]
+            return
+        self._levels[0][:32 * n] = b"".join(leaves)
+        for d in range(len(self._sizes) - 1):
+            self._hash_level(d)
+
+    @classmethod
+    def from_pairs(cls, pairs: Iterable[tuple]) -> "MerkleTree":
+        """Tree over (key, value) factor pairs (or a mapping), leaves sorted by key as in `merkle_root`."""
+        if isinstance(pairs, _MappingABC):
+            pairs = pairs.items()
+        items = sorted(pairs, key=lambda kv: kv[0])
+        return cls([leaf(k, str(v)) for k, v in items], keys=[k for k, _ in items])
+
+    def __len__(self) -> int:
+        return self._sizes[0]
+
+    @property
+    def root(self) -> bytes:
+        return bytes(self._levels[-1][:32])
+
+    def node(self, depth: int, index: int) -> bytes:
+        return bytes(self._levels[depth][32 * index:32 * index + 32])
+
+    # --- building ---
+    def _pad(self, d: int):
+        # duplicate an odd last node so its parent hashes a contiguous pair
+        m = self._sizes[d]
+        if m & 1 and m > 1:
+            buf = self._levels[d]
+            buf[32 * m:32 * m + 32] = buf[32 * (m - 1):32 * m]
+
+    def _hash_level(self, d: int):
+        self._pad(d)
+        src, dst = memoryview(self._levels[d]), self._levels[d + 1]
+        h = _keccak_bytes
+        for j in range(self._sizes[d + 1]):
+            dst[32 * j:32 * j + 32] = h(bytes(src[64 * j:64 * j + 64]))
+
+    def update(self, index: int, leaf_hash: bytes) -> bytes:
+        """Replace one leaf and rehash its path to the root; returns the new root."""
+        self._levels[0][32 * index:32 * index + 32] = leaf_hash
+        for d in range(len(self._sizes) - 1):
+            self._pad(d)
+            j = index // 2
+            self._levels[d + 1][32 * j:32 * j + 32] = _keccak_bytes(bytes(self._levels[d][64 * j:64 * j + 64]))
+            index = j
+        return self.root
+
+    def set(self, key: str, value) -> bytes:
+        """Update a factor of a `from_pairs` tree in place."""
+        return self.update(self._pos[key], leaf(key, str(value)))
+
+    # --- proofs ---
+    def index(self, key: str) -> int:
+        return self._pos[key]
+
+    def proof(self, index: int) -> List[bytes]:
+        """Sibling hashes from leaf `index` up to (not including) the root."""
+        out = []
+        for d in range(len(self._sizes) - 1):
+            sib = index ^ 1
+            out.append(self.node(d, sib if sib < self._sizes[d] else index))
+            index //= 2
+        return out
+
+    def prove(self, key: str) -> Dict:
+        """Inclusion proof for one factor of a `from_pairs` tree, hex-encoded for JSON."""
+        i = self._pos[key]
+        return {
+            "key": key, "leaf": "0x" + self.node(0, i).hex(), "index": i,
+            "proof": ["0x" + p.hex() for p in self.proof(i)], "root": "0x" + self.root.hex(),
+        }
+
+    @staticmethod
+    def verify(leaf_hash: bytes, proof: Sequence[bytes], index: int, root: bytes) -> bool:
+        return verify_proof(leaf_hash, proof, index, root)
+
+
+def verify_proof(leaf_hash: bytes, proof: Sequence[bytes], index: int, root: bytes) -> bool:
+    node = leaf_hash
+    for sib in proof:
+        node = keccak(node + sib) if index % 2 == 0 else keccak(sib + node)
+        index //= 2
+    return node == root
+
+
+def verify_factor(key: str, value, proof: Sequence[bytes], index: int, root: bytes) -> bool:
+    """Check one factor value against a factors root (as produced by `MerkleTree.prove`)."""
+    return verify_proof(leaf(key, str(value)), proof, index, root)
+
+
+# =========================
+# Bulk roots
+# =========================
+def merkle_roots(factor_sets: Iterable[Mapping]) -> List[bytes]:
+    """`merkle_root` for many factor dicts in one call.
+
+    Sets sharing one key layout (the usual case: every wallet has the same
+    factors) reuse the sorted key order and a single scratch tree, so only
+    leaf hashing and one pass per level is done per set.
+    """
+    roots: List[bytes] = []
+    layout: Optional[Tuple[str, ...]] = None
+    tree: Optional[MerkleTree] = None
+    for factors in factor_sets:
+        keys = tuple(sorted(factors))
+        if keys != layout or tree is None:
+            layout, tree = keys, MerkleTree.from_pairs(factors.items())
+        else:
+            tree._levels[0][:32 * len(keys)] = b"".join([leaf(k, str(factors[k])) for k in keys])
+            for d in range(len(tree._sizes) - 1):
+                tree._hash_level(d)
+        roots.append(tree.root)
+    return roots
@@ -0,0 +1,203 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# seconds; Etherscan round trips sit in the 0.1-1s range, signing and hashing well below
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+# =========================
+# Metric types
+# =========================
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(str(labels.get(l, "")) for l in self.labels)
+
+    def _fmt(self, key: Tuple, extra: str = "") -> str:
+        parts = [f'{l}="{v}"' for l, v in zip(self.labels, key)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{self._fmt(k)} {v}" for k, v in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, list] = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            if i < len(self.buckets):
+                s[i] += 1
+            s[-2] += value
+            s[-1] += 1
+        _record_span(self.name, key, value)
+
+    def count(self, **labels) -> int:
+        s = self._series.get(self._key(labels))
+        return s[-1] if s else 0
+
+    def samples(self) -> List[str]:
+        out = []
+        with self._lock:
+            for key, s in sorted(self._series.items()):
+                cum = 0
+                for b, c in zip(self.buckets, s):
+                    cum += c
+                    le = 'le="%s"' % b
+                    out.append(f"{self.name}_bucket{self._fmt(key, le)} {cum}")
+                le = 'le="+Inf"'
+                out.append(f"{self.name}_bucket{self._fmt(key, le)} {s[-1]}")
+                out.append(f"{self.name}_sum{self._fmt(key)} {s[-2]}")
+                out.append(f"{self.name}_count{self._fmt(key)} {s[-1]}")
+        return out
+
+
+class Gauge(_Metric):
+    """Value read at scrape time from `fn` (a number, or a dict of label tuple -> number)."""
+
+    def __init__(self, name: str, help: str, fn: Callable, labels: Sequence[str] = (), type: str = "gauge"):
+        self.fn = fn
+        self.type = type
+        super().__init__(name, help, labels)
+
+    def samples(self) -> List[str]:
+        v = self.fn()
+        if isinstance(v, dict):
+            return [f"{self.name}{self._fmt(k if isinstance(k, tuple) else (k,))} {x}" for k, x in sorted(v.items())]
+        return [f"{self.name} {v}"]
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            # re-registering a name (e.g. a module reloaded in a dev server) replaces the old one
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (0.0.4)."""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for m in metrics:
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.type}")
+            lines.extend(m.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# =========================
+# Per-request timing breakdown
+# =========================
+_breakdown: contextvars.ContextVar[Optional[Dict]] = contextvars.ContextVar("metrics_breakdown", default=None)
+
+
+def _record_span(name: str, key: Tuple, seconds: float):
+    spans = _breakdown.get()
+    if spans is not None:
+        label = name if not key else f"{name}[{','.join(key)}]"
+        s = spans.setdefault(label, {"count": 0, "seconds": 0.0})
+        s["count"] += 1
+        s["seconds"] += seconds
+
+
+@contextmanager
+def breakdown():
+    """Collect every histogram observation made in this context: {metric[labels]: {count, seconds}}."""
+    spans: Dict = {}
+    token = _breakdown.set(spans)
+    try:
+        yield spans
+    finally:
+        _breakdown.reset(token)
+
+
+@contextmanager
+def timer(hist: Histogram, **labels):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        hist.observe(time.perf_counter() - t0, **labels)
+
+
+def timed(hist: Histogram, **labels):
+    """Decorator form of `timer`."""
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(hist, **labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+# =========================
+# Pipeline metrics
+# =========================
+ETHERSCAN_REQUESTS = Counter("etherscan_requests_total", "Etherscan HTTP attempts by action and outcome",
+                             ["action", "outcome"])
+ETHERSCAN_SECONDS = Histogram("etherscan_request_seconds", "Etherscan HTTP round trip per attempt", ["action"])
+RATELIMIT_WAIT_SECONDS = Histogram("ratelimit_wait_seconds", "Time spent waiting for a scheduler token")
+RPC_SECONDS = Histogram("rpc_batch_seconds", "JSON-RPC batch round trip (batched balanceOf calls)")
+EXTRACTOR_SECONDS = Histogram("extractor_seconds", "Extractors method duration", ["extractor"])
+FILTER_LOGS_SECONDS = Histogram("filter_logs_by_borrower_seconds", "Client-side liquidation log filtering")
+MERKLE_SECONDS = Histogram("merkle_root_seconds", "Factors Merkle root construction")
+SIGN_SECONDS = Histogram("sign_seconds", "EIP-712 signing", ["kind"])
+PRICE_LOOKUPS = Counter("price_lookups_total", "Cached ETH/USD lookups by outcome (hit, refresh, stale, error)",
+                        ["outcome"])
+FOLLOWER_BLOCKS = Counter("follower_blocks_total", "Blocks the follower has scanned")
+FOLLOWER_REORGS = Counter("follower_reorgs_total", "Reorgs the follower rewound")
+FOLLOWER_RESCORES = Counter("follower_rescores_total", "Wallets re-scored by the follower, by outcome", ["outcome"])
+SUBMISSIONS = Counter("submissions_total", "Finished on-chain submissions by final status", ["status"])
+SUBMIT_SECONDS = Histogram("submission_seconds", "Queue-to-final-status time of a submission",
+                           buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800))
@@ -0,0 +1,95 @@
+import threading
+import time
+from typing import Optional
+
+import requests
+
+import metrics
+from cache import SingleFlight
+
+COINGECKO_URL = "https://api.coingecko.com/api/v3/simple/price?ids=ethereum&vs_currencies=usd"
+
+
+# =========================
+# Price providers
+# =========================
+class PriceProvider:
+    """Source of the ETH/USD price used by every factor computation."""
+
+    def eth_usd(self) -> float:
+        raise NotImplementedError
+
+
+class CoinGeckoPriceProvider(PriceProvider):
+    def __init__(self, url: str = COINGECKO_URL, timeout: float = 10):
+        self.url = url
+        self.timeout = timeout
+
+    def eth_usd(self) -> float:
+        resp = requests.get(self.url, timeout=self.timeout)
+        resp.raise_for_status()
+        return float(resp.json()["ethereum"]["usd"])
+
+
+class StaticPriceProvider(PriceProvider):
+    """Fixed price, for tests and offline runs."""
+
+    def __init__(self, price: float):
+        self.price = price
+
+    def eth_usd(self) -> float:
+        return self.price
+
+
+class CachedPriceProvider(PriceProvider):
+    """TTL cache in front of another provider.
+
+    Concurrent callers that find the cache expired share a single upstream
+    request. If a refresh fails, the last price is served for up to
+    `max_stale` seconds before the error is raised.
+    """
+
+    def __init__(self, source: PriceProvider, ttl: float = 60, max_stale: float = 900):
+        self.source = source
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._price: Optional[float] = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+
+    def _refresh(self) -> float:
+        price = self.source.eth_usd()
+        with self._lock:
+            self._price, self._fetched_at = price, time.monotonic()
+        return price
+
+    def eth_usd(self) -> float:
+        with self._lock:
+            price, age = self._price, time.monotonic() - self._fetched_at
+        if price is not None and age < self.ttl:
+            metrics.PRICE_LOOKUPS.inc(outcome="hit")
+            return price
+        try:
+            price = self._flight.do("eth_usd", self._refresh)
+            metrics.PRICE_LOOKUPS.inc(outcome="refresh")
+            return price
+        except Exception:
+            if price is not None and age < self.max_stale:
+                metrics.PRICE_LOOKUPS.inc(outcome="stale")
+                return price
+            metrics.PRICE_LOOKUPS.inc(outcome="error")
+            raise
+
+
+_default_provider: PriceProvider = CachedPriceProvider(CoinGeckoPriceProvider())
+
+
+def get_provider() -> PriceProvider:
+    return _default_provider
+
+
+def set_provider(provider: PriceProvider):
+    """Replace the process-wide provider (e.g. `StaticPriceProvider(3000.0)` in tests)."""
+    global _default_provider
+    _default_provider = provider
@@ -1,170 +1,299 @@
-from flask import Flask, jsonify
-from flask_cors import CORS
-import random
-import os, time, json
-from eth_account import Account
-from eth_account.messages import encode_typed_data
-from eth_utils import to_hex
-from web3 import Web3
-from merkle import merkle_root
+import logging
+import re
+import os, time, threading
+from typing import Dict
+
+from flask import Blueprint, Flask, Response, jsonify, request
+
+from cache import SingleFlight, TTLCache
+import metrics
+
+# Nothing here does I/O or loads the chain stack at import: `.env` is read by create_app, and the
+# extractor, signer (eth_account) and submitter (web3) are imported on first use or by warm_up.
+
+DEFAULT_ADDRESS = "0x89B8B20AE90328692cD367f75aaFadF55fd33E8B"
+ADDRESS_RE = re.compile(r"^0x[0-9a-fA-F]{40}$")
+
+# factors, score and signed attestation per wallet; keep the TTL well inside validUntil (1h)
+score_cache = TTLCache(maxsize=int(os.getenv("SCORE_CACHE_SIZE", "10000")),
+                       ttl=float(os.getenv("SCORE_CACHE_TTL", "300")))
+# concurrent requests for the same wallet wait for one computation
+score_flight = SingleFlight()
+# factor trees for served scores, keyed by factors root, so proofs do not rebuild the tree
+factor_trees = TTLCache(maxsize=int(os.getenv("SCORE_CACHE_SIZE", "10000")),
+                        ttl=float(os.getenv("SCORE_CACHE_TTL", "300")))
+
+metrics.Gauge("score_cache_requests_total", "Score cache lookups by result",
+              lambda: {"hit": score_cache.hits, "miss": score_cache.misses}, ["result"], type="counter")
+metrics.Gauge("score_cache_entries", "Wallets currently held in the score cache", lambda: len(score_cache))
+metrics.Gauge("submission_queue_pending", "Attestations queued or in flight",
+              lambda: _submitter.pending() if _submitter is not None else 0)
+
+bp = Blueprint("score", __name__)
+log = logging.getLogger(__name__)
+
+
+# =========================
+# Dependencies (loaded on first use)
+# =========================
+# dependency -> "ok", or the error that stopped warm_up loading it; missing means not loaded yet
+_loaded: Dict[str, str] = {}
+
+api = None
+_api_lock = threading.Lock()
+
+
+def get_api():
+    """Data source for extraction, built on first use.
+
+    With a node of our own (NODE_RPC_URL), balances and liquidation logs come
+    from it, without the per-key cap. Borrower lookups go through the shared
+    liquidation index (dataExtractor.get_liquidation_index).
+    """
+    global api
+    with _api_lock:
+        if api is None:
+            from dataExtractor import EtherscanClient
+            source = EtherscanClient(os.getenv("ETHERSCAN_API_KEY"))
+            if os.getenv("NODE_RPC_URL"):
+                from rpc_source import JsonRpcDataSource
+                source = JsonRpcDataSource(os.getenv("NODE_RPC_URL"), history=source)
+            api = source
+        _loaded["extractor"] = "ok"
+        return api
+
+
+def get_attester():
+    from attestation import get_attester as shared_attester
+    attester = shared_attester()
+    _loaded["attester"] = "ok"
+    return attester
+
+
+def submission_enabled() -> bool:
+    return bool(os.getenv("RPC_URL") and os.getenv("SCORE_ORACLE_ADDR"))
+
+
+_submitter = None
+_submitter_lock = threading.Lock()
+
+
+def get_submitter():
+    """Process-wide SubmissionQueue (one local nonce counter for the relay key), started on first use."""
+    global _submitter
+    with _submitter_lock:
+        if _submitter is None:
+            from web3 import Web3
+            from attestation import ATTESTER_PK
+            from submitter import SubmissionQueue
+            w3 = Web3(Web3.HTTPProvider(os.getenv("RPC_URL")))
+            _submitter = SubmissionQueue(
+                w3, os.getenv("SCORE_ORACLE_ADDR"), os.getenv("RELAY_PK", ATTESTER_PK), chain_id=1,
+            ).start()
+        _loaded["submitter"] = "ok"
+        return _submitter
+
+
+def get_liquidations():
+    """The shared liquidation index, extended to the head (the first sync downloads every source)."""
+    from dataExtractor import get_liquidation_index
+    index = get_liquidation_index()
+    if index is not None:
+        index.sync_sources(get_api())
+    _loaded["liquidations"] = "ok" if index is not None else "disabled"
+    return index
+
+
+def warm_up():
+    """Load every dependency now rather than in the first request that needs it (progress is on /ready)."""
+    steps = {"extractor": get_api, "liquidations": get_liquidations, "attester": get_attester}
+    if submission_enabled():
+        steps["submitter"] = get_submitter
+    for name, load in steps.items():
+        try:
+            load()
+        except Exception as e:
+            _loaded[name] = f"{type(e).__name__}: {e}"
+
+
+def readiness() -> Dict[str, str]:
+    """Per dependency: "ok", "pending", "disabled" or the error that stopped it loading."""
+    checks = {name: _loaded.get(name, "pending") for name in ("extractor", "liquidations", "attester")}
+    checks["submitter"] = _loaded.get("submitter", "pending") if submission_enabled() else "disabled"
+    return checks
 
-from dataExtractor import extract_wallet_factors
-from dataExtractor import EtherscanClient
 
-from dotenv import load_dotenv
-import math
-
-
-
-
-app = Flask(__name__)
-CORS(app) 
-
-
-load_dotenv()
-ETHERSCAN_API_KEY = os.getenv("ETHERSCAN_API_KEY") 
-
-api = EtherscanClient(ETHERSCAN_API_KEY)
-factors = extract_wallet_factors("0x89B8B20AE90328692cD367f75aaFadF55fd33E8B", api=api)
-
-
-def points_default_count(x):
-    if x == 0:
-        return 25
-    elif x <= 2:
-        return 15
-    else:
-        return max(0, 25 - x*5)
-
-def normalize_01(x, lo, hi):
-    if hi <= lo: return 0.0
-    x = max(lo, min(hi, x))
-    return (x - lo) / (hi - lo)
-
-def stablecoin_score(ratio):
-    # ratio 0-1, sigmoid towards 1 if more stablecoin
-    return 1 / (1 + 2**(-5*(ratio - 0.5)))
-
-def log_norm(x, max_val):
-    return math.log(1 + x) / math.log(1 + max_val)
-
-
-def generate_credit_score():
-    weights = {
-    "on_time_repayment_rate": 25,
-    "default_count": 25,
-    "avg_tx_frequency": 10,
-    "avg_balance_usd": 10,
-    "stablecoin_ratio": 10,
-    "debt_utilization": 10,
-    "staking_amount_eth": 10,
-    }
-
-    score = 0
-    score += weights["on_time_repayment_rate"] * normalize_01(factors["on_time_repayment_rate"], 0.5, 1) 
-    score += points_default_count(factors["default_count"])
-    score += weights["avg_tx_frequency"] * normalize_01(factors["avg_tx_frequency"], 0, 4)  
-    score += weights["avg_balance_usd"] * log_norm(factors["avg_balance_usd"], 4400)  
-    score += weights["stablecoin_ratio"] * stablecoin_score(factors["stablecoin_ratio"])
-    score += weights["debt_utilization"] * (1 - normalize_01(factors["debt_utilization"], 0, 1)**1.5)  
-    score += weights["staking_amount_eth"] * log_norm(factors["staking_amount_eth"], 50)  
-    score = round(min(100, max(0, score)))
-
-    with open("score.json", "w") as f:
-        f.write(f'{{"score": {score}}}')
-
-    #Merkle 
-    pairs = list(factors.items())
-    root_bytes = merkle_root(pairs)
-    root_hex = to_hex(root_bytes)
-
-
-    chain_id = 1
-    verifying_contract = os.getenv("SCORE_ORACLE_ADDR", "0xCcCCccccCCCCcCCCCCCcCcCccCcCCCcCcccccccC")
-    attester_pk = os.getenv(
-        "ATTESTER_PK",
-        "0x59c6995e998f97a5a0044976f7d7b5b4fa54a1a28adce5f3d7c3c7e3d7a3e8a5"
-    )  
-    attester = Account.from_key(attester_pk).address
-
-    wallet = os.getenv("WALLET", "0x000000000000000000000000000000000000bEEF")
+# =========================
+# Scoring
+# =========================
+def generate_credit_score(address=DEFAULT_ADDRESS, wallet=None):
+    from dataExtractor import extract_wallet_factors
+    from scoring import credit_score
+
+    factors = extract_wallet_factors(address, api=get_api())
+    score = credit_score(factors)
+
+    #Merkle
+    root_bytes = factors.merkle_root()
+    root_hex = "0x" + root_bytes.hex()
+
+
+    attester = get_attester()
+
+    wallet = wallet or os.getenv("WALLET", "0x000000000000000000000000000000000000bEEF")
     valid_until = int(time.time()) + 3600
     nonce = int(time.time())
 
-    typed_data = {
-        "types": {
-            "EIP712Domain": [
-                {"name": "name", "type": "string"},
-                {"name": "version", "type": "string"},
-                {"name": "chainId", "type": "uint256"},
-                {"name": "verifyingContract", "type": "address"},
-            ],
-            "Score": [
-                {"name": "wallet", "type": "address"},
-                {"name": "score", "type": "uint256"},
-                {"name": "factorsRoot", "type": "bytes32"},
-                {"name": "validUntil", "type": "uint256"},
-                {"name": "nonce", "type": "uint256"},
-            ],
-        },
-        "primaryType": "Score",
-        "domain": {
-            "name": "CryptoCreditScore",
-            "version": "1",
-            "chainId": chain_id,
-            "verifyingContract": verifying_contract,
-        },
-        "message": {
-            "wallet": wallet,
-            "score": score,
-            "factorsRoot": root_hex,
-            "validUntil": valid_until,
-            "nonce": nonce,
-        },
-    }
-
-    msg = encode_typed_data(full_message=typed_data)
-
-    signed = Account.sign_message(msg, private_key=attester_pk)
+    signature = attester.sign_score(wallet, score, root_hex, valid_until, nonce)
 
-    print("Attester:", attester)
-    print("Score:", score)
-    print("FactorsRoot:", root_hex)
-    print("ValidUntil:", valid_until, "Nonce:", nonce)
-    print("Signature:", signed.signature.hex())
+    log.debug("attested %s score=%s factorsRoot=%s validUntil=%s nonce=%s attester=%s signature=%s",
+              wallet, score, root_hex, valid_until, nonce, attester.address, signature)
 
 
-    if os.getenv("RPC_URL") and os.getenv("SCORE_ORACLE_ADDR"):
-        w3 = Web3(Web3.HTTPProvider(os.getenv("RPC_URL")))
-        acct = w3.eth.account.from_key(os.getenv("RELAY_PK", attester_pk))
-        abi = json.loads(
-            '[{"inputs":[{"internalType":"address","name":"wallet","type":"address"},{"internalType":"uint256","name":"score","type":"uint256"},{"internalType":"bytes32","name":"factorsRoot","type":"bytes32"},{"internalType":"uint256","name":"validUntil","type":"uint256"},{"internalType":"uint256","name":"nonce","type":"uint256"},{"internalType":"bytes","name":"signature","type":"bytes"}],"name":"submit","outputs":[],"stateMutability":"nonpayable","type":"function"}]'
-        )
-        ctr = w3.eth.contract(address=Web3.to_checksum_address(verifying_contract), abi=abi)
-        tx = ctr.functions.submit(
-            wallet, int(score), root_hex, int(valid_until), int(nonce), signed.signature
-        ).build_transaction({
-            'from': acct.address,
-            'nonce': w3.eth.get_transaction_count(acct.address),
-            'gas': 200000,
-            'maxFeePerGas': w3.to_wei('30', 'gwei'),
-            'maxPriorityFeePerGas': w3.to_wei('1.5', 'gwei'),
-            'chainId': chain_id,
-        })
-        tx_s = acct.sign_transaction(tx)
-        txh = w3.eth.send_raw_transaction(tx_s.rawTransaction)
-        print("Submitted tx:", txh.hex())
-    return score
+    submission = None
+    if submission_enabled():
+        # sent by the background worker; the request does not wait for the chain
+        submission = get_submitter().submit({
+            "wallet": wallet, "score": score, "factorsRoot": root_hex,
+            "validUntil": valid_until, "nonce": nonce, "signature": signature,
+        }).status
+    return {
+        "address": address, "wallet": wallet, "score": score, "factorsRoot": root_hex,
+        "validUntil": valid_until, "nonce": nonce, "signature": signature, "factors": factors.to_dict(),
+        "submission": submission,
+    }
 
 
+def cached_credit_score(address, wallet=None):
+    key = (address.lower(), wallet)
+    result = score_cache.get(key)
+    if result is not None:
+        return result
 
+    def compute():
+        # a flight that finished while we were waiting for the lock may have filled it
+        result = score_cache.get(key)
+        if result is None:
+            result = generate_credit_score(address, wallet=wallet)
+            score_cache.set(key, result)
+        return result
 
+    return score_flight.do(key, compute)
 
 
-@app.route('/score')
+# =========================
+# Routes
+# =========================
+@bp.route('/score')
 def get_score():
-    score = generate_credit_score()
-    return jsonify({"score": score})
+    result = cached_credit_score(DEFAULT_ADDRESS)
+    return jsonify({"score": result["score"]})
+
+
+@bp.route('/score/<address>')
+def get_address_score(address):
+    if not ADDRESS_RE.match(address):
+        return jsonify({"error": "invalid address"}), 400
+    if not request.args.get("timings"):
+        return jsonify(cached_credit_score(address, wallet=address))
+    # ?timings=1: time spent per metric (Etherscan action, extractor, merkle, signing) in this request
+    t0 = time.perf_counter()
+    with metrics.breakdown() as spans:
+        result = cached_credit_score(address, wallet=address)
+    return jsonify({**result, "timings": {"total": time.perf_counter() - t0, "spans": spans}})
+
+
+@bp.route('/metrics')
+def get_metrics():
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@bp.route('/ready')
+def get_ready():
+    checks = readiness()
+    ready = all(v in ("ok", "disabled") for v in checks.values())
+    return jsonify({"ready": ready, "checks": checks}), 200 if ready else 503
+
+
+@bp.route('/score/<address>/proof/<factor>')
+def get_factor_proof(address, factor):
+    from factors import FACTOR_NAMES, WalletFactors
+
+    if not ADDRESS_RE.match(address):
+        return jsonify({"error": "invalid address"}), 400
+    result = cached_credit_score(address, wallet=address)
+    if factor not in FACTOR_NAMES:
+        return jsonify({"error": "unknown factor"}), 404
+    tree = factor_trees.get(result["factorsRoot"])
+    if tree is None:
+        tree = WalletFactors.from_dict(result["factors"]).merkle_tree()
+        factor_trees.set(result["factorsRoot"], tree)
+    return jsonify({"value": result["factors"][factor], **tree.prove(factor)})
+
+
+_batch = None
+_batch_lock = threading.Lock()
+
+
+def get_batch():
+    """The batch attestation written by `batch_score.py --batch-attest`, loaded once from BATCH_ATTESTATION."""
+    global _batch
+    path = os.getenv("BATCH_ATTESTATION")
+    if _batch is None and path and os.path.exists(path):
+        with _batch_lock:
+            if _batch is None:
+                from batch_attest import BatchAttestation
+                _batch = BatchAttestation.load(path)
+    return _batch
+
+
+@bp.route('/proof/<address>')
+def get_address_proof(address):
+    if not ADDRESS_RE.match(address):
+        return jsonify({"error": "invalid address"}), 400
+    batch = get_batch()
+    proof = batch.proof(address) if batch is not None else None
+    if proof is None:
+        return jsonify({"error": "address not in batch"}), 404
+    return jsonify(proof)
+
+
+# =========================
+# App factory
+# =========================
+def create_app(warm: bool = True) -> Flask:
+    """The score API. Reads `.env`; with `warm`, a background thread loads the dependencies.
+
+    /ready answers 503 until they are loaded. Build one app per worker
+    process (e.g. gunicorn 'pythonServer:create_app()'): the warm-up thread
+    does not survive a fork.
+    """
+    from dotenv import load_dotenv
+    from flask_cors import CORS
+
+    load_dotenv()
+    app = Flask(__name__)
+    CORS(app)
+    app.register_blueprint(bp)
+    if warm:
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    return app
+
+
+_app = None
+_app_lock = threading.Lock()
+
+
+def __getattr__(name):
+    # `pythonServer:app` / `pythonServer.app` still work: the default app is built on first access
+    global _app
+    if name != "app":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _app_lock:
+        if _app is None:
+            _app = create_app()
+        return _app
+
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    create_app().run(debug=True)
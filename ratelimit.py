@@ -0,0 +1,150 @@
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Lower value = served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+
+# how often an async waiter re-checks the queue when it is not at the head
+ASYNC_POLL_INTERVAL = 0.05
+
+
+# =========================
+# Token bucket (one per API key)
+# =========================
+class TokenBucket:
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        # set when the provider reports a rate limit for this key
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until one token can be taken (0 if available now)."""
+        self._refill(now)
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        return max(wait, self.blocked_until - now)
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def block(self, seconds: float):
+        now = time.monotonic()
+        self._refill(now)
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.tokens = min(self.tokens, 0.0)
+
+
+# =========================
+# Shared request scheduler
+# =========================
+class RequestScheduler:
+    """Hands out API keys at no more than `rate_per_key` requests/sec per key.
+
+    Waiters are served strictly by (priority, arrival), so interactive
+    requests overtake queued batch work. Keys the provider has rate-limited
+    are put on a cooldown with exponential backoff and full jitter.
+    """
+
+    _shared: Dict[Tuple, "RequestScheduler"] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, api_keys: List[str], rate_per_key: float = 5.0, burst: Optional[float] = None,
+                 max_retries: int = 5, base_backoff: float = 1.0, max_backoff: float = 30.0):
+        if not api_keys:
+            raise ValueError("RequestScheduler needs at least one API key")
+        self.api_keys = list(api_keys)
+        self.rate_per_key = rate_per_key
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._buckets = {k: TokenBucket(rate_per_key, burst) for k in self.api_keys}
+        self._cond = threading.Condition()
+        self._waiting: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+
+    @classmethod
+    def shared(cls, api_keys: List[str], rate_per_key: float = 5.0, **kwargs) -> "RequestScheduler":
+        """One scheduler per key set, so every client in the process draws from the same buckets."""
+        ident = (tuple(api_keys), rate_per_key)
+        with cls._shared_lock:
+            if ident not in cls._shared:
+                cls._shared[ident] = cls(api_keys, rate_per_key, **kwargs)
+            return cls._shared[ident]
+
+    # --- queue ---
+    def _enqueue(self, priority: int) -> Tuple[int, int]:
+        ticket = (priority, next(self._seq))
+        heapq.heappush(self._waiting, ticket)
+        return ticket
+
+    def _dequeue(self, ticket: Tuple[int, int]):
+        if ticket in self._waiting:
+            self._waiting.remove(ticket)
+            heapq.heapify(self._waiting)
+            self._cond.notify_all()
+
+    def _poll(self, ticket: Tuple[int, int]) -> Tuple[bool, Optional[str], Optional[float]]:
+        """With the lock held: (True, key, 0) if `ticket` got a key, else (False, None, seconds to wait or None)."""
+        if self._waiting[0] != ticket:
+            return False, None, None
+        now = time.monotonic()
+        key = min(self.api_keys, key=lambda k: self._buckets[k].wait_time(now))
+        wait = self._buckets[key].wait_time(now)
+        if wait > 0:
+            return False, None, wait
+        self._buckets[key].take(now)
+        heapq.heappop(self._waiting)
+        self._cond.notify_all()
+        return True, key, 0.0
+
+    def acquire(self, priority: int = PRIORITY_INTERACTIVE) -> str:
+        """Block until a request may be sent; returns the API key to send it with."""
+        with self._cond:
+            ticket = self._enqueue(priority)
+            try:
+                while True:
+                    granted, key, wait = self._poll(ticket)
+                    if granted:
+                        return key
+                    self._cond.wait(wait)
+            except BaseException:
+                self._dequeue(ticket)
+                raise
+
+    async def acquire_async(self, priority: int = PRIORITY_INTERACTIVE) -> str:
+        with self._cond:
+            ticket = self._enqueue(priority)
+        try:
+            while True:
+                with self._cond:
+                    granted, key, wait = self._poll(ticket)
+                if granted:
+                    return key
+                await asyncio.sleep(wait if wait is not None else ASYNC_POLL_INTERVAL)
+        except BaseException:
+            with self._cond:
+                self._dequeue(ticket)
+            raise
+
+    # --- provider feedback ---
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for retry number `attempt` (0-based)."""
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * (2 ** attempt)))
+
+    def penalize(self, api_key: str, seconds: float):
+        """Keep `api_key` out of rotation for `seconds` after the provider throttled it."""
+        with self._cond:
+            self._buckets[api_key].block(seconds)
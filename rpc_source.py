@@ -0,0 +1,105 @@
+from typing import Dict, Iterator, List, Optional, Union
+
+from balances import NODE_RPC_URL, RPC_BATCH_LIMIT, RpcBalanceClient, RpcError, balance_of_call
+from dataExtractor import (
+    AAVE_LIQUIDATIONCALL_TOPIC, ETHERSCAN_API_KEY, DataSource, EtherscanClient, filter_logs_by_borrower,
+    pad_topic_address,
+)
+from etherscan_rows import Tx, compact_log
+
+# Topic position of the indexed borrower per liquidation event. Compound's LiquidateBorrow
+# indexes nothing, so those logs are fetched by topic0 and matched client-side on the
+# borrower data word (see dataExtractor.borrower_words).
+BORROWER_TOPIC = {AAVE_LIQUIDATIONCALL_TOPIC.lower(): 3}
+
+# error messages of nodes / providers refusing an eth_getLogs range as too large
+LOG_LIMIT_ERRORS = ("more than", "too many", "range", "limit exceeded", "response size")
+
+
+# =========================
+# JSON-RPC node backend
+# =========================
+class JsonRpcDataSource(RpcBalanceClient):
+    """`DataSource` served by a standard Ethereum JSON-RPC node (ours, or any stand-in).
+
+    Balances are eth_getBalance / balanceOf eth_calls, sent as JSON-RPC
+    batches for many wallets. Liquidation logs are filtered by the node on
+    the indexed borrower topic, so only the wallet's own come back. A plain
+    node has no per-account history index, so txlist and token transfers are
+    read from `history` (Etherscan by default).
+    """
+
+    def __init__(self, url: str = NODE_RPC_URL, history: Optional[DataSource] = None, timeout: float = 30):
+        super().__init__(url, timeout)
+        self.history = history or EtherscanClient(ETHERSCAN_API_KEY)
+
+    # --- account history (delegated) ---
+    def iter_txlist(self, address: str, startblock: int = 0, endblock: int = 99999999) -> Iterator[Tx]:
+        return self.history.iter_txlist(address, startblock=startblock, endblock=endblock)
+
+    def txlist(self, address: str, startblock: int = 0, endblock: int = 99999999, sort: str = "asc") -> List[Tx]:
+        return self.history.txlist(address, startblock=startblock, endblock=endblock, sort=sort)
+
+    def internal_txs(self, address: str, startblock: int = 0, endblock: int = 99999999) -> List[Tx]:
+        return self.history.internal_txs(address, startblock=startblock, endblock=endblock)
+
+    def erc20_transfers(self, address: str, contract_address: Optional[str] = None, sort: str = "asc") -> List[Dict]:
+        return self.history.erc20_transfers(address, contract_address=contract_address, sort=sort)
+
+    # --- balances ---
+    def eth_balance(self, address: str) -> float:
+        return int(self.call("eth_getBalance", [address, "latest"]), 16) / 1e18
+
+    def eth_balances(self, addresses: List[str]) -> Dict[str, float]:
+        calls = [{"jsonrpc": "2.0", "id": i, "method": "eth_getBalance", "params": [a, "latest"]}
+                 for i, a in enumerate(addresses)]
+        out: Dict[str, float] = {}
+        for i in range(0, len(calls), RPC_BATCH_LIMIT):
+            for ans in self.batch(calls[i:i + RPC_BATCH_LIMIT]):
+                if isinstance(ans, dict) and ans.get("result") is not None:
+                    out[addresses[ans["id"]].lower()] = int(ans["result"], 16) / 1e18
+        return out
+
+    def token_balance(self, token: str, address: str) -> int:
+        call = balance_of_call(token, address, 0)
+        result = self.call("eth_call", call["params"])
+        return int(result, 16) if result != "0x" else 0
+
+    # --- logs ---
+    def _get_logs(self, address: str, topics: List[Optional[str]], from_block: int,
+                  to_block: Union[int, str]) -> List[Dict]:
+        flt = {"address": address, "topics": topics, "fromBlock": hex(from_block),
+               "toBlock": to_block if isinstance(to_block, str) else hex(to_block)}
+        try:
+            return self.call("eth_getLogs", [flt])
+        except RpcError as e:
+            if not any(m in str(e).lower() for m in LOG_LIMIT_ERRORS):
+                raise
+            hi = self.block_number() if isinstance(to_block, str) else to_block
+            if hi <= from_block:
+                raise
+        # the node refused the range: split it and query the halves
+        mid = (from_block + hi) // 2
+        return self._get_logs(address, topics, from_block, mid) + self._get_logs(address, topics, mid + 1, hi)
+
+    def logs(self, address: str, topic0: Optional[str] = None, from_block: int = 0, to_block: str = "latest") -> List[Dict]:
+        rows = self._get_logs(address, [topic0] if topic0 else [], from_block, to_block)
+        return [compact_log(r) for r in rows]
+
+    def borrower_logs(self, address: str, topic0: str, borrower: str, from_block: int = 0,
+                      to_block: str = "latest") -> List[Dict]:
+        pos = BORROWER_TOPIC.get(topic0.lower())
+        if pos is None:
+            return filter_logs_by_borrower(self.logs(address, topic0, from_block, to_block), borrower)
+        topics = [topic0] + [None] * (pos - 1) + [pad_topic_address(borrower)]
+        return [compact_log(r) for r in self._get_logs(address, topics, from_block, to_block)]
+
+    # --- chain head ---
+    def block_number(self) -> int:
+        return int(self.call("eth_blockNumber", []), 16)
+
+    def block_timestamp(self, block: int) -> int:
+        header = self.call("eth_getBlockByNumber", [hex(block), False])
+        if header is None:
+            raise RpcError(f"block {block} not found")
+        return int(header["timestamp"], 16)
@@ -0,0 +1,128 @@
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Mapping, Optional
+
+import numpy as np
+
+WEIGHTS = {
+    "on_time_repayment_rate": 25,
+    "default_count": 25,
+    "avg_tx_frequency": 10,
+    "avg_balance_usd": 10,
+    "stablecoin_ratio": 10,
+    "debt_utilization": 10,
+    "staking_amount_eth": 10,
+}
+
+# Normalization bounds used by the formula below
+BOUNDS = {
+    "repayment_rate": [0.5, 1],      # normalize_01 range for on_time_repayment_rate
+    "tx_frequency": [0, 4],          # normalize_01 range for avg_tx_frequency (tx/day)
+    "balance_usd_cap": 4400,         # log_norm cap for avg_balance_usd
+    "staking_eth_cap": 50,           # log_norm cap for staking_amount_eth
+    "debt_utilization": [0, 1],      # normalize_01 range before the 1.5 power penalty
+}
+
+FACTOR_COLUMNS = list(WEIGHTS)
+
+# where the calibrated configuration is looked up when none is passed
+CONFIG_PATH = os.getenv("SCORING_CONFIG", "scoring_config.json")
+
+
+@dataclass
+class ScoringConfig:
+    weights: Dict[str, float] = field(default_factory=lambda: dict(WEIGHTS))
+    bounds: Dict = field(default_factory=lambda: dict(BOUNDS))
+
+    @classmethod
+    def load(cls, path: str) -> "ScoringConfig":
+        with open(path) as f:
+            raw = json.load(f)
+        return cls(weights={**WEIGHTS, **raw.get("weights", {})}, bounds={**BOUNDS, **raw.get("bounds", {})})
+
+    def save(self, path: str, **extra):
+        with open(path, "w") as f:
+            json.dump({"weights": self.weights, "bounds": self.bounds, **extra}, f, indent=2)
+
+
+_config: Optional[ScoringConfig] = None
+
+
+def get_config() -> ScoringConfig:
+    """The calibrated config at CONFIG_PATH if present, else the built-in weights and bounds."""
+    global _config
+    if _config is None:
+        _config = ScoringConfig.load(CONFIG_PATH) if os.path.exists(CONFIG_PATH) else ScoringConfig()
+    return _config
+
+
+# =========================
+# Normalization functions (scalars or NumPy arrays)
+# =========================
+def points_default_count(x):
+    # 0 -> 25, 1-2 -> 15, more -> 25 - 5x floored at 0
+    x = np.asarray(x, dtype=float)
+    return np.where(x == 0, 25.0, np.where(x <= 2, 15.0, np.maximum(0.0, 25 - x * 5)))
+
+def normalize_01(x, lo, hi):
+    if hi <= lo: return np.zeros_like(np.asarray(x, dtype=float))
+    x = np.clip(x, lo, hi)
+    return (x - lo) / (hi - lo)
+
+def stablecoin_score(ratio):
+    # ratio 0-1, sigmoid towards 1 if more stablecoin
+    return 1 / (1 + np.power(2.0, -5 * (np.asarray(ratio, dtype=float) - 0.5)))
+
+def log_norm(x, max_val):
+    return np.log1p(x) / np.log1p(max_val)
+
+
+# =========================
+# Score
+# =========================
+def factor_terms(columns: Mapping, bounds: Optional[Mapping] = None) -> np.ndarray:
+    """Normalized per-factor terms, last axis in FACTOR_COLUMNS order: the score is `terms @ weights`.
+
+    The terms depend on the bounds only, so calibration evaluates many weight
+    vectors against one terms matrix with a single matrix product.
+    """
+    b = BOUNDS if bounds is None else bounds
+    col = lambda k: np.asarray(columns[k], dtype=float)
+    return np.stack([
+        normalize_01(col("on_time_repayment_rate"), *b["repayment_rate"]),
+        points_default_count(col("default_count")) / 25,
+        normalize_01(col("avg_tx_frequency"), *b["tx_frequency"]),
+        log_norm(col("avg_balance_usd"), b["balance_usd_cap"]),
+        stablecoin_score(col("stablecoin_ratio")),
+        1 - normalize_01(col("debt_utilization"), *b["debt_utilization"])**1.5,
+        log_norm(col("staking_amount_eth"), b["staking_eth_cap"]),
+    ], axis=-1)
+
+
+def weight_vector(weights: Mapping) -> np.ndarray:
+    return np.array([weights[k] for k in FACTOR_COLUMNS], dtype=float)
+
+
+def score_batch(columns: Mapping, config: Optional[ScoringConfig] = None) -> np.ndarray:
+    """Raw (unclamped) scores for a columnar batch: `columns[factor]` is an array, one entry per wallet.
+
+    Accepts a dict of arrays, a pandas DataFrame, or a single factor dict
+    (which yields a 0-d result).
+    """
+    cfg = config or get_config()
+    return factor_terms(columns, cfg.bounds) @ weight_vector(cfg.weights)
+
+
+def credit_scores(columns: Mapping, config: Optional[ScoringConfig] = None) -> np.ndarray:
+    """Final 0-100 integer scores for a columnar batch."""
+    return np.rint(np.clip(score_batch(columns, config), 0, 100)).astype(int)
+
+
+def compute_score(factors: Mapping, config: Optional[ScoringConfig] = None) -> float:
+    return float(score_batch(factors, config))
+
+
+def credit_score(factors: Mapping, config: Optional[ScoringConfig] = None) -> int:
+    """Final 0-100 integer score, as served by pythonServer."""
+    return round(min(100, max(0, compute_score(factors, config))))
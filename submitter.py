@@ -0,0 +1,238 @@
+import json
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+
+import metrics
+
+# ScoreOracle.submit(wallet, score, factorsRoot, validUntil, nonce, signature)
+SUBMIT_ABI = json.loads(
+    '[{"inputs":[{"internalType":"address","name":"wallet","type":"address"},{"internalType":"uint256","name":"score","type":"uint256"},{"internalType":"bytes32","name":"factorsRoot","type":"bytes32"},{"internalType":"uint256","name":"validUntil","type":"uint256"},{"internalType":"uint256","name":"nonce","type":"uint256"},{"internalType":"bytes","name":"signature","type":"bytes"}],"name":"submit","outputs":[],"stateMutability":"nonpayable","type":"function"}]'
+)
+
+# ScoreOracle.submitBatch(root, count, validUntil, nonce, signature), see batch_attest
+SUBMIT_BATCH_ABI = json.loads(
+    '[{"inputs":[{"internalType":"bytes32","name":"root","type":"bytes32"},{"internalType":"uint256","name":"count","type":"uint256"},{"internalType":"uint256","name":"validUntil","type":"uint256"},{"internalType":"uint256","name":"nonce","type":"uint256"},{"internalType":"bytes","name":"signature","type":"bytes"}],"name":"submitBatch","outputs":[],"stateMutability":"nonpayable","type":"function"}]'
+)
+
+
+def raw_transaction(signed) -> bytes:
+    """Encoded bytes of a signed transaction; eth-account renamed rawTransaction to raw_transaction in 0.13."""
+    return getattr(signed, "raw_transaction", None) or signed.rawTransaction
+
+
+class Submission:
+    """One attestation on its way on-chain. `status`: queued -> sent -> mined | reverted | failed | stuck."""
+
+    def __init__(self, attestation: Dict):
+        self.attestation = attestation
+        self.status = "queued"
+        self.nonce: Optional[int] = None
+        self.tx_hashes: List[str] = []  # every version sent, last one is current
+        self.max_fee: Optional[int] = None
+        self.priority_fee: Optional[int] = None
+        self.queued_at = time.monotonic()
+        self.sent_at = 0.0
+        self.receipt = None
+        self.error: Optional[str] = None
+        self.done = threading.Event()
+
+    @property
+    def tx_hash(self) -> Optional[str]:
+        return self.tx_hashes[-1] if self.tx_hashes else None
+
+
+# =========================
+# Local nonce manager
+# =========================
+class NonceManager:
+    """Hands out consecutive nonces for one sender without asking the node each time."""
+
+    def __init__(self, w3: Web3, address: str):
+        self.w3 = w3
+        self.address = address
+        self._lock = threading.Lock()
+        self._next: Optional[int] = None
+
+    def next(self) -> int:
+        with self._lock:
+            if self._next is None:
+                self._next = self.w3.eth.get_transaction_count(self.address, "pending")
+            n = self._next
+            self._next += 1
+            return n
+
+    def reset(self):
+        """Re-read from the node on the next call (after a rejected nonce)."""
+        with self._lock:
+            self._next = None
+
+
+# =========================
+# Background submission queue
+# =========================
+class SubmissionQueue:
+    """Sends signed attestations from a worker thread.
+
+    Up to `max_in_flight` transactions are pipelined with consecutive local
+    nonces; receipts are polled, and a transaction still pending after
+    `bump_after` seconds is replaced (same nonce) with fees raised by
+    `bump_factor`. After `max_bumps` replacements it is given up as "stuck".
+    """
+
+    def __init__(self, w3: Web3, contract_address: str, relay_pk: str, chain_id: Optional[int] = None,
+                 gas: int = 200000, max_fee: Optional[int] = None, priority_fee: Optional[int] = None,
+                 max_in_flight: int = 16, bump_after: float = 120, bump_factor: float = 1.125,
+                 max_bumps: int = 5, poll_interval: float = 2.0):
+        self.w3 = w3
+        self.account = w3.eth.account.from_key(relay_pk)
+        self.contract = w3.eth.contract(address=Web3.to_checksum_address(contract_address), abi=SUBMIT_ABI + SUBMIT_BATCH_ABI)
+        self.chain_id = chain_id
+        self.gas = gas
+        self.max_fee = max_fee if max_fee is not None else w3.to_wei('30', 'gwei')
+        self.priority_fee = priority_fee if priority_fee is not None else w3.to_wei('1.5', 'gwei')
+        self.max_in_flight = max_in_flight
+        # replacements must raise both fees by at least 10% to be accepted by the mempool
+        self.bump_after = bump_after
+        self.bump_factor = max(bump_factor, 1.1)
+        self.max_bumps = max_bumps
+        self.poll_interval = poll_interval
+        self.nonces = NonceManager(w3, self.account.address)
+        self._queue: "queue.Queue[Submission]" = queue.Queue()
+        self._in_flight: List[Submission] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- public API ---
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="score-submitter", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def submit(self, attestation: Dict) -> Submission:
+        """Queue `attestation` (wallet, score, factorsRoot, validUntil, nonce, signature) or a batch
+        attestation (root, count, validUntil, nonce, signature); returns at once."""
+        sub = Submission(attestation)
+        self._queue.put(sub)
+        return sub
+
+    def pending(self) -> int:
+        return self._queue.qsize() + len(self._in_flight)
+
+    # --- worker ---
+    def _run(self):
+        if self.chain_id is None:
+            self.chain_id = self.w3.eth.chain_id
+        while not self._stop.is_set():
+            self._send_queued()
+            self._check_in_flight()
+            if not self._in_flight:
+                # idle: sleep until work arrives instead of polling
+                try:
+                    sub = self._queue.get(timeout=self.poll_interval)
+                except queue.Empty:
+                    continue
+                self._send(sub)
+            else:
+                self._stop.wait(self.poll_interval)
+
+    def _send_queued(self):
+        while len(self._in_flight) < self.max_in_flight:
+            try:
+                sub = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            self._send(sub)
+
+    def _build(self, sub: Submission) -> Dict:
+        a = sub.attestation
+        if "root" in a:
+            fn = self.contract.functions.submitBatch(
+                a["root"], int(a["count"]), int(a["validUntil"]), int(a["nonce"]),
+                Web3.to_bytes(hexstr=a["signature"]),
+            )
+        else:
+            fn = self.contract.functions.submit(
+                Web3.to_checksum_address(a["wallet"]), int(a["score"]), a["factorsRoot"],
+                int(a["validUntil"]), int(a["nonce"]), Web3.to_bytes(hexstr=a["signature"]),
+            )
+        return fn.build_transaction({
+            'from': self.account.address,
+            'nonce': sub.nonce,
+            'gas': self.gas,
+            'maxFeePerGas': sub.max_fee,
+            'maxPriorityFeePerGas': sub.priority_fee,
+            'chainId': self.chain_id,
+        })
+
+    def _broadcast(self, sub: Submission):
+        signed = self.account.sign_transaction(self._build(sub))
+        txh = self.w3.eth.send_raw_transaction(raw_transaction(signed))
+        sub.tx_hashes.append(txh.hex())
+        sub.sent_at = time.monotonic()
+
+    def _send(self, sub: Submission):
+        sub.nonce = self.nonces.next()
+        sub.max_fee, sub.priority_fee = self.max_fee, self.priority_fee
+        try:
+            self._broadcast(sub)
+        except Exception as e:
+            # the nonce was not consumed; resync so the next send does not leave a gap
+            self.nonces.reset()
+            self._finish(sub, "failed", error=f"{type(e).__name__}: {e}")
+            return
+        sub.status = "sent"
+        self._in_flight.append(sub)
+
+    def _check_in_flight(self):
+        for sub in list(self._in_flight):
+            receipt = self._receipt(sub)
+            if receipt is not None:
+                self._in_flight.remove(sub)
+                self._finish(sub, "mined" if receipt["status"] == 1 else "reverted", receipt=receipt)
+            elif time.monotonic() - sub.sent_at >= self.bump_after:
+                self._bump(sub)
+
+    def _receipt(self, sub: Submission):
+        # any version (original or replacement) may be the one that got mined
+        for txh in reversed(sub.tx_hashes):
+            try:
+                return self.w3.eth.get_transaction_receipt(txh)
+            except TransactionNotFound:
+                continue
+        return None
+
+    def _bump(self, sub: Submission):
+        if len(sub.tx_hashes) > self.max_bumps:
+            # the last version may still be mined later, but nobody waits for it any longer
+            self._in_flight.remove(sub)
+            self._finish(sub, "stuck", error=sub.error or f"not mined after {self.max_bumps} fee bumps")
+            return
+        sub.max_fee = int(sub.max_fee * self.bump_factor) + 1
+        sub.priority_fee = int(sub.priority_fee * self.bump_factor) + 1
+        try:
+            self._broadcast(sub)
+        except Exception as e:
+            # typically "nonce too low": an earlier version was mined meanwhile; the receipt check picks it up
+            sub.error = f"{type(e).__name__}: {e}"
+            sub.sent_at = time.monotonic()
+
+    @staticmethod
+    def _finish(sub: Submission, status: str, receipt=None, error: Optional[str] = None):
+        sub.status = status
+        sub.receipt = receipt
+        sub.error = error
+        metrics.SUBMISSIONS.inc(status=status)
+        metrics.SUBMIT_SECONDS.observe(time.monotonic() - sub.queued_at)
+        sub.done.set()
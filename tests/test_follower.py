@@ -0,0 +1,128 @@
+from typing import Dict, List, Optional
+
+from follower import BlockFollower
+
+ALICE = "0x" + "a1" * 20
+BOB = "0x" + "b0" * 20
+IDLE = "0x" + "c0" * 20
+OTHER = "0x" + "99" * 20
+
+
+class ScriptedNode:
+    """In-memory chain behind the two calls the follower makes; the test mines and reorgs it."""
+
+    def __init__(self, length: int = 10):
+        self.chain: List[Dict] = []
+        self.forks = 0
+        self.stale: Optional[List[Dict]] = None  # when set, batches are served from this chain instead
+        self.calls = 0
+        for _ in range(length):
+            self.mine()
+
+    def mine(self, *txs: Dict):
+        n = len(self.chain)
+        parent = self.chain[-1]["hash"] if self.chain else "0x" + "00" * 32
+        self.chain.append({"number": hex(n), "hash": "0x%062x%02x" % (n, self.forks), "parentHash": parent,
+                           "transactions": list(txs)})
+
+    def reorg(self, depth: int, *txs: Dict):
+        """Replace the last `depth` blocks with blocks of a new fork (the first carries `txs`)."""
+        del self.chain[-depth:]
+        self.forks += 1
+        self.mine(*txs)
+        for _ in range(depth - 1):
+            self.mine()
+
+    def call(self, method: str, params: list):
+        self.calls += 1
+        if method == "eth_blockNumber":
+            return hex(len(self.chain) - 1)
+        if method == "eth_getLogs":
+            return []
+        n = int(params[0], 16)
+        return self.chain[n] if n < len(self.chain) else None
+
+    def batch(self, requests: List[Dict]) -> List[Dict]:
+        self.calls += 1
+        chain = self.stale if self.stale is not None else self.chain
+        return [{"id": r["id"], "result": chain[r["id"]] if r["id"] < len(chain) else None} for r in requests]
+
+
+def transfer(sender: str, to: str) -> Dict:
+    return {"from": sender, "to": to}
+
+
+def following(node: ScriptedNode, wallets, **kw) -> BlockFollower:
+    """A follower that has scanned one block, so it holds a hash to check the next one against."""
+    f = BlockFollower(node, wallets, confirmations=0, **kw)
+    f.poll()
+    node.mine()
+    f.poll()
+    return f
+
+
+def test_marks_only_wallets_new_blocks_touch():
+    node = ScriptedNode()
+    f = BlockFollower(node, [ALICE, BOB, IDLE], confirmations=0)
+    assert f.poll() == 0  # starts at the head
+    node.mine(transfer(ALICE, OTHER))
+    node.mine(transfer(OTHER, BOB))
+    assert f.poll() == 2
+    assert f.take_dirty() == ({ALICE, BOB}, set())
+    assert f.confirmed_block == 11
+
+
+def test_waits_for_confirmations():
+    node = ScriptedNode()
+    f = BlockFollower(node, [ALICE], confirmations=2)
+    f.poll()
+    assert f.confirmed_block == 7
+    node.mine(transfer(ALICE, OTHER))
+    node.mine()
+    assert f.poll() == 2 and f.take_dirty() == (set(), set())
+    node.mine()
+    assert f.poll() == 1 and f.take_dirty() == ({ALICE}, set())
+
+
+def test_reorg_marks_orphaned_and_new_wallets():
+    node = ScriptedNode()
+    f = following(node, [ALICE, BOB])
+    node.mine(transfer(ALICE, OTHER))
+    node.mine()
+    f.poll()
+    f.take_dirty()
+
+    # ALICE's transfer is orphaned; BOB's lands in the replacement block
+    node.reorg(2, transfer(BOB, OTHER))
+    node.mine()
+    assert f.poll() == 3
+    dirty, reorged = f.take_dirty()
+    assert dirty == {ALICE, BOB} and reorged == {ALICE}
+    assert f._recent[len(node.chain) - 1][0] == node.chain[-1]["hash"]
+
+
+def test_reorg_deeper_than_kept_hashes_marks_everyone():
+    node = ScriptedNode()
+    f = following(node, [ALICE, BOB], reorg_depth=2)
+    for _ in range(3):
+        node.mine()
+    f.poll()
+    node.reorg(4)
+    node.mine()
+    f.poll()
+    assert f.take_dirty() == ({ALICE, BOB}, {ALICE, BOB})
+
+
+def test_lagging_node_does_not_spin():
+    node = ScriptedNode()
+    f = following(node, [ALICE])
+    # the batch backend serves a fork whose next block does not extend our top, which the node still has
+    node.stale = [dict(b, hash=b["hash"][:-2] + "ff", parentHash=b["parentHash"][:-2] + "ff") for b in node.chain]
+    node.mine()
+    node.stale.append(dict(node.chain[-1], hash="0x" + "ee" * 32, parentHash="0x" + "ef" * 32))
+    node.calls = 0
+    assert f.poll() == 0
+    assert node.calls < 10 and f.confirmed_block == 10
+    node.stale = None
+    assert f.poll() == 1
+    assert f.take_dirty() == (set(), set())
@@ -0,0 +1,109 @@
+import threading
+
+import pytest
+
+pytest.importorskip("eth_tester")
+from eth_tester import EthereumTester
+from web3 import EthereumTesterProvider, Web3
+
+from submitter import NonceManager, SubmissionQueue
+
+ORACLE = "0x" + "11" * 20
+
+
+def attestation(i: int) -> dict:
+    return {"wallet": "0x" + "22" * 20, "score": i, "factorsRoot": "0x" + "00" * 32,
+            "validUntil": 10 ** 10, "nonce": i, "signature": "0x" + "00" * 65}
+
+
+@pytest.fixture
+def chain():
+    tester = EthereumTester()
+    return tester, Web3(EthereumTesterProvider(tester))
+
+
+@pytest.fixture
+def queue(chain):
+    tester, w3 = chain
+    # bump_after=0: every check of a still-pending transaction replaces it
+    return SubmissionQueue(w3, ORACLE, tester.backend.account_keys[0].to_hex(), chain_id=w3.eth.chain_id,
+                           bump_after=0, max_bumps=2, poll_interval=0.01)
+
+
+# =========================
+# Nonces
+# =========================
+def test_nonce_manager_hands_out_each_nonce_once(chain):
+    _, w3 = chain
+    nonces = NonceManager(w3, w3.eth.accounts[0])
+    got = []
+    lock = threading.Lock()
+
+    def take():
+        for _ in range(50):
+            n = nonces.next()
+            with lock:
+                got.append(n)
+
+    threads = [threading.Thread(target=take) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(got) == list(range(400))
+
+
+def test_pipelined_submissions_get_consecutive_nonces(chain, queue):
+    _, w3 = chain
+    queue.start()
+    try:
+        subs = [queue.submit(attestation(i)) for i in range(5)]
+        for sub in subs:
+            assert sub.done.wait(10)
+    finally:
+        queue.stop(5)
+    assert sorted(sub.nonce for sub in subs) == list(range(5))
+    assert [sub.status for sub in subs] == ["mined"] * 5
+    assert w3.eth.get_transaction_count(queue.account.address) == 5
+
+
+def test_failed_send_does_not_leave_a_nonce_gap(chain, queue):
+    bad = dict(attestation(0), wallet="not an address")
+    failed = queue.submit(bad)
+    ok = queue.submit(attestation(1))
+    queue._send_queued()
+    queue._check_in_flight()
+    assert failed.status == "failed" and failed.error
+    assert ok.status == "mined" and ok.nonce == 0
+
+
+# =========================
+# Fee bumps
+# =========================
+def test_stuck_transaction_is_replaced_with_higher_fees(chain, queue):
+    tester, w3 = chain
+    tester.disable_auto_mine_transactions()
+    sub = queue.submit(attestation(0))
+    queue._send_queued()
+    fees = (sub.max_fee, sub.priority_fee)
+    queue._check_in_flight()  # still pending: replaced at the same nonce
+    assert len(sub.tx_hashes) == 2 and sub.status == "sent"
+    assert sub.max_fee >= fees[0] * 1.1 and sub.priority_fee >= fees[1] * 1.1
+
+    tester.mine_blocks(1)
+    queue._check_in_flight()
+    assert sub.status == "mined"
+    assert sub.receipt["transactionHash"].hex() == sub.tx_hashes[-1]
+    assert w3.eth.get_transaction_count(queue.account.address) == 1
+
+
+def test_gives_up_after_max_bumps(chain, queue):
+    tester, _ = chain
+    tester.disable_auto_mine_transactions()
+    sub = queue.submit(attestation(0))
+    queue._send_queued()
+    for _ in range(queue.max_bumps + 1):
+        queue._check_in_flight()
+    assert sub.status == "stuck"
+    assert len(sub.tx_hashes) == queue.max_bumps + 1
+    assert sub.done.is_set() and queue.pending() == 0